@@ -89,6 +89,8 @@ if DEBUG:
 # Django Middleware
 # ------------------------------------------------------------------------------
 MIDDLEWARE = [
+    "coldfront.core.utils.middleware.CorrelationIdMiddleware",
+    "coldfront.core.utils.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -100,6 +102,14 @@ MIDDLEWARE = [
     "django_htmx.middleware.HtmxMiddleware",
 ]
 
+# Record request durations and, for a sample of the requests, their database queries.
+# The counters are served at /metrics to superusers or with "Authorization: Bearer <REQUEST_METRICS_TOKEN>".
+# They are kept per process and labelled with its pid, a scrape returns the counters of the worker answering it.
+REQUEST_METRICS_ENABLE = ENV.bool("REQUEST_METRICS_ENABLE", default=False)
+REQUEST_METRICS_SAMPLE_RATE = ENV.float("REQUEST_METRICS_SAMPLE_RATE", default=0.1)
+REQUEST_METRICS_SERVER_TIMING = ENV.bool("REQUEST_METRICS_SERVER_TIMING", default=True)
+REQUEST_METRICS_TOKEN = ENV.str("REQUEST_METRICS_TOKEN", default="")
+
 # ------------------------------------------------------------------------------
 # Django authentication backend. See auth.py
 # ------------------------------------------------------------------------------
@@ -118,6 +128,21 @@ Q_CLUSTER = {
     },
 }
 
+# Run the handlers connected with coldfront.core.utils.signals.connect_batch_handler
+# in Django Q tasks, seconds to remember that a handler call already ran, and seconds
+# a running call is locked for, after which a retry of a killed task runs it again
+SIGNAL_HANDLERS_RUN_ASYNC = ENV.bool("SIGNAL_HANDLERS_RUN_ASYNC", default=True)
+SIGNAL_HANDLERS_IDEMPOTENCY_TIMEOUT = ENV.int("SIGNAL_HANDLERS_IDEMPOTENCY_TIMEOUT", default=86400)
+SIGNAL_HANDLERS_LOCK_TIMEOUT = ENV.int("SIGNAL_HANDLERS_LOCK_TIMEOUT", default=Q_CLUSTER["timeout"])
+
+# ------------------------------------------------------------------------------
+# Django cache. Use a shared backend (e.g. redis://host:6379/1) in production so
+# that cached page fragments are invalidated across all workers.
+# ------------------------------------------------------------------------------
+CACHES = {
+    "default": ENV.cache("CACHE_URL", default="locmemcache://"),
+}
+
 
 # ------------------------------------------------------------------------------
 # Django template and site settings
@@ -22,6 +22,14 @@ CENTER_BASE_URL = ENV.str("CENTER_BASE_URL", default="")
 # ------------------------------------------------------------------------------
 GENERAL_RESOURCE_NAME = ENV.str("GENERAL_RESOURCE_NAME", default="UniversityHPC")
 
+# Seconds to keep the status and role choices looked up by name before reading them again
+CHOICE_LOOKUP_CACHE_TIMEOUT = ENV.int("CHOICE_LOOKUP_CACHE_TIMEOUT", default=300)
+
+# Days of task and command runs charted on the run history admin page
+TASK_RUN_TREND_DAYS = ENV.int("TASK_RUN_TREND_DAYS", default=30)
+# Days the task and command runs are kept before the daily prune_task_runs task deletes them
+TASK_RUN_RETENTION_DAYS = ENV.int("TASK_RUN_RETENTION_DAYS", default=90)
+
 # ------------------------------------------------------------------------------
 # Enable Research Outputs, Grants, Publications
 # ------------------------------------------------------------------------------
@@ -29,11 +37,19 @@ RESEARCH_OUTPUT_ENABLE = ENV.bool("RESEARCH_OUTPUT_ENABLE", default=True)
 GRANT_ENABLE = ENV.bool("GRANT_ENABLE", default=True)
 PUBLICATION_ENABLE = ENV.bool("PUBLICATION_ENABLE", default=True)
 
+# Seconds to wait for a publication source when looking up publication IDs, and
+# number of IDs looked up concurrently
+PUBLICATION_SOURCE_TIMEOUT = ENV.int("PUBLICATION_SOURCE_TIMEOUT", default=5)
+PUBLICATION_SEARCH_MAX_WORKERS = ENV.int("PUBLICATION_SEARCH_MAX_WORKERS", default=8)
+
 # ------------------------------------------------------------------------------
 # Enable Project Review
 # ------------------------------------------------------------------------------
 PROJECT_ENABLE_PROJECT_REVIEW = ENV.bool("PROJECT_ENABLE_PROJECT_REVIEW", default=True)
 
+# Seconds to keep the cached cards of the project detail page
+PROJECT_DETAIL_CACHE_TIMEOUT = ENV.int("PROJECT_DETAIL_CACHE_TIMEOUT", default=600)
+
 # ------------------------------------------------------------------------------
 # Enable EULA force agreement
 # ------------------------------------------------------------------------------
@@ -55,10 +71,24 @@ ALLOCATION_ENABLE_ALLOCATION_RENEWAL = ENV.bool("ALLOCATION_ENABLE_ALLOCATION_RE
 ALLOCATION_FUNCS_ON_EXPIRE = [
     "coldfront.core.allocation.utils.test_allocation_function",
 ]
+# Run ALLOCATION_FUNCS_ON_EXPIRE in Django Q tasks instead of while saving the allocation
+ALLOCATION_FUNCS_ON_EXPIRE_ASYNC = ENV.bool("ALLOCATION_FUNCS_ON_EXPIRE_ASYNC", default=False)
+# Also send allocation_activate_user and allocation_remove_user for each allocation user, next to the
+# allocation_activate_users and allocation_remove_users batch signals, for plugins not handling the batches yet
+ALLOCATION_USER_SIGNALS_PER_USER = ENV.bool("ALLOCATION_USER_SIGNALS_PER_USER", default=False)
 
 # This is in days
 ALLOCATION_DEFAULT_ALLOCATION_LENGTH = ENV.int("ALLOCATION_DEFAULT_ALLOCATION_LENGTH", default=365)
 
+# Seconds to keep the cached users/change requests/notes panels of the allocation detail page
+ALLOCATION_DETAIL_CACHE_TIMEOUT = ENV.int("ALLOCATION_DETAIL_CACHE_TIMEOUT", default=600)
+
+
+# ------------------------------------------------------------------------------
+# User search
+# ------------------------------------------------------------------------------
+# Seconds to wait for each of the ADDITIONAL_USER_SEARCH_CLASSES before showing the results without it
+USER_SEARCH_BACKEND_TIMEOUT = ENV.float("USER_SEARCH_BACKEND_TIMEOUT", default=10.0)
 
 # ------------------------------------------------------------------------------
 # Allow user to select account name for allocation
@@ -1,6 +1,9 @@
+import socket
+
 from django.contrib.messages import constants as messages
+
+from coldfront.config.env import ENV
 from coldfront.core.utils.common import import_from_settings
-import socket
 
 # ------------------------------------------------------------------------------
 # ColdFront logging config
@@ -21,39 +24,83 @@ MESSAGE_TAGS = {
     messages.ERROR: "danger",
 }
 
+# Level of the records logged, "text" or "json" lines, and whether the records are written by a background
+# thread rather than by the request or task logging them
+LOG_LEVEL = ENV.str("LOG_LEVEL", default="INFO")
+LOG_FORMAT = ENV.str("LOG_FORMAT", default="text")
+LOG_ASYNC = ENV.bool("LOG_ASYNC", default=True)
+# Records waiting to be written, the records logged once it is full are dropped
+LOG_QUEUE_SIZE = ENV.int("LOG_QUEUE_SIZE", default=10000)
+LOG_FILE_MAX_BYTES = ENV.int("LOG_FILE_MAX_BYTES", default=50 * 1024 * 1024)
+LOG_FILE_BACKUP_COUNT = ENV.int("LOG_FILE_BACKUP_COUNT", default=10)
+# Share of the records below ERROR kept by logger, e.g. coldfront.plugins.xdmod=0.1,coldfront.core.utils.mail=0.5
+LOG_SAMPLE_RATES = ENV.dict("LOG_SAMPLE_RATES", cast={"value": float}, default={})
+# Records below ERROR per second of each logger, 0 for no limit, and records logged at once before the limit applies
+LOG_RATE_LIMIT = ENV.float("LOG_RATE_LIMIT", default=0)
+LOG_RATE_LIMIT_BURST = ENV.int("LOG_RATE_LIMIT_BURST", default=100)
+# Header of the request ID set by the proxy, used as the correlation ID of the request and returned in the response
+LOG_REQUEST_ID_HEADER = ENV.str("LOG_REQUEST_ID_HEADER", default="X-Request-ID")
+
+LOGGING_CONFIG = "coldfront.core.utils.log.configure_logging"
+
+LOG_FILTERS = ["correlation_id", "sampling", "rate_limit"]
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
-    "root": {"level": "INFO", "handlers": ["console", "file"]},
+    "root": {"level": LOG_LEVEL, "handlers": ["queue"] if LOG_ASYNC else ["console", "file"]},
+    "filters": {
+        "correlation_id": {"()": "coldfront.core.utils.log.CorrelationIdFilter"},
+        "sampling": {"()": "coldfront.core.utils.log.SamplingFilter", "rates": LOG_SAMPLE_RATES},
+        "rate_limit": {
+            "()": "coldfront.core.utils.log.RateLimitFilter",
+            "rate": LOG_RATE_LIMIT,
+            "burst": LOG_RATE_LIMIT_BURST,
+        },
+    },
     "formatters": {
-        "standard": {
-            "format": "{levelname} {asctime} {module} {thread:d} {message}",
+        "text": {
+            "format": "{levelname} {asctime} {module} {thread:d} {correlation_id} {message}",
             "style": "{",
+            "defaults": {"correlation_id": "-"},
         },
+        "json": {"()": "coldfront.core.utils.log.JSONFormatter"},
     },
     "handlers": {
         "console": {
             "class": "logging.StreamHandler",
-            "level": "INFO",
-            "formatter": "standard",
+            "level": LOG_LEVEL,
+            "formatter": LOG_FORMAT,
+            "filters": [] if LOG_ASYNC else LOG_FILTERS,
         },
         "file": {
             "class": "logging.handlers.RotatingFileHandler",
-            "level": "INFO",
-            "formatter": "standard",
+            "level": LOG_LEVEL,
+            "formatter": LOG_FORMAT,
+            "filters": [] if LOG_ASYNC else LOG_FILTERS,
             "filename": LOG_FILE,
-            "maxBytes": 1024 * 1024,
-            "backupCount": 3,
+            "maxBytes": LOG_FILE_MAX_BYTES,
+            "backupCount": LOG_FILE_BACKUP_COUNT,
         },
     },
+    # The django and django-q records propagate to the root handlers, the records below LOG_LEVEL are not even created
     "loggers": {
         "django": {
-            "handlers": ["console", "file"],
-            "level": "DEBUG",
+            "level": LOG_LEVEL,
         },
         "django-q": {
-            "handlers": ["console", "file"],
-            "level": "DEBUG",
+            "level": LOG_LEVEL,
         },
     },
 }
+
+if LOG_ASYNC:
+    # Records are filtered by the thread logging them, then written to the console and file by a listener thread
+    LOGGING["handlers"]["queue"] = {
+        "class": "coldfront.core.utils.log.QueueHandler",
+        "level": LOG_LEVEL,
+        "filters": LOG_FILTERS,
+        "queue": {"()": "queue.Queue", "maxsize": LOG_QUEUE_SIZE},
+        "handlers": ["console", "file"],
+        "respect_handler_level": True,
+    }
@@ -14,3 +14,10 @@ KEYCLOAK_CLIENT_SECRET = ENV.str("KEYCLOAK_CLIENT_SECRET")
 ADDITIONAL_USER_SEARCH_CLASSES = [
     "coldfront.plugins.keycloak_user_search.search.KeycloakUserSearch"
 ]
+
+# Timeout in seconds of requests to Keycloak
+KEYCLOAK_TIMEOUT = ENV.float("KEYCLOAK_TIMEOUT", default=10.0)
+# Number of usernames looked up concurrently when a list of usernames is searched
+KEYCLOAK_SEARCH_MAX_WORKERS = ENV.int("KEYCLOAK_SEARCH_MAX_WORKERS", default=8)
+# Seconds to cache search results
+KEYCLOAK_SEARCH_CACHE_TIMEOUT = ENV.int("KEYCLOAK_SEARCH_CACHE_TIMEOUT", default=60)
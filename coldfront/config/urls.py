@@ -8,6 +8,7 @@ from django.urls import include, path
 from django.views.generic import TemplateView
 
 import coldfront.core.portal.views as portal_views
+import coldfront.core.utils.views as utils_views
 
 admin.site.site_header = "ColdFront Administration"
 admin.site.site_title = "ColdFront Administration"
@@ -22,6 +23,7 @@ urlpatterns = [
     path("", portal_views.home, name="home"),
     path("center-summary", portal_views.center_summary, name="center-summary"),
     path("allocation-summary", portal_views.allocation_summary, name="allocation-summary"),
+    path("metrics", utils_views.metrics, name="metrics"),
     path("user/", include("coldfront.core.user.urls")),
     path("project/", include("coldfront.core.project.urls")),
     path("allocation/", include("coldfront.core.allocation.urls")),
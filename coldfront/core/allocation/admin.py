@@ -382,15 +382,15 @@ class AllocationUserAdmin(SimpleHistoryAdmin):
 
     @admin.action(description="Set Selected User's Status To Active")
     def set_active(self, request, queryset):
-        queryset.update(status=AllocationUserStatusChoice.objects.get(name="Active"))
+        queryset.update(status=AllocationUserStatusChoice.objects.get_by_natural_key("Active"))
 
     @admin.action(description="Set Selected User's Status To Denied")
     def set_denied(self, request, queryset):
-        queryset.update(status=AllocationUserStatusChoice.objects.get(name="Denied"))
+        queryset.update(status=AllocationUserStatusChoice.objects.get_by_natural_key("Denied"))
 
     @admin.action(description="Set Selected User's Status To Removed")
     def set_removed(self, request, queryset):
-        queryset.update(status=AllocationUserStatusChoice.objects.get(name="Removed"))
+        queryset.update(status=AllocationUserStatusChoice.objects.get_by_natural_key("Removed"))
 
     actions = [
         set_active,
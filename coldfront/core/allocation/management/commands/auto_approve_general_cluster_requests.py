@@ -1,56 +1,74 @@
-import logging
 import datetime
+import logging
+import time
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
-from coldfront.core.allocation.models import Allocation, AllocationStatusChoice
-from coldfront.core.allocation.signals import (
-    allocation_activate,
-    allocation_activate_user,
-)
+from coldfront.core.allocation.models import Allocation, ordered_resources_prefetch
+from coldfront.core.allocation.utils import activate_allocations
 from coldfront.core.utils.common import import_from_settings
-from coldfront.core.utils.mail import (
-    send_allocation_customer_email,
-)
+from coldfront.core.utils.instrumentation import instrument_command
+from coldfront.core.utils.mail import send_allocation_customer_emails
 
 logger = logging.getLogger(__name__)
 
 GENERAL_RESOURCE_NAME = import_from_settings("GENERAL_RESOURCE_NAME")
 CENTER_BASE_URL = import_from_settings("CENTER_BASE_URL")
 
+END_DATE = datetime.date(2035, 6, 1)
+
 
 class Command(BaseCommand):
     help = "Apporve any allocation requests to access the base cluster \
     resource with a fixed end date"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=500, help="Number of allocations approved in each transaction"
+        )
+
+    @instrument_command
     def handle(self, *args, **options):
-        try:
-            allocations = Allocation.objects.filter(resources__name=GENERAL_RESOURCE_NAME, status__name="New")
-            active = AllocationStatusChoice.objects.get(name="Active")
-
-            for allocation_obj in allocations:
-                logger.info(f"Approving allocation number {allocation_obj.pk}")
-                allocation_obj.status = active
-                if not allocation_obj.start_date:
-                    allocation_obj.start_date = datetime.datetime.now()
-                allocation_obj.end_date = datetime.datetime(2035, 6, 1)
-                allocation_obj.save()
-
-                # We don't use signals now, but keeping this here
-                # for consistency. Future plugins may use these signals
-                allocation_activate.send(sender=None, allocation_pk=allocation_obj.pk)
-                allocation_users = allocation_obj.allocationuser_set.exclude(
-                    status__name__in=["Removed", "Error", "DeclinedEULA", "PendingEULA"]
-                )
-                for allocation_user in allocation_users:
-                    allocation_activate_user.send(sender=None, allocation_user_pk=allocation_user.pk)
-
-                send_allocation_customer_email(
-                    allocation_obj,
-                    "Allocation Activated",
-                    "email/allocation_activated.txt",
-                    domain_url=CENTER_BASE_URL,
-                )
-                logger.info(f"Approved allocation request: {allocation_obj.pk}")
-        except Exception:
-            logger.debug("Exception occured with traceback:", exc_info=True)
+        self.rows_processed = 0
+        allocation_pks = list(
+            Allocation.objects.filter(resources__name=GENERAL_RESOURCE_NAME, status__name="New")
+            .order_by("pk")
+            .values_list("pk", flat=True)
+            .distinct()
+        )
+        chunk_size = max(1, options["chunk_size"])
+        start = time.perf_counter()
+
+        for index in range(0, len(allocation_pks), chunk_size):
+            chunk_pks = allocation_pks[index : index + chunk_size]
+            try:
+                with transaction.atomic():
+                    # Skip the allocations approved or changed since the list was read
+                    allocations = list(
+                        Allocation.objects.filter(pk__in=chunk_pks, status__name="New")
+                        .select_related("project__school")
+                        .prefetch_related(ordered_resources_prefetch())
+                    )
+                    # We don't use signals now, but keeping them for consistency. Future plugins may use them.
+                    # They are sent in batches once the chunk commits.
+                    approved_pks = activate_allocations(allocations, END_DATE)
+            except Exception:
+                logger.exception(f"Failed to approve allocations {chunk_pks[0]} to {chunk_pks[-1]}")
+                continue
+
+            logger.info(f"Approved allocation requests: {approved_pks}")
+            # Emailed once the chunk is committed, over a single connection
+            send_allocation_customer_emails(
+                allocations,
+                "Allocation Activated",
+                "email/allocation_activated.txt",
+                domain_url=CENTER_BASE_URL,
+            )
+            self.rows_processed += len(approved_pks)
+
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"Approved {self.rows_processed} allocations, {index + len(chunk_pks)}/{len(allocation_pks)} "
+                f"processed in {elapsed:.1f}s ({self.rows_processed / elapsed:.1f}/s)"
+            )
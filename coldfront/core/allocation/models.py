@@ -1,19 +1,22 @@
 import datetime
+import functools
 import logging
 from ast import literal_eval
 from enum import Enum
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.utils.safestring import mark_safe
 from django.utils.module_loading import import_string
+from django_q.tasks import async_task
 from model_utils.models import TimeStampedModel
 from simple_history.models import HistoricalRecords
 
 from coldfront.core.project.models import Project, ProjectPermission
 from coldfront.core.resource.models import Resource
 from coldfront.core.utils.common import import_from_settings
+from coldfront.core.utils.models import ChoiceLookupManager
 import coldfront.core.attribute_expansion as attribute_expansion
 
 logger = logging.getLogger(__name__)
@@ -22,11 +25,31 @@ ALLOCATION_ATTRIBUTE_VIEW_LIST = import_from_settings(
     "ALLOCATION_ATTRIBUTE_VIEW_LIST", []
 )
 ALLOCATION_FUNCS_ON_EXPIRE = import_from_settings("ALLOCATION_FUNCS_ON_EXPIRE", [])
+ALLOCATION_FUNCS_ON_EXPIRE_ASYNC = import_from_settings(
+    "ALLOCATION_FUNCS_ON_EXPIRE_ASYNC", False
+)
 ALLOCATION_RESOURCE_ORDERING = import_from_settings(
     "ALLOCATION_RESOURCE_ORDERING", ["-is_allocatable", "name"]
 )
 
 
+def ordered_resources_prefetch(lookup="resources"):
+    """
+    Params:
+        lookup (str): lookup path from the queried model to the allocation resources
+
+    Returns:
+        Prefetch: a prefetch of allocation resources in ALLOCATION_RESOURCE_ORDERING, which lets get_parent_resource answer from the prefetched set
+    """
+
+    return models.Prefetch(
+        lookup,
+        queryset=Resource.objects.select_related("resource_type").order_by(
+            *ALLOCATION_RESOURCE_ORDERING
+        ),
+    )
+
+
 class AllocationPermission(Enum):
     """A project permission stores the user and manager fields of a project."""
 
@@ -34,6 +57,29 @@ class AllocationPermission(Enum):
     MANAGER = "MANAGER"
 
 
+def run_allocation_funcs_on_expire(allocation_pks):
+    """Runs ALLOCATION_FUNCS_ON_EXPIRE for each expired allocation, in Django Q tasks when ALLOCATION_FUNCS_ON_EXPIRE_ASYNC.
+    Called once the expiration is committed, a failing function is logged and doesn't stop the others.
+
+    Params:
+        allocation_pks (list[int]): pks of the allocations which expired
+    """
+
+    for func_string in ALLOCATION_FUNCS_ON_EXPIRE:
+        if ALLOCATION_FUNCS_ON_EXPIRE_ASYNC:
+            for allocation_pk in allocation_pks:
+                async_task(func_string, allocation_pk)
+        else:
+            func_to_run = import_string(func_string)
+            for allocation_pk in allocation_pks:
+                try:
+                    func_to_run(allocation_pk)
+                except Exception:
+                    logger.exception(
+                        "%s failed for expired allocation %s", func_string, allocation_pk
+                    )
+
+
 class AllocationStatusChoice(TimeStampedModel):
     """A project status choice indicates the status of the project. Examples include Active, Archived, and New.
 
@@ -46,12 +92,8 @@ class AllocationStatusChoice(TimeStampedModel):
             "name",
         ]
 
-    class AllocationStatusChoiceManager(models.Manager):
-        def get_by_natural_key(self, name):
-            return self.get(name=name)
-
     name = models.CharField(max_length=64)
-    objects = AllocationStatusChoiceManager()
+    objects = ChoiceLookupManager()
 
     def __str__(self):
         return self.name
@@ -127,20 +169,39 @@ class Allocation(TimeStampedModel):
             if self.start_date > self.end_date:
                 raise ValidationError("Start date cannot be greater than the end date.")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded status so that save() can tell a status change without querying
+        instance._loaded_status_id = instance.__dict__.get("status_id")
+        return instance
+
     def save(self, *args, **kwargs):
-        """Saves the project."""
+        """Saves the allocation, running ALLOCATION_FUNCS_ON_EXPIRE when its status changes to Expired."""
 
-        if self.pk:
-            old_obj = Allocation.objects.get(pk=self.pk)
-            if (
-                old_obj.status.name != self.status.name
-                and self.status.name == "Expired"
-            ):
-                for func_string in ALLOCATION_FUNCS_ON_EXPIRE:
-                    func_to_run = import_string(func_string)
-                    func_to_run(self.pk)
+        if not self.pk:
+            old_status_id = None
+        elif getattr(self, "_loaded_status_id", None) is not None:
+            old_status_id = self._loaded_status_id
+        else:
+            old_status_id = (
+                Allocation.objects.filter(pk=self.pk)
+                .values_list("status_id", flat=True)
+                .first()
+            )
+        expired = (
+            old_status_id is not None
+            and old_status_id != self.status_id
+            and self.status.name == "Expired"
+        )
 
         super().save(*args, **kwargs)
+        self._loaded_status_id = self.status_id
+
+        if expired:
+            transaction.on_commit(
+                functools.partial(run_allocation_funcs_on_expire, [self.pk])
+            )
 
     @property
     def expires_in(self):
@@ -209,12 +270,12 @@ class Allocation(TimeStampedModel):
             str: the resources for the allocation
         """
 
-        return ", ".join(
-            [
-                ele.name
-                for ele in self.resources.all().order_by(*ALLOCATION_RESOURCE_ORDERING)
-            ]
-        )
+        if "resources" in getattr(self, "_prefetched_objects_cache", {}):
+            # Prefetched in ALLOCATION_RESOURCE_ORDERING, see ordered_resources_prefetch
+            resources = self.resources.all()
+        else:
+            resources = self.resources.all().order_by(*ALLOCATION_RESOURCE_ORDERING)
+        return ", ".join([ele.name for ele in resources])
 
     @property
     def get_resources_as_list(self):
@@ -223,7 +284,8 @@ class Allocation(TimeStampedModel):
             list[Resource]: the resources for the allocation
         """
 
-        return [ele for ele in self.resources.all().order_by("-is_allocatable")]
+        # Sort in Python so a prefetched resources set is reused
+        return sorted(self.resources.all(), key=lambda ele: not ele.is_allocatable)
 
     @property
     def get_parent_resource(self):
@@ -232,6 +294,11 @@ class Allocation(TimeStampedModel):
             Resource: the parent resource for the allocation
         """
 
+        if "resources" in getattr(self, "_prefetched_objects_cache", {}):
+            # Prefetched in ALLOCATION_RESOURCE_ORDERING, see ordered_resources_prefetch
+            resources = self.resources.all()
+            return resources[0] if resources else None
+
         if self.resources.count() == 1:
             return self.resources.first()
         else:
@@ -642,12 +709,8 @@ class AllocationUserStatusChoice(TimeStampedModel):
             "name",
         ]
 
-    class AllocationUserStatusChoiceManager(models.Manager):
-        def get_by_natural_key(self, name):
-            return self.get(name=name)
-
     name = models.CharField(max_length=64)
-    objects = AllocationUserStatusChoiceManager()
+    objects = ChoiceLookupManager()
 
     def __str__(self):
         return self.name
@@ -727,10 +790,14 @@ class AllocationChangeStatusChoice(TimeStampedModel):
     """
 
     name = models.CharField(max_length=64)
+    objects = ChoiceLookupManager()
 
     def __str__(self):
         return self.name
 
+    def natural_key(self):
+        return (self.name,)
+
     class Meta:
         ordering = [
             "name",
@@ -1,16 +1,44 @@
 import django.dispatch
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from coldfront.core.allocation.models import (
+    Allocation,
+    AllocationChangeRequest,
+    AllocationUser,
+    AllocationUserNote,
+)
+from coldfront.core.utils.common import invalidate_fragment_cache
 
 allocation_new = django.dispatch.Signal()
 # providing_args=["allocation_pk"]
 allocation_activate = django.dispatch.Signal()
 # providing_args=["allocation_pk"]
+allocations_activate = django.dispatch.Signal()
+# providing_args=["allocation_pks"]
 allocation_disable = django.dispatch.Signal()
 # providing_args=["allocation_pk"]
 
 allocation_activate_user = django.dispatch.Signal()
 # providing_args=["allocation_user_pk"]
+allocation_activate_users = django.dispatch.Signal()
+# providing_args=["allocation_user_pks"]
 allocation_remove_user = django.dispatch.Signal()
 # providing_args=["allocation_user_pk"]
+allocation_remove_users = django.dispatch.Signal()
+# providing_args=["allocation_user_pks"]
 
 allocation_change_approved = django.dispatch.Signal()
 # providing_args=["allocation_pk", "allocation_change_pk"]
+
+
+@receiver([post_save, post_delete], sender=Allocation)
+def invalidate_allocation_cache(sender, instance, **kwargs):
+    invalidate_fragment_cache("allocation", instance.pk)
+
+
+@receiver([post_save, post_delete], sender=AllocationUser)
+@receiver([post_save, post_delete], sender=AllocationChangeRequest)
+@receiver([post_save, post_delete], sender=AllocationUserNote)
+def invalidate_allocation_related_cache(sender, instance, **kwargs):
+    invalidate_fragment_cache("allocation", instance.allocation_id)
@@ -3,7 +3,8 @@ import datetime
 # import the logging library
 import logging
 
-from coldfront.core.allocation.models import Allocation, AllocationStatusChoice
+from coldfront.core.allocation.models import Allocation
+from coldfront.core.allocation.utils import set_allocations_status
 from coldfront.core.user.models import User
 from coldfront.core.utils.common import import_from_settings
 from coldfront.core.utils.mail import send_email_template
@@ -35,7 +36,6 @@ EMAIL_ADMIN_LIST = import_from_settings("EMAIL_ADMIN_LIST")
 
 
 def update_statuses():
-    expired_status_choice = AllocationStatusChoice.objects.get(name="Expired")
     allocations_to_expire = Allocation.objects.filter(
         status__name__in=[
             "Active",
@@ -45,11 +45,10 @@ def update_statuses():
         ],
         end_date__lt=datetime.datetime.now().date(),
     )
-    for sub_obj in allocations_to_expire:
-        sub_obj.status = expired_status_choice
-        sub_obj.save()
+    expired_pks = set_allocations_status(allocations_to_expire, "Expired")
 
-    logger.info("Allocations set to expired: {}".format(allocations_to_expire.count()))
+    logger.info("Allocations set to expired: {}".format(len(expired_pks)))
+    return len(expired_pks)
 
 
 def send_expiry_emails():
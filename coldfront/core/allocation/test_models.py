@@ -1,8 +1,30 @@
 """Unit tests for the allocation models"""
 
+import datetime
+import io
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from coldfront.core.allocation.models import Allocation
+from coldfront.core.allocation.signals import allocation_activate_users, allocations_activate
+from coldfront.core.allocation.utils import set_allocations_status
+from coldfront.core.test_helpers.factories import (
+    AllocationFactory,
+    AllocationStatusChoiceFactory,
+    AllocationUserFactory,
+    AllocationUserStatusChoiceFactory,
+    ProjectFactory,
+    ProjectUserFactory,
+    ResourceFactory,
+)
 
-from coldfront.core.test_helpers.factories import AllocationFactory, ResourceFactory
+on_expire = Mock()
 
 
 class AllocationModelTests(TestCase):
@@ -21,3 +43,149 @@ class AllocationModelTests(TestCase):
             self.allocation.project.pi,
         )
         self.assertEqual(str(self.allocation), allocation_str)
+
+
+@patch(
+    "coldfront.core.allocation.models.ALLOCATION_FUNCS_ON_EXPIRE",
+    ["coldfront.core.allocation.test_models.on_expire"],
+)
+class AllocationExpireTests(TestCase):
+    """tests for running ALLOCATION_FUNCS_ON_EXPIRE when allocations expire"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.expired_status = AllocationStatusChoiceFactory(name="Expired")
+        cls.allocation = AllocationFactory(
+            end_date=datetime.date.today() - datetime.timedelta(days=1),
+            start_date=datetime.date.today() - datetime.timedelta(days=30),
+        )
+
+    def setUp(self):
+        on_expire.reset_mock()
+        self.allocation = Allocation.objects.get(pk=self.allocation.pk)
+
+    def test_save_does_not_query_status(self):
+        """test that saving a loaded allocation doesn't read its previous status"""
+        self.allocation.quantity = 2
+        with CaptureQueriesContext(connection) as queries:
+            self.allocation.save()
+        self.assertFalse([query for query in queries.captured_queries if query["sql"].startswith("SELECT")])
+        on_expire.assert_not_called()
+
+    def test_save_runs_funcs_on_expire(self):
+        """test that the functions run once when the status changes to Expired"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.allocation.status = self.expired_status
+            self.allocation.save()
+            self.allocation.save()
+            on_expire.assert_not_called()
+        on_expire.assert_called_once_with(self.allocation.pk)
+
+    def test_set_allocations_status_runs_funcs_on_expire(self):
+        """test that bulk status transitions run the functions for the allocations which expired, after commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(set_allocations_status([self.allocation], "Expired"), [self.allocation.pk])
+            self.assertEqual(set_allocations_status(Allocation.objects.filter(pk=self.allocation.pk), "Expired"), [])
+            on_expire.assert_not_called()
+        on_expire.assert_called_once_with(self.allocation.pk)
+        self.assertEqual(self.allocation.history.first().status, self.expired_status)
+
+    def test_failing_func_on_expire_is_logged(self):
+        """test that a failing function is logged for its allocation and doesn't stop the other allocations"""
+        other = AllocationFactory(project=ProjectFactory(title="Other project"))
+        on_expire.side_effect = [RuntimeError("unreachable"), None]
+        self.addCleanup(setattr, on_expire, "side_effect", None)
+
+        with patch("coldfront.core.allocation.models.logger") as logger:
+            with self.captureOnCommitCallbacks(execute=True):
+                set_allocations_status([self.allocation, other], "Expired")
+
+        self.assertEqual(on_expire.call_count, 2)
+        logger.exception.assert_called_once_with(
+            "%s failed for expired allocation %s",
+            "coldfront.core.allocation.test_models.on_expire",
+            self.allocation.pk,
+        )
+        self.assertEqual(Allocation.objects.get(pk=self.allocation.pk).status, self.expired_status)
+
+    @patch("coldfront.core.allocation.models.ALLOCATION_FUNCS_ON_EXPIRE_ASYNC", True)
+    @patch("coldfront.core.allocation.models.async_task")
+    def test_funcs_on_expire_run_in_tasks(self, async_task):
+        """test that the functions are queued as Django Q tasks when ALLOCATION_FUNCS_ON_EXPIRE_ASYNC, after commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.allocation.status = self.expired_status
+            self.allocation.save()
+            async_task.assert_not_called()
+        async_task.assert_called_once_with("coldfront.core.allocation.test_models.on_expire", self.allocation.pk)
+        on_expire.assert_not_called()
+
+
+@patch("coldfront.core.utils.mail.EMAIL_ENABLED", True)
+@patch("coldfront.core.utils.mail.EMAIL_SENDER", "hpc@example.edu")
+class AutoApproveGeneralClusterRequestsTests(TestCase):
+    """tests for approving the general cluster requests in chunks"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AllocationStatusChoiceFactory(name="Active")
+        new_status = AllocationStatusChoiceFactory(name="New")
+        removed_status = AllocationUserStatusChoiceFactory(name="Removed")
+        cluster = ResourceFactory(name=settings.GENERAL_RESOURCE_NAME)
+        cls.allocations = []
+        for index in range(3):
+            allocation = AllocationFactory(
+                project=ProjectFactory(title=f"Cluster project {index}"),
+                status=new_status,
+                start_date=None,
+                end_date=None,
+            )
+            allocation.resources.add(cluster)
+            ProjectUserFactory(project=allocation.project, user=allocation.project.pi)
+            AllocationUserFactory(allocation=allocation, user=allocation.project.pi)
+            cls.allocations.append(allocation)
+        cls.removed_user = AllocationUserFactory(allocation=cls.allocations[0], status=removed_status)
+        cls.other_allocation = AllocationFactory(project=ProjectFactory(title="Storage project"), status=new_status)
+        cls.other_allocation.resources.add(ResourceFactory(name="holylfs07/tier1"))
+
+    def test_approves_in_chunks(self):
+        """test that requests are approved in chunks, with one batch of signals and emails per chunk"""
+        batches = []
+
+        def record_allocations(sender, allocation_pks, **kwargs):
+            batches.append(("allocations", allocation_pks))
+
+        def record_users(sender, allocation_user_pks, **kwargs):
+            batches.append(("users", allocation_user_pks))
+
+        allocations_activate.connect(record_allocations)
+        allocation_activate_users.connect(record_users)
+        self.addCleanup(allocations_activate.disconnect, record_allocations)
+        self.addCleanup(allocation_activate_users.disconnect, record_users)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("auto_approve_general_cluster_requests", chunk_size=2, stdout=io.StringIO())
+
+        pks = [allocation.pk for allocation in self.allocations]
+        for allocation in Allocation.objects.filter(pk__in=pks):
+            self.assertEqual(allocation.status.name, "Active")
+            self.assertEqual(allocation.start_date, datetime.date.today())
+            self.assertEqual(allocation.end_date, datetime.date(2035, 6, 1))
+            self.assertEqual(allocation.history.first().status.name, "Active")
+        self.assertEqual(Allocation.objects.get(pk=self.other_allocation.pk).status.name, "New")
+
+        user_pks = [
+            allocation.allocationuser_set.exclude(pk=self.removed_user.pk).get().pk for allocation in self.allocations
+        ]
+        self.assertEqual(
+            batches,
+            [
+                ("allocations", pks[:2]),
+                ("users", user_pks[:2]),
+                ("allocations", pks[2:]),
+                ("users", user_pks[2:]),
+            ],
+        )
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [[allocation.project.pi.email] for allocation in self.allocations],
+        )
@@ -1,14 +1,20 @@
+import csv
+import datetime
 import logging
+from unittest.mock import Mock
 
+from django.core.cache import cache
 from django.core.management import call_command
 
 from coldfront.core.allocation.views import GENERAL_RESOURCE_NAME
 from coldfront.core.resource.models import Resource, ResourceType
-from coldfront.core.project.models import Project
+from coldfront.core.project.models import Project, ProjectUserStatusChoice
 from coldfront.core.school.models import School
 from coldfront.core.user.models import UserProfile, ApproverProfile
 from django.contrib.auth.models import Permission, User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from coldfront.core.test_helpers import utils
@@ -20,6 +26,7 @@ from coldfront.core.test_helpers.factories import (
     AllocationFactory,
     ProjectUserFactory,
     AllocationUserFactory,
+    AllocationUserStatusChoiceFactory,
     AllocationAttributeFactory,
     ProjectStatusChoiceFactory,
     ProjectUserRoleChoiceFactory,
@@ -35,8 +42,10 @@ from coldfront.core.allocation.models import (
     Allocation,
     AllocationAttribute,
     AllocationAttributeType,
+    AllocationUser,
     AttributeType,
 )
+from coldfront.core.allocation.signals import allocation_activate_users, allocation_remove_users
 
 logging.disable(logging.CRITICAL)
 
@@ -401,6 +410,25 @@ class AllocationDetailViewTest(AllocationViewBaseTest):
         utils.page_does_not_contain_for_user(self, self.allocation_user, self.url, "Add Users")
         utils.page_does_not_contain_for_user(self, self.allocation_user, self.url, "Remove Users")
 
+    def test_allocationdetail_users_panel(self):
+        """Test that the users panel is served as a partial and refreshed when allocation users change"""
+        url = self.url + "?panel=users"
+        # the fragment cache is not rolled back with the database
+        self.addCleanup(cache.clear)
+        utils.page_contains_for_user(self, self.pi_user, url, self.allocation_user.username)
+        # a second request is served from the fragment cache, which must be invalidated on change
+        new_allocation_user = AllocationUserFactory(allocation=self.allocation)
+        utils.page_contains_for_user(self, self.pi_user, url, new_allocation_user.user.username)
+
+    def test_allocationdetail_unknown_panel(self):
+        """Test that an unknown panel is rejected"""
+        response = utils.login_and_get_page(self.client, self.admin_user, self.url + "?panel=unknown")
+        self.assertEqual(response.status_code, 400)
+
+    def test_allocationdetail_panel_access(self):
+        """Test that panels are subject to the same access control as the page"""
+        utils.test_user_cannot_access(self, self.proj_nonallocation_user, self.url + "?panel=users")
+
 
 class AllocationCreateViewTest(AllocationViewBaseTest):
     """Tests for the AllocationCreateView"""
@@ -558,6 +586,35 @@ class AllocationAddUsersViewTest(AllocationViewBaseTest):
         user_response = self.client.get(self.url)
         self.assertTrue(no_permission in str(user_response.content))
 
+    def test_allocationaddusersview_post(self):
+        """Test that the selected users are added with one batch signal"""
+        self.addCleanup(cache.clear)
+        new_users = [ProjectUserFactory(project=self.project).user for _ in range(2)]
+        receiver = Mock()
+        allocation_activate_users.connect(receiver)
+        self.addCleanup(allocation_activate_users.disconnect, receiver)
+
+        self.client.force_login(self.admin_user, backend=BACKEND)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                self.url,
+                {
+                    "userform-TOTAL_FORMS": "2",
+                    "userform-INITIAL_FORMS": "2",
+                    "userform-0-selected": "on",
+                    "userform-1-selected": "on",
+                },
+            )
+
+        allocation_users = AllocationUser.objects.filter(
+            allocation=self.allocation, user__in=new_users, status__name="Active"
+        )
+        self.assertEqual(allocation_users.count(), 2)
+        receiver.assert_called_once()
+        self.assertCountEqual(
+            receiver.call_args.kwargs["allocation_user_pks"], allocation_users.values_list("pk", flat=True)
+        )
+
 
 class AllocationRemoveUsersViewTest(AllocationViewBaseTest):
     """Tests for the AllocationRemoveUsersView"""
@@ -568,6 +625,72 @@ class AllocationRemoveUsersViewTest(AllocationViewBaseTest):
     def test_allocationremoveusersview_access(self):
         self.allocation_access_tstbase(self.url)
 
+    def test_allocationremoveusersview_post(self):
+        """Test that the selected users are removed with one batch signal"""
+        self.addCleanup(cache.clear)
+        AllocationUserStatusChoiceFactory(name="Removed")
+        receiver = Mock()
+        allocation_remove_users.connect(receiver)
+        self.addCleanup(allocation_remove_users.disconnect, receiver)
+
+        self.client.force_login(self.admin_user, backend=BACKEND)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                self.url,
+                {"userform-TOTAL_FORMS": "1", "userform-INITIAL_FORMS": "1", "userform-0-selected": "on"},
+            )
+
+        allocation_user = AllocationUser.objects.get(allocation=self.allocation, user=self.allocation_user)
+        self.assertEqual(allocation_user.status.name, "Removed")
+        self.assertEqual(allocation_user.history.first().history_user, self.admin_user)
+        receiver.assert_called_once()
+        self.assertEqual(receiver.call_args.kwargs["allocation_user_pks"], [allocation_user.pk])
+
+
+class AllocationRenewViewTest(AllocationViewBaseTest):
+    """Tests for the AllocationRenewView"""
+
+    def setUp(self):
+        self.url = f"/allocation/{self.allocation.pk}/renew"
+        self.addCleanup(cache.clear)
+        AllocationStatusChoiceFactory(name="Renewal Requested")
+        AllocationUserStatusChoiceFactory(name="Removed")
+        ProjectUserStatusChoice.objects.get_or_create(name="Removed")
+        self.allocation.end_date = datetime.date.today() + datetime.timedelta(days=30)
+        self.allocation.save()
+
+    def test_allocationrenewview_post_remove_from_project(self):
+        """Test that renewing removes users from the project and its allocations"""
+        other_allocation = Allocation.objects.create(project=self.project, status=self.allocation.status)
+        AllocationUserFactory(allocation=other_allocation, user=self.allocation_user)
+        receiver = Mock()
+        allocation_remove_users.connect(receiver)
+        self.addCleanup(allocation_remove_users.disconnect, receiver)
+
+        self.client.force_login(self.admin_user, backend=BACKEND)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                self.url,
+                {
+                    "userform-TOTAL_FORMS": "1",
+                    "userform-INITIAL_FORMS": "1",
+                    "userform-0-user_status": "remove_from_project",
+                },
+            )
+
+        self.allocation.refresh_from_db()
+        self.assertEqual(self.allocation.status.name, "Renewal Requested")
+        self.assertEqual(
+            set(AllocationUser.objects.filter(user=self.allocation_user).values_list("status__name", flat=True)),
+            {"Removed"},
+        )
+        self.assertEqual(
+            self.project.projectuser_set.get(user=self.allocation_user).status.name,
+            "Removed",
+        )
+        receiver.assert_called_once()
+        self.assertEqual(len(receiver.call_args.kwargs["allocation_user_pks"]), 2)
+
 
 class AllocationRequestListViewTest(AllocationViewBaseTest):
     """Tests for the AllocationRequestListView"""
@@ -792,6 +915,86 @@ class AllocationNoteCreateViewTest(AllocationViewBaseTest):
         self.allocation_access_tstbase(self.url)
 
 
+class AllocationInvoiceListViewTest(AllocationViewBaseTest):
+    """Tests for the AllocationInvoiceListView and AllocationInvoiceExportView"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.url = reverse("allocation-invoice-list")
+        paid = AllocationStatusChoiceFactory(name="Paid")
+        pending = AllocationStatusChoiceFactory(name="Payment Pending")
+        cls.resource = ResourceFactory(name="Invoiced Cluster")
+        cls.school_steinhardt = SchoolFactory(description="Steinhardt")
+        for status, quantity in [(paid, 2), (paid, 3), (pending, 4)]:
+            project = ProjectFactory(title=f"Invoiced project {quantity}", school=cls.school_steinhardt)
+            allocation = Allocation.objects.create(project=project, status=status, quantity=quantity)
+            allocation.resources.add(cls.resource)
+        cls.allocation.status = pending
+        cls.allocation.save()
+
+    def test_allocationinvoicelistview_access(self):
+        self.allocation_access_tstbase(self.url)
+        utils.test_user_cannot_access(self, self.allocation_user, self.url)
+
+    def test_allocationinvoicelistview_summary(self):
+        self.client.force_login(self.admin_user, backend=BACKEND)
+        response = self.client.get(self.url)
+        summary = response.context["summary"]
+        self.assertEqual(
+            list(summary["status"]),
+            [
+                {"name": "Paid", "count": 2, "quantity": 5},
+                {"name": "Payment Pending", "count": 2, "quantity": 5},
+            ],
+        )
+        self.assertEqual(
+            list(summary["resource"]),
+            [
+                {"name": "Invoiced Cluster", "count": 3, "quantity": 9},
+                {"name": "holylfs07/tier1", "count": 1, "quantity": 1},
+            ],
+        )
+        self.assertEqual(
+            list(summary["school"]),
+            [
+                {"name": "Steinhardt", "count": 3, "quantity": 9},
+                {"name": "Tandon School of Engineering", "count": 1, "quantity": 1},
+            ],
+        )
+
+    def test_allocationinvoicelistview_filters_status(self):
+        self.client.force_login(self.admin_user, backend=BACKEND)
+        response = self.client.get(self.url, {"status": "Paid"})
+        self.assertEqual(len(response.context["allocation_list"]), 2)
+        self.assertEqual(response.context["filter_parameters"], "status=Paid")
+
+    def test_allocationinvoicelistview_query_count_is_constant(self):
+        self.client.force_login(self.admin_user, backend=BACKEND)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        for _ in range(3):
+            allocation = Allocation.objects.create(
+                project=ProjectFactory(), status=AllocationStatusChoice.objects.get(name="Paid")
+            )
+            allocation.resources.add(self.resource)
+        with self.assertNumQueries(len(queries)):
+            self.client.get(self.url)
+
+    def test_allocationinvoiceexportview(self):
+        self.client.force_login(self.admin_user, backend=BACKEND)
+        response = self.client.get(reverse("allocation-invoice-export"), {"status": "Payment Pending"})
+        rows = list(csv.reader(line.decode() for line in response.streaming_content))
+        self.assertEqual(rows[0][0], "Allocation ID")
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][0], str(self.allocation.pk))
+        self.assertEqual(rows[1][6], "holylfs07/tier1")
+        self.assertEqual(rows[1][7], "Payment Pending")
+
+    def test_allocationinvoiceexportview_access(self):
+        utils.test_user_cannot_access(self, self.allocation_user, reverse("allocation-invoice-export"))
+
+
 class AllocationChangeDeleteAttributeViewTest(AllocationViewBaseTest):
     """Tests for the AllocationChangeDeleteAttributeView"""
 
@@ -74,6 +74,11 @@ urlpatterns = [
         allocation_views.AllocationInvoiceListView.as_view(),
         name="allocation-invoice-list",
     ),
+    path(
+        "allocation-invoice-list/export",
+        allocation_views.AllocationInvoiceExportView.as_view(),
+        name="allocation-invoice-export",
+    ),
     path(
         "<int:pk>/invoice/",
         allocation_views.AllocationInvoiceDetailView.as_view(),
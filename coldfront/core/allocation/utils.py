@@ -1,21 +1,227 @@
+import functools
 import logging
 
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
 
-from coldfront.core.allocation.models import AllocationUser, AllocationUserStatusChoice
+from coldfront.core.allocation.models import (
+    Allocation,
+    AllocationStatusChoice,
+    AllocationUser,
+    AllocationUserStatusChoice,
+    run_allocation_funcs_on_expire,
+)
+from coldfront.core.allocation.signals import (
+    allocation_activate,
+    allocation_activate_user,
+    allocation_activate_users,
+    allocation_remove_user,
+    allocation_remove_users,
+    allocations_activate,
+)
 from coldfront.core.resource.models import Resource
+from coldfront.core.utils.common import import_from_settings, invalidate_fragment_cache
 
 
 logger = logging.getLogger(__name__)
 
+ALLOCATION_USER_SIGNALS_PER_USER = import_from_settings("ALLOCATION_USER_SIGNALS_PER_USER", False)
+
 
 def set_allocation_user_status_to_error(allocation_user_pk):
     allocation_user_obj = AllocationUser.objects.get(pk=allocation_user_pk)
-    error_status = AllocationUserStatusChoice.objects.get(name="Error")
+    error_status = AllocationUserStatusChoice.objects.get_by_natural_key("Error")
     allocation_user_obj.status = error_status
     allocation_user_obj.save()
 
 
+# Batch and per allocation user signals sent when allocation users are set to a status
+ALLOCATION_USER_STATUS_SIGNALS = {
+    "Active": (allocation_activate_users, allocation_activate_user),
+    "Removed": (allocation_remove_users, allocation_remove_user),
+}
+
+
+def send_allocation_user_signals(batch_signal, signal, allocation_user_pks, sender=None):
+    """Sends batch_signal once for all the allocation users, then signal for each of them when
+    ALLOCATION_USER_SIGNALS_PER_USER
+    """
+    if not allocation_user_pks:
+        return
+    batch_signal.send(sender=sender, allocation_user_pks=allocation_user_pks)
+    if ALLOCATION_USER_SIGNALS_PER_USER:
+        for allocation_user_pk in allocation_user_pks:
+            signal.send(sender=sender, allocation_user_pk=allocation_user_pk)
+
+
+def invalidate_allocations_cache(allocation_objs):
+    """Invalidates the cached page fragments of allocations and their projects, which bulk writes don't do through the
+    model signals
+    """
+
+    for allocation_obj in allocation_objs:
+        invalidate_fragment_cache("allocation", allocation_obj.pk)
+    for project_id in {allocation_obj.project_id for allocation_obj in allocation_objs}:
+        invalidate_fragment_cache("project", project_id)
+
+
+@transaction.atomic
+def set_allocation_users_status(allocation_objs, user_objs, status_name, create=False, history_user=None, sender=None):
+    """Sets the status of users in allocations with bulk writes.
+
+    Params:
+        allocation_objs (list[Allocation]): allocations to change
+        user_objs (list[User]): users to change in each of the allocations
+        status_name (str): name of the AllocationUserStatusChoice to set
+        create (bool): whether to add the users missing from the allocations
+        history_user (User): user recorded in the history of the allocation users
+        sender: sender of the allocation user signals, sent once the transaction commits
+
+    Returns:
+        list[int]: pks of the allocation users set to the status
+    """
+
+    allocation_objs = list(allocation_objs)
+    user_objs = list(user_objs)
+    if not allocation_objs or not user_objs:
+        return []
+
+    status = AllocationUserStatusChoice.objects.get_by_natural_key(status_name)
+    now = timezone.now()
+    allocation_users = {
+        (allocation_user.allocation_id, allocation_user.user_id): allocation_user
+        for allocation_user in AllocationUser.objects.filter(allocation__in=allocation_objs, user__in=user_objs)
+    }
+    for allocation_user in allocation_users.values():
+        allocation_user.status = status
+        allocation_user.modified = now
+    bulk_update_with_history(
+        allocation_users.values(), AllocationUser, ["status", "modified"], default_user=history_user
+    )
+    allocation_user_pks = [allocation_user.pk for allocation_user in allocation_users.values()]
+
+    if create:
+        new_allocation_users = bulk_create_with_history(
+            [
+                AllocationUser(allocation=allocation_obj, user=user_obj, status=status)
+                for allocation_obj in allocation_objs
+                for user_obj in user_objs
+                if (allocation_obj.pk, user_obj.pk) not in allocation_users
+            ],
+            AllocationUser,
+            default_user=history_user,
+        )
+        allocation_user_pks += [allocation_user.pk for allocation_user in new_allocation_users]
+
+    invalidate_allocations_cache(allocation_objs)
+
+    if allocation_user_pks and status_name in ALLOCATION_USER_STATUS_SIGNALS:
+        transaction.on_commit(
+            functools.partial(
+                send_allocation_user_signals,
+                *ALLOCATION_USER_STATUS_SIGNALS[status_name],
+                allocation_user_pks,
+                sender=sender,
+            )
+        )
+
+    return allocation_user_pks
+
+
+@transaction.atomic
+def set_allocations_status(allocation_objs, status_name, history_user=None):
+    """Sets the status of allocations with bulk writes, running ALLOCATION_FUNCS_ON_EXPIRE for the ones that expire once
+    the transaction commits.
+
+    Params:
+        allocation_objs (list[Allocation]): allocations to change
+        status_name (str): name of the AllocationStatusChoice to set
+        history_user (User): user recorded in the history of the allocations
+
+    Returns:
+        list[int]: pks of the allocations whose status changed
+    """
+
+    status = AllocationStatusChoice.objects.get_by_natural_key(status_name)
+    now = timezone.now()
+    changed = [allocation_obj for allocation_obj in allocation_objs if allocation_obj.status_id != status.pk]
+    for allocation_obj in changed:
+        allocation_obj.status = status
+        allocation_obj.modified = now
+        allocation_obj._loaded_status_id = status.pk
+    bulk_update_with_history(changed, Allocation, ["status", "modified"], default_user=history_user)
+
+    invalidate_allocations_cache(changed)
+
+    changed_pks = [allocation_obj.pk for allocation_obj in changed]
+    if status_name == "Expired" and changed_pks:
+        transaction.on_commit(functools.partial(run_allocation_funcs_on_expire, changed_pks))
+    return changed_pks
+
+
+# Allocation users that aren't given access when their allocation is activated
+INACTIVE_ALLOCATION_USER_STATUSES = ["Removed", "Error", "DeclinedEULA", "PendingEULA"]
+
+
+def send_allocation_activate_signals(allocation_pks, sender=None):
+    """Sends allocations_activate once for all the allocations and allocation_activate for each of them, then the
+    activation signals of their allocation users
+    """
+
+    allocations_activate.send(sender=sender, allocation_pks=allocation_pks)
+    for allocation_pk in allocation_pks:
+        allocation_activate.send(sender=sender, allocation_pk=allocation_pk)
+
+    allocation_user_pks = list(
+        AllocationUser.objects.filter(allocation__in=allocation_pks)
+        .exclude(status__name__in=INACTIVE_ALLOCATION_USER_STATUSES)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    if allocation_user_pks:
+        send_allocation_user_signals(
+            allocation_activate_users, allocation_activate_user, allocation_user_pks, sender=sender
+        )
+
+
+@transaction.atomic
+def activate_allocations(allocation_objs, end_date, history_user=None, sender=None):
+    """Sets allocations to Active until end_date with bulk writes. The ones without a start date start today.
+
+    Params:
+        allocation_objs (list[Allocation]): allocations to activate
+        end_date (date): end date of the allocations
+        history_user (User): user recorded in the history of the allocations
+        sender: sender of the activation signals, sent once the transaction commits
+
+    Returns:
+        list[int]: pks of the activated allocations
+    """
+
+    allocation_objs = list(allocation_objs)
+    if not allocation_objs:
+        return []
+
+    status = AllocationStatusChoice.objects.get_by_natural_key("Active")
+    now = timezone.now()
+    for allocation_obj in allocation_objs:
+        allocation_obj.status = status
+        allocation_obj._loaded_status_id = status.pk
+        allocation_obj.start_date = allocation_obj.start_date or now.date()
+        allocation_obj.end_date = end_date
+        allocation_obj.modified = now
+    bulk_update_with_history(
+        allocation_objs, Allocation, ["status", "start_date", "end_date", "modified"], default_user=history_user
+    )
+    invalidate_allocations_cache(allocation_objs)
+
+    allocation_pks = [allocation_obj.pk for allocation_obj in allocation_objs]
+    transaction.on_commit(functools.partial(send_allocation_activate_signals, allocation_pks, sender=sender))
+    return allocation_pks
+
+
 def generate_guauge_data_from_usage(name, value, usage):
     label = "%s: %.2f of %.2f" % (name, usage, value)
 
@@ -1,5 +1,8 @@
+import csv
 import datetime
+import itertools
 import logging
+from collections import defaultdict
 from datetime import date
 
 from coldfront.core.user.models import UserProfile
@@ -9,16 +12,20 @@ from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.db.models import Q
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
 from django.forms import formset_factory
-from django.http import HttpResponseRedirect, JsonResponse
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
 from django.utils.html import format_html
+from django.utils.http import urlencode
 from django.views import View
 from django.views.generic import ListView, TemplateView
 from django.views.generic.edit import CreateView, FormView, UpdateView
+from simple_history.utils import bulk_update_with_history
 
 from coldfront.core.allocation.forms import (
     AllocationAccountForm,
@@ -50,18 +57,24 @@ from coldfront.core.allocation.models import (
     AllocationUser,
     AllocationUserNote,
     AllocationUserStatusChoice,
+    ALLOCATION_RESOURCE_ORDERING,
+    ordered_resources_prefetch,
 )
 from coldfront.core.allocation.signals import (
     allocation_new,
     allocation_activate,
     allocation_activate_user,
+    allocation_activate_users,
     allocation_disable,
     allocation_remove_user,
+    allocation_remove_users,
     allocation_change_approved,
 )
 from coldfront.core.allocation.utils import (
     generate_guauge_data_from_usage,
     get_user_resources,
+    send_allocation_user_signals,
+    set_allocation_users_status,
 )
 from coldfront.core.project.models import (
     Project,
@@ -70,7 +83,8 @@ from coldfront.core.project.models import (
     ProjectUserStatusChoice,
 )
 from coldfront.core.resource.models import Resource
-from coldfront.core.utils.common import get_domain_url, import_from_settings
+from coldfront.core.utils.common import Echo, get_domain_url, get_fragment_cache_version, import_from_settings
+from coldfront.core.utils.signals import coalesce_batch_handlers
 from coldfront.core.utils.mail import (
     send_allocation_admin_email,
     send_allocation_customer_email,
@@ -84,6 +98,7 @@ from django.db import IntegrityError, transaction
 
 ALLOCATION_ENABLE_ALLOCATION_RENEWAL = import_from_settings("ALLOCATION_ENABLE_ALLOCATION_RENEWAL", True)
 ALLOCATION_DEFAULT_ALLOCATION_LENGTH = import_from_settings("ALLOCATION_DEFAULT_ALLOCATION_LENGTH", 365)
+ALLOCATION_DETAIL_CACHE_TIMEOUT = import_from_settings("ALLOCATION_DETAIL_CACHE_TIMEOUT", 600)
 ALLOCATION_ENABLE_CHANGE_REQUESTS_BY_DEFAULT = import_from_settings(
     "ALLOCATION_ENABLE_CHANGE_REQUESTS_BY_DEFAULT", True
 )
@@ -111,11 +126,52 @@ class AllocationDetailView(LoginRequiredMixin, UserPassesTestMixin, TemplateView
         "gpu": "avg_gpu_hours",
         "wait": "avg_waitduration_hours",
     }
+    # Map short keys -> templates of the heavy panels (partial load, fragment cached)
+    PANEL_TEMPLATES = {
+        "users": "allocation/allocation_detail_users.html",
+        "changes": "allocation/allocation_detail_changes.html",
+        "notes": "allocation/allocation_detail_notes.html",
+    }
+
+    def get_allocation(self):
+        """Load the allocation with its related objects once per request."""
+        if not hasattr(self, "_allocation"):
+            self._allocation = get_object_or_404(
+                Allocation.objects.select_related(
+                    "status",
+                    "project__pi",
+                    "project__status",
+                    "project__school",
+                ).prefetch_related(
+                    ordered_resources_prefetch(),
+                    Prefetch(
+                        "allocationattribute_set",
+                        queryset=AllocationAttribute.objects.select_related(
+                            "allocation_attribute_type__attribute_type",
+                            "allocationattributeusage",
+                        ).order_by("allocation_attribute_type__name"),
+                    ),
+                ),
+                pk=self.kwargs.get("pk"),
+            )
+        return self._allocation
+
+    def get_attributes(self):
+        """Return the prefetched attributes the request user is allowed to see."""
+        attributes = self.get_allocation().allocationattribute_set.all()
+        if self.request.user.is_superuser:
+            return list(attributes)
+        return [a for a in attributes if not a.allocation_attribute_type.is_private]
+
+    def get_slurm_account_name(self):
+        for attribute in self.get_allocation().allocationattribute_set.all():
+            if attribute.allocation_attribute_type.name == "slurm_account_name":
+                return attribute.expanded_value()
+        return None
 
     def test_func(self):
         """UserPassesTestMixin Tests"""
-        pk = self.kwargs.get("pk")
-        allocation_obj = get_object_or_404(Allocation, pk=pk)
+        allocation_obj = self.get_allocation()
 
         if self.request.user.has_perm("allocation.can_view_all_allocations"):
             return True
@@ -136,10 +192,7 @@ class AllocationDetailView(LoginRequiredMixin, UserPassesTestMixin, TemplateView
         if not metric_name:
             return HttpResponseBadRequest("Unknown usage metric.")
 
-        pk = self.kwargs.get("pk")
-        allocation = get_object_or_404(Allocation, pk=pk)
-
-        slurm_account_name = allocation.get_attribute("slurm_account_name")
+        slurm_account_name = self.get_slurm_account_name()
         if not slurm_account_name:
             return HttpResponse("<div class='text-muted'>No SLURM account for this allocation.</div>")
 
@@ -159,20 +212,33 @@ class AllocationDetailView(LoginRequiredMixin, UserPassesTestMixin, TemplateView
             logger.exception("Unexpected error rendering usage chart")
             return HttpResponse("<div class='text-muted'>Unable to render usage chart.</div>")
 
+    def _panel_partial(self, panel_key: str):
+        template_name = self.PANEL_TEMPLATES.get(panel_key)
+        if not template_name:
+            return HttpResponseBadRequest("Unknown panel.")
+
+        allocation_obj = self.get_allocation()
+        # Querysets are lazy, so they only hit the database when the cached fragment is missing
+        noteset = allocation_obj.allocationusernote_set.select_related("author")
+        context = {
+            "allocation": allocation_obj,
+            "allocation_users": allocation_obj.allocationuser_set.exclude(status__name__in=["Removed"])
+            .select_related("user", "status")
+            .order_by("user__username"),
+            "allocation_changes": allocation_obj.allocationchangerequest_set.select_related("status").order_by("-pk"),
+            "notes": noteset.all() if self.request.user.is_superuser else noteset.filter(is_private=False),
+            "ALLOCATION_DETAIL_CACHE_TIMEOUT": ALLOCATION_DETAIL_CACHE_TIMEOUT,
+            "fragment_version": get_fragment_cache_version("allocation", allocation_obj.pk),
+        }
+        return render(self.request, template_name, context)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        pk = self.kwargs.get("pk")
-        allocation_obj = get_object_or_404(Allocation, pk=pk)
-        allocation_users = allocation_obj.allocationuser_set.exclude(status__name__in=["Removed"]).order_by(
-            "user__username"
-        )
+        allocation_obj = self.get_allocation()
 
         # set visible usage attributes
-        alloc_attr_set = allocation_obj.get_attribute_set(self.request.user)
-        attributes_with_usage = [a for a in alloc_attr_set if hasattr(a, "allocationattributeusage")]
-        attributes = alloc_attr_set
-
-        allocation_changes = allocation_obj.allocationchangerequest_set.all().order_by("-pk")
+        attributes = self.get_attributes()
+        attributes_with_usage = [a for a in attributes if hasattr(a, "allocationattributeusage")]
 
         guage_data = []
         invalid_attributes = []
@@ -195,35 +261,37 @@ class AllocationDetailView(LoginRequiredMixin, UserPassesTestMixin, TemplateView
         for a in invalid_attributes:
             attributes_with_usage.remove(a)
 
-        context["allocation_users"] = allocation_users
+        context["allocation"] = allocation_obj
         context["guage_data"] = guage_data
         context["attributes_with_usage"] = attributes_with_usage
         context["attributes"] = attributes
-        context["allocation_changes"] = allocation_changes
 
         # Can the user update the project? # See if we would like to let an approver renew allocation; if so, we need to grant access in AllocationRenewView
         context["is_allowed_to_update_project"] = (
             allocation_obj.project.has_perm(self.request.user, ProjectPermission.UPDATE) or self.request.user.is_staff
         )
 
-        noteset = allocation_obj.allocationusernote_set
-        notes = noteset.all() if self.request.user.is_superuser else noteset.filter(is_private=False)
-
-        context["notes"] = notes
+        # Only needed by the deny confirmation, which is shown to staff only
+        if self.request.user.is_superuser or self.request.user.is_staff:
+            context["notes_count"] = allocation_obj.allocationusernote_set.count()
         context["ALLOCATION_ENABLE_ALLOCATION_RENEWAL"] = ALLOCATION_ENABLE_ALLOCATION_RENEWAL
 
         # Keep SLURM value so the template can decide to show loaders for xdmod partial load plots.
-        context["slurm_account_name"] = allocation_obj.get_attribute("slurm_account_name")
+        context["slurm_account_name"] = self.get_slurm_account_name()
         return context
 
     def get(self, request, *args, **kwargs):
-        """Serve partial chart when ?usage=cpu|gpu|wait; otherwise render full page."""
+        """Serve partial chart when ?usage=cpu|gpu|wait, a detail panel when
+        ?panel=users|changes|notes; otherwise render full page."""
         usage_key = request.GET.get("usage")
         if usage_key:
             return self._usage_partial(usage_key)
 
-        pk = self.kwargs.get("pk")
-        allocation_obj = get_object_or_404(Allocation, pk=pk)
+        panel_key = request.GET.get("panel")
+        if panel_key:
+            return self._panel_partial(panel_key)
+
+        allocation_obj = self.get_allocation()
 
         initial_data = {
             "status": allocation_obj.status,
@@ -241,12 +309,11 @@ class AllocationDetailView(LoginRequiredMixin, UserPassesTestMixin, TemplateView
 
         context = self.get_context_data()
         context["form"] = form
-        context["allocation"] = allocation_obj
         return self.render_to_response(context)
 
     def post(self, request, *args, **kwargs):
         pk = self.kwargs.get("pk")
-        allocation_obj = get_object_or_404(Allocation, pk=pk)
+        allocation_obj = self.get_allocation()
         if not self.request.user.is_superuser and not self.request.user.is_staff:
             messages.success(request, "You do not have permission to update the allocation")
             return HttpResponseRedirect(reverse("allocation-detail", kwargs={"pk": pk}))
@@ -264,7 +331,6 @@ class AllocationDetailView(LoginRequiredMixin, UserPassesTestMixin, TemplateView
         if not form.is_valid():
             context = self.get_context_data()
             context["form"] = form
-            context["allocation"] = allocation_obj
             return render(request, self.template_name, context)
 
         action = request.POST.get("action")
@@ -284,9 +350,9 @@ class AllocationDetailView(LoginRequiredMixin, UserPassesTestMixin, TemplateView
             allocation_obj.status = form_data.get("status")
 
         if "approve" in action:
-            allocation_obj.status = AllocationStatusChoice.objects.get(name="Active")
+            allocation_obj.status = AllocationStatusChoice.objects.get_by_natural_key("Active")
         elif action == "deny":
-            allocation_obj.status = AllocationStatusChoice.objects.get(name="Denied")
+            allocation_obj.status = AllocationStatusChoice.objects.get_by_natural_key("Denied")
 
         if old_status != "Active" == allocation_obj.status.name:
             if not allocation_obj.start_date:
@@ -299,9 +365,16 @@ class AllocationDetailView(LoginRequiredMixin, UserPassesTestMixin, TemplateView
             allocation_obj.save()
 
             allocation_activate.send(sender=self.__class__, allocation_pk=allocation_obj.pk)
-            allocation_users = allocation_obj.allocationuser_set.exclude(status__name__in=["Removed", "Error"])
-            for allocation_user in allocation_users:
-                allocation_activate_user.send(sender=self.__class__, allocation_user_pk=allocation_user.pk)
+            send_allocation_user_signals(
+                allocation_activate_users,
+                allocation_activate_user,
+                list(
+                    allocation_obj.allocationuser_set.exclude(status__name__in=["Removed", "Error"]).values_list(
+                        "pk", flat=True
+                    )
+                ),
+                sender=self.__class__,
+            )
 
             send_allocation_customer_email(
                 allocation_obj,
@@ -319,9 +392,16 @@ class AllocationDetailView(LoginRequiredMixin, UserPassesTestMixin, TemplateView
 
             if allocation_obj.status.name == ["Denied", "Revoked"]:
                 allocation_disable.send(sender=self.__class__, allocation_pk=allocation_obj.pk)
-                allocation_users = allocation_obj.allocationuser_set.exclude(status__name__in=["Removed", "Error"])
-                for allocation_user in allocation_users:
-                    allocation_remove_user.send(sender=self.__class__, allocation_user_pk=allocation_user.pk)
+                send_allocation_user_signals(
+                    allocation_remove_users,
+                    allocation_remove_user,
+                    list(
+                        allocation_obj.allocationuser_set.exclude(status__name__in=["Removed", "Error"]).values_list(
+                            "pk", flat=True
+                        )
+                    ),
+                    sender=self.__class__,
+                )
             if allocation_obj.status.name == "Denied":
                 send_allocation_customer_email(
                     allocation_obj,
@@ -632,9 +712,9 @@ class AllocationCreateView(LoginRequiredMixin, UserPassesTestMixin, FormView):
             users.append(project_obj.pi)
 
         if INVOICE_ENABLED and resource_obj.requires_payment:
-            allocation_status_obj = AllocationStatusChoice.objects.get(name=INVOICE_DEFAULT_STATUS)
+            allocation_status_obj = AllocationStatusChoice.objects.get_by_natural_key(INVOICE_DEFAULT_STATUS)
         else:
-            allocation_status_obj = AllocationStatusChoice.objects.get(name="New")
+            allocation_status_obj = AllocationStatusChoice.objects.get_by_natural_key("New")
 
         allocation_obj = Allocation.objects.create(
             project=project_obj,
@@ -684,7 +764,7 @@ class AllocationCreateView(LoginRequiredMixin, UserPassesTestMixin, FormView):
         for linked_resource in resource_obj.linked_resources.all():
             allocation_obj.resources.add(linked_resource)
 
-        allocation_user_active_status = AllocationUserStatusChoice.objects.get(name="Active")
+        allocation_user_active_status = AllocationUserStatusChoice.objects.get_by_natural_key("Active")
         for user in users:
             AllocationUser.objects.create(
                 allocation=allocation_obj,
@@ -795,27 +875,16 @@ class AllocationAddUsersView(LoginRequiredMixin, UserPassesTestMixin, TemplateVi
         users_added_count = 0
 
         if formset.is_valid():
-            allocation_user_active_status_choice = AllocationUserStatusChoice.objects.get(name="Active")
-
-            for form in formset:
-                user_form_data = form.cleaned_data
-                if user_form_data["selected"]:
-                    users_added_count += 1
-
-                    user_obj = get_user_model().objects.get(username=user_form_data.get("username"))
-
-                    if allocation_obj.allocationuser_set.filter(user=user_obj).exists():
-                        allocation_user_obj = allocation_obj.allocationuser_set.get(user=user_obj)
-                        allocation_user_obj.status = allocation_user_active_status_choice
-                        allocation_user_obj.save()
-                    else:
-                        allocation_user_obj = AllocationUser.objects.create(
-                            allocation=allocation_obj,
-                            user=user_obj,
-                            status=allocation_user_active_status_choice,
-                        )
-
-                    allocation_activate_user.send(sender=self.__class__, allocation_user_pk=allocation_user_obj.pk)
+            usernames = [form.cleaned_data.get("username") for form in formset if form.cleaned_data["selected"]]
+            users_added_count = len(usernames)
+            set_allocation_users_status(
+                [allocation_obj],
+                get_user_model().objects.filter(username__in=usernames),
+                "Active",
+                create=True,
+                history_user=request.user,
+                sender=self.__class__,
+            )
 
             user_plural = "user" if users_added_count == 1 else "users"
             messages.success(request, f"Added {users_added_count} {user_plural} to allocation.")
@@ -909,20 +978,15 @@ class AllocationRemoveUsersView(LoginRequiredMixin, UserPassesTestMixin, Templat
         remove_users_count = 0
 
         if formset.is_valid():
-            allocation_user_removed_status_choice = AllocationUserStatusChoice.objects.get(name="Removed")
-            for form in formset:
-                user_form_data = form.cleaned_data
-                if user_form_data["selected"]:
-                    remove_users_count += 1
-
-                    user_obj = get_user_model().objects.get(username=user_form_data.get("username"))
-                    if allocation_obj.project.pi == user_obj:
-                        continue
-
-                    allocation_user_obj = allocation_obj.allocationuser_set.get(user=user_obj)
-                    allocation_user_obj.status = allocation_user_removed_status_choice
-                    allocation_user_obj.save()
-                    allocation_remove_user.send(sender=self.__class__, allocation_user_pk=allocation_user_obj.pk)
+            usernames = [form.cleaned_data.get("username") for form in formset if form.cleaned_data["selected"]]
+            remove_users_count = len(usernames)
+            set_allocation_users_status(
+                [allocation_obj],
+                get_user_model().objects.filter(username__in=usernames).exclude(pk=allocation_obj.project.pi_id),
+                "Removed",
+                history_user=request.user,
+                sender=self.__class__,
+            )
 
             user_plural = "user" if remove_users_count == 1 else "users"
             messages.success(request, f"Removed {remove_users_count} {user_plural} from allocation.")
@@ -1126,7 +1190,7 @@ class AllocationRequestListView(LoginRequiredMixin, UserPassesTestMixin, Templat
                 messages.warning(self.request, "No associated profile found.")
                 allocation_list = Allocation.objects.none()
 
-        context["allocation_status_active"] = AllocationStatusChoice.objects.get(name="Active")
+        context["allocation_status_active"] = AllocationStatusChoice.objects.get_by_natural_key("Active")
         context["allocation_list"] = allocation_list
         context["PROJECT_ENABLE_PROJECT_REVIEW"] = PROJECT_ENABLE_PROJECT_REVIEW
         context["ALLOCATION_DEFAULT_ALLOCATION_LENGTH"] = ALLOCATION_DEFAULT_ALLOCATION_LENGTH
@@ -1229,55 +1293,63 @@ class AllocationRenewView(LoginRequiredMixin, UserPassesTestMixin, TemplateView)
         formset = formset_factory(AllocationReviewUserForm, max_num=len(users_in_allocation))
         formset = formset(request.POST, initial=users_in_allocation, prefix="userform")
 
-        allocation_renewal_requested_status_choice = AllocationStatusChoice.objects.get(name="Renewal Requested")
-        allocation_user_removed_status_choice = AllocationUserStatusChoice.objects.get(name="Removed")
-        project_user_remove_status_choice = ProjectUserStatusChoice.objects.get(name="Removed")
+        allocation_renewal_requested_status_choice = AllocationStatusChoice.objects.get_by_natural_key("Renewal Requested")
+        project_user_remove_status_choice = ProjectUserStatusChoice.objects.get_by_natural_key("Removed")
 
         allocation_obj.status = allocation_renewal_requested_status_choice
         allocation_obj.save()
 
         if not users_in_allocation or formset.is_valid():
             if users_in_allocation:
+                users_by_status = defaultdict(list)
+                users = get_user_model().objects.in_bulk(
+                    [form.cleaned_data.get("username") for form in formset], field_name="username"
+                )
                 for form in formset:
-                    user_form_data = form.cleaned_data
-                    user_obj = get_user_model().objects.get(username=user_form_data.get("username"))
-                    user_status = user_form_data.get("user_status")
-
-                    if user_status == "keep_in_project_only":
-                        allocation_user_obj = allocation_obj.allocationuser_set.get(user=user_obj)
-                        allocation_user_obj.status = allocation_user_removed_status_choice
-                        allocation_user_obj.save()
-
-                        allocation_remove_user.send(
+                    user_obj = users.get(form.cleaned_data.get("username"))
+                    if user_obj:
+                        users_by_status[form.cleaned_data.get("user_status")].append(user_obj)
+                users_to_remove_from_project = users_by_status["remove_from_project"]
+
+                # Call the batch handlers once for the users removed from this and the other allocations
+                with coalesce_batch_handlers():
+                    set_allocation_users_status(
+                        [allocation_obj],
+                        users_by_status["keep_in_project_only"],
+                        "Removed",
+                        history_user=request.user,
+                        sender=self.__class__,
+                    )
+                    if users_to_remove_from_project:
+                        set_allocation_users_status(
+                            allocation_obj.project.allocation_set.filter(
+                                status__name__in=(
+                                    "Active",
+                                    "Denied",
+                                    "New",
+                                    "Paid",
+                                    "Payment Pending",
+                                    "Payment Requested",
+                                    "Payment Declined",
+                                    "Renewal Requested",
+                                    "Unpaid",
+                                )
+                            ),
+                            users_to_remove_from_project,
+                            "Removed",
+                            history_user=request.user,
                             sender=self.__class__,
-                            allocation_user_pk=allocation_user_obj.pk,
                         )
-
-                    elif user_status == "remove_from_project":
-                        for active_allocation in allocation_obj.project.allocation_set.filter(
-                            status__name__in=(
-                                "Active",
-                                "Denied",
-                                "New",
-                                "Paid",
-                                "Payment Pending",
-                                "Payment Requested",
-                                "Payment Declined",
-                                "Renewal Requested",
-                                "Unpaid",
-                            )
-                        ):
-                            allocation_user_obj = active_allocation.allocationuser_set.get(user=user_obj)
-                            allocation_user_obj.status = allocation_user_removed_status_choice
-                            allocation_user_obj.save()
-                            allocation_remove_user.send(
-                                sender=self.__class__,
-                                allocation_user_pk=allocation_user_obj.pk,
-                            )
-
-                        project_user_obj = ProjectUser.objects.get(project=allocation_obj.project, user=user_obj)
-                        project_user_obj.status = project_user_remove_status_choice
-                        project_user_obj.save()
+                        project_users = list(
+                            allocation_obj.project.projectuser_set.filter(user__in=users_to_remove_from_project)
+                        )
+                        now = timezone.now()
+                        for project_user_obj in project_users:
+                            project_user_obj.status = project_user_remove_status_choice
+                            project_user_obj.modified = now
+                        bulk_update_with_history(
+                            project_users, ProjectUser, ["status", "modified"], default_user=request.user
+                        )
 
             send_allocation_admin_email(
                 allocation_obj,
@@ -1293,10 +1365,74 @@ class AllocationRenewView(LoginRequiredMixin, UserPassesTestMixin, TemplateView)
         return HttpResponseRedirect(reverse("project-detail", kwargs={"pk": allocation_obj.project.pk}))
 
 
+INVOICE_STATUSES = [
+    "Paid",
+    "Payment Pending",
+    "Payment Requested",
+    "Payment Declined",
+]
+
+INVOICE_EXPORT_HEADER = [
+    "Allocation ID",
+    "Project",
+    "School",
+    "PI Username",
+    "PI Name",
+    "PI Email",
+    "Resources",
+    "Status",
+    "Quantity",
+    "Start Date",
+    "End Date",
+]
+
+
+def get_invoice_allocations(status=None):
+    """
+    Params:
+        status (str): only return the allocations with this status, one of INVOICE_STATUSES
+
+    Returns:
+        QuerySet: the allocations that require payment, with everything the invoice list and export show
+    """
+
+    allocations = Allocation.objects.filter(status__name__in=INVOICE_STATUSES)
+    if status:
+        allocations = allocations.filter(status__name=status)
+    return (
+        allocations.select_related("status", "project__pi", "project__school")
+        .prefetch_related(ordered_resources_prefetch())
+        .order_by("pk")
+    )
+
+
+def get_invoice_summary(allocations):
+    """
+    Params:
+        allocations (QuerySet): allocations that require payment
+
+    Returns:
+        dict: the number of allocations and their total quantity per status, parent resource and school, counted in the
+        database
+    """
+
+    parent_resource = (
+        Resource.objects.filter(allocation=OuterRef("pk")).order_by(*ALLOCATION_RESOURCE_ORDERING).values("name")[:1]
+    )
+    allocations = allocations.order_by().annotate(parent_resource=Subquery(parent_resource))
+    totals = {"count": Count("pk"), "quantity": Coalesce(Sum("quantity"), 0)}
+    return {
+        "status": allocations.values(name=F("status__name")).annotate(**totals).order_by("name"),
+        "resource": allocations.values(name=F("parent_resource")).annotate(**totals).order_by("name"),
+        "school": allocations.values(name=F("project__school__description")).annotate(**totals).order_by("name"),
+    }
+
+
 class AllocationInvoiceListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     model = Allocation
     template_name = "allocation/allocation_invoice_list.html"
     context_object_name = "allocation_list"
+    paginate_by = 25
 
     def test_func(self):
         """UserPassesTestMixin Tests"""
@@ -1309,16 +1445,50 @@ class AllocationInvoiceListView(LoginRequiredMixin, UserPassesTestMixin, ListVie
         messages.error(self.request, "You do not have permission to manage invoices.")
         return False
 
+    def get_status(self):
+        status = self.request.GET.get("status")
+        return status if status in INVOICE_STATUSES else None
+
     def get_queryset(self):
-        allocations = Allocation.objects.filter(
-            status__name__in=[
-                "Paid",
-                "Payment Pending",
-                "Payment Requested",
-                "Payment Declined",
+        return get_invoice_allocations(self.get_status())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        status = self.get_status()
+        context["statuses"] = INVOICE_STATUSES
+        context["selected_status"] = status
+        context["filter_parameters"] = urlencode({"status": status}) if status else ""
+        context["summary"] = get_invoice_summary(self.object_list)
+        return context
+
+
+class AllocationInvoiceExportView(AllocationInvoiceListView):
+    def get(self, request, *args, **kwargs):
+        rows = (
+            [
+                allocation.pk,
+                allocation.project.title,
+                allocation.project.school.description if allocation.project.school else "",
+                allocation.project.pi.username,
+                allocation.project.pi.get_full_name(),
+                allocation.project.pi.email,
+                allocation.get_resources_as_string,
+                allocation.status.name,
+                allocation.quantity,
+                allocation.start_date,
+                allocation.end_date,
             ]
+            # A chunk_size lets the iterator apply the resources prefetch to each chunk
+            for allocation in self.get_queryset().iterator(chunk_size=500)
+        )
+        pseudo_buffer = Echo()
+        writer = csv.writer(pseudo_buffer)
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in itertools.chain([INVOICE_EXPORT_HEADER], rows)),
+            content_type="text/csv",
         )
-        return allocations
+        response["Content-Disposition"] = 'attachment; filename="invoices.csv"'
+        return response
 
 
 # this is the view class thats rendering allocation_invoice_detail.
@@ -1339,11 +1509,18 @@ class AllocationInvoiceDetailView(LoginRequiredMixin, UserPassesTestMixin, Templ
         messages.error(self.request, "You do not have permission to view invoices.")
         return False
 
+    def get_allocation(self):
+        """Fetches the allocation once per request"""
+        if not hasattr(self, "allocation_obj"):
+            self.allocation_obj = get_object_or_404(
+                Allocation.objects.select_related("status", "project__pi"), pk=self.kwargs.get("pk")
+            )
+        return self.allocation_obj
+
     def get_context_data(self, **kwargs):
         """Create all the variables for allocation_invoice_detail.html"""
         context = super().get_context_data(**kwargs)
-        pk = self.kwargs.get("pk")
-        allocation_obj = get_object_or_404(Allocation, pk=pk)
+        allocation_obj = self.get_allocation()
         allocation_users = allocation_obj.allocationuser_set.exclude(status__name__in=["Removed"]).order_by(
             "user__username"
         )
@@ -1394,8 +1571,7 @@ class AllocationInvoiceDetailView(LoginRequiredMixin, UserPassesTestMixin, Templ
         return context
 
     def get(self, request, *args, **kwargs):
-        pk = self.kwargs.get("pk")
-        allocation_obj = get_object_or_404(Allocation, pk=pk)
+        allocation_obj = self.get_allocation()
 
         initial_data = {
             "status": allocation_obj.status,
@@ -1411,7 +1587,7 @@ class AllocationInvoiceDetailView(LoginRequiredMixin, UserPassesTestMixin, Templ
 
     def post(self, request, *args, **kwargs):
         pk = self.kwargs.get("pk")
-        allocation_obj = get_object_or_404(Allocation, pk=pk)
+        allocation_obj = self.get_allocation()
 
         initial_data = {
             "status": allocation_obj.status,
@@ -1752,7 +1928,7 @@ class AllocationChangeDetailView(LoginRequiredMixin, UserPassesTestMixin, FormVi
         if action == "deny":
             allocation_change_obj.notes = notes
 
-            allocation_change_status_denied_obj = AllocationChangeStatusChoice.objects.get(name="Denied")
+            allocation_change_status_denied_obj = AllocationChangeStatusChoice.objects.get_by_natural_key("Denied")
             allocation_change_obj.status = allocation_change_status_denied_obj
 
             allocation_change_obj.save()
@@ -1819,7 +1995,7 @@ class AllocationChangeDetailView(LoginRequiredMixin, UserPassesTestMixin, FormVi
             messages.success(request, "Allocation change request updated!")
 
         elif action == "approve":
-            allocation_change_status_active_obj = AllocationChangeStatusChoice.objects.get(name="Approved")
+            allocation_change_status_active_obj = AllocationChangeStatusChoice.objects.get_by_natural_key("Approved")
             allocation_change_obj.status = allocation_change_status_active_obj
 
             if allocation_change_obj.end_date_extension > 0:
@@ -2054,7 +2230,7 @@ class AllocationChangeView(LoginRequiredMixin, UserPassesTestMixin, FormView):
 
         end_date_extension = form_data.get("end_date_extension")
         justification = form_data.get("justification")
-        change_request_status_obj = AllocationChangeStatusChoice.objects.get(name="Pending")
+        change_request_status_obj = AllocationChangeStatusChoice.objects.get_by_natural_key("Pending")
 
         allocation_change_request_obj = AllocationChangeRequest.objects.create(
             allocation=allocation_obj,
@@ -5,7 +5,7 @@
 from django import forms
 from django.forms import ModelForm
 
-from coldfront.core.grant.models import Grant
+from coldfront.core.grant.models import Grant, GrantFundingAgency
 from coldfront.core.utils.common import import_from_settings
 
 CENTER_NAME = import_from_settings("CENTER_NAME")
@@ -43,23 +43,33 @@ class GrantDeleteForm(forms.Form):
     selected = forms.BooleanField(initial=False, required=False)
 
 
-class GrantDownloadForm(forms.Form):
-    pk = forms.IntegerField(required=False, disabled=True)
-    title = forms.CharField(required=False, disabled=True)
-    project_pk = forms.IntegerField(required=False, disabled=True)
-    pi_first_name = forms.CharField(required=False, disabled=True)
-    pi_last_name = forms.CharField(required=False, disabled=True)
-    role = forms.CharField(required=False, disabled=True)
-    grant_pi = forms.CharField(required=False, disabled=True)
-    total_amount_awarded = forms.FloatField(required=False, disabled=True)
-    funding_agency = forms.CharField(required=False, disabled=True)
-    grant_number = forms.CharField(required=False, disabled=True)
-    grant_start = forms.DateField(required=False, disabled=True)
-    grant_end = forms.DateField(required=False, disabled=True)
-    percent_credit = forms.FloatField(required=False, disabled=True)
-    direct_funding = forms.FloatField(required=False, disabled=True)
-    selected = forms.BooleanField(initial=False, required=False)
+class GrantReportFilterForm(forms.Form):
+    funding_agency = forms.ModelChoiceField(
+        label="Funding Agency",
+        queryset=GrantFundingAgency.objects.order_by("name"),
+        required=False,
+    )
+    role = forms.ChoiceField(label="Faculty Role", choices=(("", "---------"),) + Grant.ROLE_CHOICES, required=False)
+    active_from = forms.DateField(
+        label="Active From",
+        widget=forms.DateInput(attrs={"class": "datepicker"}),
+        required=False,
+    )
+    active_until = forms.DateField(
+        label="Active Until",
+        widget=forms.DateInput(attrs={"class": "datepicker"}),
+        required=False,
+    )
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields["pk"].widget = forms.HiddenInput()
+    def filter(self, grants):
+        """Restrict grants to the ones matching the cleaned filters"""
+        data = self.cleaned_data
+        if data.get("funding_agency"):
+            grants = grants.filter(funding_agency=data["funding_agency"])
+        if data.get("role"):
+            grants = grants.filter(role=data["role"])
+        if data.get("active_from"):
+            grants = grants.filter(grant_end__gte=data["active_from"])
+        if data.get("active_until"):
+            grants = grants.filter(grant_start__lte=data["active_until"])
+        return grants
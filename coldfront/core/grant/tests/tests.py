@@ -3,12 +3,16 @@ import datetime
 from dateutil.relativedelta import relativedelta
 
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
 from coldfront.core.test_helpers.factories import (
     GrantFundingAgencyFactory,
     GrantStatusChoiceFactory,
     ProjectFactory,
+    UserFactory,
 )
 
 from coldfront.core.grant.models import Grant
@@ -276,3 +280,63 @@ class TestGrant(TestCase):
         with self.assertRaises(Grant.DoesNotExist):
             Grant.objects.get(pk=grant_obj.pk)
         self.assertEqual(0, len(Grant.objects.all()))
+
+
+class TestGrantReport(TestCase):
+    """Tests for filtering and exporting the grant report"""
+
+    def setUp(self):
+        self.user = UserFactory(is_superuser=True)
+        self.client.force_login(self.user, backend="django.contrib.auth.backends.ModelBackend")
+        project = ProjectFactory()
+        status = GrantStatusChoiceFactory(name="Active")
+        self.nsf = GrantFundingAgencyFactory(name="National Science Foundation (NSF)")
+        nih = GrantFundingAgencyFactory(name="National Institutes of Health (NIH)")
+        today = datetime.date.today()
+        self.grants = [
+            Grant.objects.create(
+                project=project,
+                title=f"Grant {index}",
+                grant_number=f"00{index}",
+                role=role,
+                grant_pi_full_name="Grant PI",
+                funding_agency=agency,
+                grant_start=today + relativedelta(years=index),
+                grant_end=today + relativedelta(years=index + 1),
+                percent_credit=10.0,
+                direct_funding=1000,
+                total_amount_awarded=1000 * (index + 1),
+                status=status,
+            )
+            for index, (role, agency) in enumerate([("PI", self.nsf), ("CoPI", nih), ("CoPI", self.nsf)])
+        ]
+
+    def export(self, query="", selected=()):
+        url = reverse("grant-report") + query
+        response = self.client.post(url, {"grantdownloadform-selected": [grant.pk for grant in selected]})
+        self.assertEqual(response.status_code, 200)
+        return [line.split(",")[0] for line in b"".join(response.streaming_content).decode().splitlines()[1:]]
+
+    def test_report_filters(self):
+        """Test that the report lists only the grants matching the filters"""
+        response = self.client.get(reverse("grant-report"), {"funding_agency": self.nsf.pk, "role": "CoPI"})
+        self.assertEqual([grant["title"] for grant in response.context["grants"]], ["Grant 2"])
+
+    def test_export_selected(self):
+        """Test that only the selected grants are exported"""
+        self.assertEqual(self.export(selected=self.grants[:2]), ["Grant 1", "Grant 0"])
+
+    def test_export_filtered(self):
+        """Test that every grant matching the filters is exported when none is selected"""
+        self.assertEqual(self.export(), ["Grant 2", "Grant 1", "Grant 0"])
+        active_from = (datetime.date.today() + relativedelta(years=2, days=1)).isoformat()
+        self.assertEqual(self.export(f"?active_from={active_from}"), ["Grant 2"])
+        self.assertEqual(self.export(f"?funding_agency={self.nsf.pk}", selected=self.grants[1:]), ["Grant 2"])
+
+    def test_export_query_count(self):
+        """Test that the export reads the grants in a constant number of queries"""
+        with CaptureQueriesContext(connection) as queries:
+            self.export(selected=self.grants)
+        with CaptureQueriesContext(connection) as more_queries:
+            self.export(selected=self.grants[:1])
+        self.assertEqual(len(queries), len(more_queries))
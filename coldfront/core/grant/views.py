@@ -1,17 +1,20 @@
 import csv
+import itertools
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Concat
 from django.forms import formset_factory
 from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.views import View
-from django.views.generic import FormView, ListView, TemplateView
+from django.views.generic import FormView, TemplateView
 from django.views.generic.edit import UpdateView
 
 from coldfront.core.utils.common import Echo
-from coldfront.core.grant.forms import GrantDeleteForm, GrantDownloadForm, GrantForm
+from coldfront.core.grant.forms import GrantDeleteForm, GrantForm, GrantReportFilterForm
 from coldfront.core.grant.models import Grant
 from coldfront.core.project.models import Project
 
@@ -215,7 +218,49 @@ class GrantDeleteGrantsView(LoginRequiredMixin, UserPassesTestMixin, TemplateVie
         return reverse("project-detail", kwargs={"pk": self.object.project.id})
 
 
-class GrantReportView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+GRANT_REPORT_HEADER = [
+    "Grant Title",
+    "Project PI",
+    "Faculty Role",
+    "Grant PI",
+    "Total Amount Awarded",
+    "Funding Agency",
+    "Grant Number",
+    "Start Date",
+    "End Date",
+    "Percent Credit",
+    "Direct Funding",
+]
+
+
+def grants_csv_response(grants):
+    """Stream grants as CSV rows read from the database in chunks"""
+    rows = grants.annotate(
+        project_pi=Concat("project__pi__first_name", Value(" "), "project__pi__last_name"),
+    ).values_list(
+        "title",
+        "project_pi",
+        "role",
+        "grant_pi_full_name",
+        "total_amount_awarded",
+        "funding_agency__name",
+        "grant_number",
+        "grant_start",
+        "grant_end",
+        "percent_credit",
+        "direct_funding",
+    )
+    pseudo_buffer = Echo()
+    writer = csv.writer(pseudo_buffer)
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in itertools.chain([GRANT_REPORT_HEADER], rows.iterator())),
+        content_type="text/csv",
+    )
+    response["Content-Disposition"] = 'attachment; filename="grants.csv"'
+    return response
+
+
+class GrantReportView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     template_name = "grant/grant_report_list.html"
 
     def test_func(self):
@@ -228,116 +273,62 @@ class GrantReportView(LoginRequiredMixin, UserPassesTestMixin, ListView):
 
         messages.error(self.request, "You do not have permission to view all grants.")
 
-    def get_grants(self):
-        grants = Grant.objects.prefetch_related("project", "project__pi").all().order_by("-total_amount_awarded")
-        grants = [
-            {
-                "pk": grant.pk,
-                "title": grant.title,
-                "project_pk": grant.project.pk,
-                "pi_first_name": grant.project.pi.first_name,
-                "pi_last_name": grant.project.pi.last_name,
-                "role": grant.role,
-                "grant_pi": grant.grant_pi,
-                "total_amount_awarded": grant.total_amount_awarded,
-                "funding_agency": grant.funding_agency,
-                "grant_number": grant.grant_number,
-                "grant_start": grant.grant_start,
-                "grant_end": grant.grant_end,
-                "percent_credit": grant.percent_credit,
-                "direct_funding": grant.direct_funding,
-            }
-            for grant in grants
-        ]
+    def get_filter_form(self):
+        if not hasattr(self, "_filter_form"):
+            self._filter_form = GrantReportFilterForm(self.request.GET or None)
+        return self._filter_form
 
+    def get_grants(self):
+        grants = Grant.objects.order_by("-total_amount_awarded")
+        filter_form = self.get_filter_form()
+        if filter_form.is_valid():
+            grants = filter_form.filter(grants)
         return grants
 
-    def get(self, request, *args, **kwargs):
-        context = {}
-        grants = self.get_grants()
-
-        if grants:
-            formset = formset_factory(GrantDownloadForm, max_num=len(grants))
-            formset = formset(initial=grants, prefix="grantdownloadform")
-            context["formset"] = formset
-        return render(request, self.template_name, context)
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["filter_form"] = self.get_filter_form()
+        context["filter_parameters"] = self.request.GET.urlencode()
+        if self.request.GET:
+            context["expand_accordion"] = "show"
+        context["grants"] = self.get_grants().values(
+            "pk",
+            "title",
+            "project_id",
+            "role",
+            "total_amount_awarded",
+            "grant_number",
+            "grant_start",
+            "grant_end",
+            "percent_credit",
+            "direct_funding",
+            funding_agency_name=F("funding_agency__name"),
+            pi_first_name=F("project__pi__first_name"),
+            pi_last_name=F("project__pi__last_name"),
+            grant_pi=Case(
+                When(
+                    role="PI",
+                    then=Concat("project__pi__first_name", Value(" "), "project__pi__last_name"),
+                ),
+                default="grant_pi_full_name",
+            ),
+        )
+        return context
 
     def post(self, request, *args, **kwargs):
-        grants = self.get_grants()
-
-        formset = formset_factory(GrantDownloadForm, max_num=len(grants))
-        formset = formset(request.POST, initial=grants, prefix="grantdownloadform")
-
-        header = [
-            "Grant Title",
-            "Project PI",
-            "Faculty Role",
-            "Grant PI",
-            "Total Amount Awarded",
-            "Funding Agency",
-            "Grant Number",
-            "Start Date",
-            "End Date",
-            "Percent Credit",
-            "Direct Funding",
-        ]
-        rows = []
-        grants_selected_count = 0
-
-        if formset.is_valid():
-            for form in formset:
-                form_data = form.cleaned_data
-                if form_data["selected"]:
-                    grant = get_object_or_404(Grant, pk=form_data["pk"])
-
-                    row = [
-                        grant.title,
-                        " ".join((grant.project.pi.first_name, grant.project.pi.last_name)),
-                        grant.role,
-                        grant.grant_pi_full_name,
-                        grant.total_amount_awarded,
-                        grant.funding_agency,
-                        grant.grant_number,
-                        grant.grant_start,
-                        grant.grant_end,
-                        grant.percent_credit,
-                        grant.direct_funding,
-                    ]
-
-                    rows.append(row)
-                    grants_selected_count += 1
-
-            if grants_selected_count == 0:
-                grants = (
-                    Grant.objects.prefetch_related("project", "project__pi").all().order_by("-total_amount_awarded")
-                )
-                for grant in grants:
-                    row = [
-                        grant.title,
-                        " ".join((grant.project.pi.first_name, grant.project.pi.last_name)),
-                        grant.role,
-                        grant.grant_pi_full_name,
-                        grant.total_amount_awarded,
-                        grant.funding_agency,
-                        grant.grant_number,
-                        grant.grant_start,
-                        grant.grant_end,
-                        grant.percent_credit,
-                        grant.direct_funding,
-                    ]
-                    rows.append(row)
-
-            rows.insert(0, header)
-            pseudo_buffer = Echo()
-            writer = csv.writer(pseudo_buffer)
-            response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type="text/csv")
-            response["Content-Disposition"] = 'attachment; filename="grants.csv"'
-            return response
-        else:
-            for error in formset.errors:
+        filter_form = self.get_filter_form()
+        if filter_form.is_bound and not filter_form.is_valid():
+            for error in filter_form.errors.values():
                 messages.error(request, error)
             return HttpResponseRedirect(reverse("grant-report"))
 
+        grants = self.get_grants()
+        # Export the selected grants, or every grant matching the filters when none is selected
+        selected_pks = [pk for pk in request.POST.getlist("grantdownloadform-selected") if pk.isdigit()]
+        if selected_pks:
+            grants = grants.filter(pk__in=selected_pks)
+        return grants_csv_response(grants)
+
 
 class GrantDownloadView(LoginRequiredMixin, UserPassesTestMixin, View):
     login_url = "/"
@@ -353,41 +344,4 @@ class GrantDownloadView(LoginRequiredMixin, UserPassesTestMixin, View):
         messages.error(self.request, "You do not have permission to download all grants.")
 
     def get(self, request):
-        header = [
-            "Grant Title",
-            "Project PI",
-            "Faculty Role",
-            "Grant PI",
-            "Total Amount Awarded",
-            "Funding Agency",
-            "Grant Number",
-            "Start Date",
-            "End Date",
-            "Percent Credit",
-            "Direct Funding",
-        ]
-
-        rows = []
-        grants = Grant.objects.prefetch_related("project", "project__pi").all().order_by("-total_amount_awarded")
-        for grant in grants:
-            row = [
-                grant.title,
-                " ".join((grant.project.pi.first_name, grant.project.pi.last_name)),
-                grant.role,
-                grant.grant_pi_full_name,
-                grant.total_amount_awarded,
-                grant.funding_agency,
-                grant.grant_number,
-                grant.grant_start,
-                grant.grant_end,
-                grant.percent_credit,
-                grant.direct_funding,
-            ]
-
-            rows.append(row)
-        rows.insert(0, header)
-        pseudo_buffer = Echo()
-        writer = csv.writer(pseudo_buffer)
-        response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="grants.csv"'
-        return response
+        return grants_csv_response(Grant.objects.order_by("-total_amount_awarded"))
@@ -1,5 +1,8 @@
 from django.contrib import admin
 from django.contrib.admin.models import LogEntry
+from simple_history.admin import SimpleHistoryAdmin
+
+from coldfront.core.portal.models import StatsSnapshot
 
 
 @admin.register(LogEntry)
@@ -15,3 +18,9 @@ class LogEntryAdmin(admin.ModelAdmin):
     )
 
     search_fields = ["user__username", "user__first_name", "user__last_name"]
+
+
+@admin.register(StatsSnapshot)
+class StatsSnapshotAdmin(SimpleHistoryAdmin):
+    list_display = ("name", "computed_at")
+    readonly_fields = ("name", "data", "computed_at")
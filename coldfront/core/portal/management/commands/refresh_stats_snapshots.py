@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from coldfront.core.portal.utils import STATS_SNAPSHOTS, refresh_stats_snapshot
+
+
+class Command(BaseCommand):
+    help = "Recompute the statistics shown on the center summary pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names",
+            nargs="*",
+            choices=list(STATS_SNAPSHOTS),
+            help="Snapshots to refresh, all if omitted",
+        )
+
+    def handle(self, *args, **options):
+        for name in options["names"] or STATS_SNAPSHOTS:
+            snapshot = refresh_stats_snapshot(name)
+            self.stdout.write(f"{name} computed at {snapshot.computed_at}")
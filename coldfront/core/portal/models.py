@@ -1 +1,23 @@
-# Create your models here.
+from django.db import models
+from model_utils.models import TimeStampedModel
+from simple_history.models import HistoricalRecords
+
+
+class StatsSnapshot(TimeStampedModel):
+    """A stats snapshot stores precomputed statistics shown on the center summary pages, so that the pages do not
+    aggregate over all grants, publications and allocations on every request. Snapshots are refreshed by a scheduled
+    task or the refresh_stats_snapshots command.
+
+    Attributes:
+        name (str): name of the statistics, one of STATS_SNAPSHOTS in coldfront.core.portal.utils
+        data (dict): the computed statistics
+        computed_at (datetime): when the statistics were computed
+    """
+
+    name = models.CharField(max_length=64, unique=True)
+    data = models.JSONField(default=dict)
+    computed_at = models.DateTimeField()
+    history = HistoricalRecords()
+
+    def __str__(self):
+        return self.name
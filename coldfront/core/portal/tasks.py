@@ -0,0 +1,11 @@
+import logging
+
+from coldfront.core.portal.utils import STATS_SNAPSHOTS, refresh_stats_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_stats_snapshots():
+    for name in STATS_SNAPSHOTS:
+        snapshot = refresh_stats_snapshot(name)
+        logger.info("Stats snapshot %s computed at %s", name, snapshot.computed_at)
@@ -1 +1,90 @@
-# Create your tests here.
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from coldfront.core.allocation.models import Allocation
+from coldfront.core.grant.models import Grant
+from coldfront.core.portal.models import StatsSnapshot
+from coldfront.core.portal.utils import compute_allocation_summary, compute_center_summary, get_stats_snapshot
+from coldfront.core.test_helpers import utils
+from coldfront.core.test_helpers.factories import (
+    AllocationStatusChoiceFactory,
+    GrantFundingAgencyFactory,
+    GrantStatusChoiceFactory,
+    ProjectFactory,
+    ResourceFactory,
+    ResourceTypeFactory,
+    UserFactory,
+)
+
+
+class StatsSnapshotTest(TestCase):
+    """Tests for the precomputed center summary statistics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = ProjectFactory()
+        agency = GrantFundingAgencyFactory(name="NSF")
+        status = GrantStatusChoiceFactory(name="Active")
+        for role, amount in [("PI", 1000), ("PI", 500), ("CoPI", 250), ("SP", 100)]:
+            Grant.objects.create(
+                project=cls.project,
+                title="Grant",
+                grant_number="123",
+                role=role,
+                funding_agency=agency,
+                grant_start=datetime.date(2024, 1, 1),
+                grant_end=datetime.date(2025, 1, 1),
+                percent_credit=100,
+                direct_funding=amount,
+                total_amount_awarded=amount,
+                status=status,
+            )
+
+        active = AllocationStatusChoiceFactory(name="Active")
+        cluster = ResourceFactory(name="cluster", resource_type=ResourceTypeFactory(name="Cluster"))
+        partition = ResourceFactory(name="partition", parent_resource=cluster, is_allocatable=True)
+        storage = ResourceFactory(name="storage", resource_type=ResourceTypeFactory(name="Storage"))
+        for resource in [cluster, partition, storage]:
+            allocation = Allocation.objects.create(project=cls.project, status=active)
+            allocation.resources.add(resource)
+
+    def test_compute_center_summary(self):
+        """Test that grant totals are aggregated by role"""
+        data = compute_center_summary()
+        self.assertEqual(data["grants_total"], 1850)
+        self.assertEqual(data["grants_total_pi_only"], 1500)
+        self.assertEqual(data["grants_total_copi_only"], 250)
+        self.assertEqual(data["grants_total_sp_only"], 100)
+        self.assertEqual(data["grants_agency_chart_data"]["columns"], [["NSF: $1,850 (4)", 1850]])
+
+    def test_compute_allocation_summary(self):
+        """Test that active allocations are counted against the parent of their resource"""
+        data = compute_allocation_summary()
+        self.assertEqual(
+            data["allocations_count_by_resource"],
+            [
+                {"name": "cluster", "resource_type": "Cluster", "count": 2},
+                {"name": "storage", "resource_type": "Storage", "count": 1},
+            ],
+        )
+        self.assertEqual(data["allocations_chart_data"]["columns"][0], ["Active: 3", 3])
+
+    def test_snapshot_is_read_until_refreshed(self):
+        """Test that the summary pages read the stored snapshot until it is refreshed"""
+        snapshot = get_stats_snapshot("center_summary")
+        self.assertEqual(snapshot.data["grants_total"], 1850)
+        Grant.objects.filter(role="SP").delete()
+        self.assertEqual(get_stats_snapshot("center_summary").data["grants_total"], 1850)
+
+        call_command("refresh_stats_snapshots", stdout=StringIO())
+        self.assertEqual(get_stats_snapshot("center_summary").data["grants_total"], 1750)
+        self.assertEqual(StatsSnapshot.objects.get(name="center_summary").history.count(), 2)
+
+    def test_summary_pages(self):
+        """Test that the summary pages render from the snapshot"""
+        user = UserFactory()
+        utils.page_contains_for_user(self, user, "/center-summary", "$1,850")
+        utils.page_contains_for_user(self, user, "/allocation-summary", "cluster")
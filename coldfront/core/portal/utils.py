@@ -1,6 +1,16 @@
 import datetime
 
-from coldfront.core.allocation.models import Allocation
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from coldfront.core.allocation.models import ALLOCATION_RESOURCE_ORDERING, Allocation
+from coldfront.core.grant.models import Grant
+from coldfront.core.portal.models import StatsSnapshot
+from coldfront.core.publication.models import Publication
+from coldfront.core.research_output.models import ResearchOutput
+from coldfront.core.resource.models import Resource
 
 
 def generate_publication_by_year_chart_data(publications_by_year):
@@ -63,18 +73,11 @@ def generate_resources_chart_data(allocations_count_by_resource_type):
     return resource_plot_data
 
 
-def generate_allocations_chart_data():
-    active_count = Allocation.objects.filter(status__name="Active").count()
-    new_count = Allocation.objects.filter(status__name="New").count()
-    renewal_requested_count = Allocation.objects.filter(
-        status__name="Renewal Requested"
-    ).count()
-
-    now = datetime.datetime.now()
-    start_time = datetime.date(now.year - 1, 1, 1)
-    expired_count = Allocation.objects.filter(
-        status__name="Expired", end_date__gte=start_time
-    ).count()
+def generate_allocations_chart_data(allocation_counts):
+    active_count = allocation_counts["active"]
+    new_count = allocation_counts["new"]
+    renewal_requested_count = allocation_counts["renewal_requested"]
+    expired_count = allocation_counts["expired"]
 
     active_label = "Active: %d" % (active_count)
     new_label = "New: %d" % (new_count)
@@ -98,3 +101,129 @@ def generate_allocations_chart_data():
     }
 
     return allocation_chart_data
+
+
+def compute_center_summary():
+    """
+    Returns:
+        dict: the publication, research output and grant statistics shown on the center summary page
+    """
+
+    publications = Publication.objects.filter(year__gte=1999).values("unique_id", "year").distinct()
+    publications_by_year = [
+        (ele["year"], ele["num_pub"])
+        for ele in publications.values("year").annotate(num_pub=Count("year")).order_by("-year")
+    ]
+
+    total_grants_by_agency = [
+        [
+            "{}: ${} ({})".format(ele["funding_agency__name"], intcomma(ele["total_amount"] or 0), ele["count"]),
+            ele["total_amount"] or 0,
+        ]
+        for ele in Grant.objects.values("funding_agency__name")
+        .annotate(total_amount=Sum("total_amount_awarded"), count=Count("total_amount_awarded"))
+        .order_by("-total_amount")
+    ]
+
+    grants_totals = Grant.objects.aggregate(
+        total=Coalesce(Sum("total_amount_awarded"), 0),
+        pi_only=Coalesce(Sum("total_amount_awarded", filter=Q(role="PI")), 0),
+        copi_only=Coalesce(Sum("total_amount_awarded", filter=Q(role="CoPI")), 0),
+        sp_only=Coalesce(Sum("total_amount_awarded", filter=Q(role="SP")), 0),
+    )
+
+    return {
+        "publication_by_year_bar_chart_data": generate_publication_by_year_chart_data(publications_by_year),
+        "total_publications_count": publications.count(),
+        "total_research_outputs_count": ResearchOutput.objects.count(),
+        "grants_agency_chart_data": generate_total_grants_by_agency_chart_data(total_grants_by_agency),
+        "grants_total": grants_totals["total"],
+        "grants_total_pi_only": grants_totals["pi_only"],
+        "grants_total_copi_only": grants_totals["copi_only"],
+        "grants_total_sp_only": grants_totals["sp_only"],
+    }
+
+
+def compute_allocation_summary():
+    """
+    Returns:
+        dict: the allocation statistics shown on the allocation summary page
+    """
+
+    start_time = datetime.date(timezone.now().year - 1, 1, 1)
+    allocation_counts = Allocation.objects.aggregate(
+        active=Count("pk", filter=Q(status__name="Active")),
+        new=Count("pk", filter=Q(status__name="New")),
+        renewal_requested=Count("pk", filter=Q(status__name="Renewal Requested")),
+        expired=Count("pk", filter=Q(status__name="Expired", end_date__gte=start_time)),
+    )
+
+    # Active allocations are counted against the parent of their parent resource, if it has one
+    summary_resource = (
+        Resource.objects.filter(allocation=OuterRef("pk"))
+        .order_by(*ALLOCATION_RESOURCE_ORDERING)
+        .annotate(summary_resource=Coalesce("parent_resource", "pk"))
+        .values("summary_resource")[:1]
+    )
+    counts_by_resource = dict(
+        Allocation.objects.filter(status__name="Active")
+        .annotate(summary_resource=Subquery(summary_resource))
+        .exclude(summary_resource=None)
+        .values("summary_resource")
+        .annotate(count=Count("pk"))
+        .values_list("summary_resource", "count")
+    )
+
+    allocations_count_by_resource = []
+    allocation_count_by_resource_type = {}
+    for resource in Resource.objects.filter(pk__in=counts_by_resource).select_related("resource_type").order_by("name"):
+        count = counts_by_resource[resource.pk]
+        allocations_count_by_resource.append(
+            {"name": resource.name, "resource_type": resource.resource_type.name, "count": count}
+        )
+        allocation_count_by_resource_type[resource.resource_type.name] = (
+            allocation_count_by_resource_type.get(resource.resource_type.name, 0) + count
+        )
+
+    return {
+        "allocations_chart_data": generate_allocations_chart_data(allocation_counts),
+        "allocations_count_by_resource": allocations_count_by_resource,
+        "resources_chart_data": generate_resources_chart_data(allocation_count_by_resource_type),
+    }
+
+
+STATS_SNAPSHOTS = {
+    "center_summary": compute_center_summary,
+    "allocation_summary": compute_allocation_summary,
+}
+
+
+def refresh_stats_snapshot(name):
+    """
+    Params:
+        name (str): name of the statistics to compute, one of STATS_SNAPSHOTS
+
+    Returns:
+        StatsSnapshot: the stored snapshot
+    """
+
+    data = STATS_SNAPSHOTS[name]()
+    snapshot, _ = StatsSnapshot.objects.update_or_create(
+        name=name, defaults={"data": data, "computed_at": timezone.now()}
+    )
+    return snapshot
+
+
+def get_stats_snapshot(name):
+    """
+    Params:
+        name (str): name of the statistics, one of STATS_SNAPSHOTS
+
+    Returns:
+        StatsSnapshot: the stored snapshot, computed now if it has never been computed
+    """
+
+    snapshot = StatsSnapshot.objects.filter(name=name).first()
+    if snapshot is None:
+        snapshot = refresh_stats_snapshot(name)
+    return snapshot
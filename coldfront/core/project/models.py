@@ -11,6 +11,7 @@ from simple_history.models import HistoricalRecords
 
 from coldfront.core.school.models import School
 from coldfront.core.utils.common import import_from_settings
+from coldfront.core.utils.models import ChoiceLookupManager
 
 PROJECT_ENABLE_PROJECT_REVIEW = import_from_settings(
     "PROJECT_ENABLE_PROJECT_REVIEW", False
@@ -36,12 +37,8 @@ class ProjectStatusChoice(TimeStampedModel):
     class Meta:
         ordering = ("name",)
 
-    class ProjectStatusChoiceManager(models.Manager):
-        def get_by_natural_key(self, name):
-            return self.get(name=name)
-
     name = models.CharField(max_length=64, unique=True)
-    objects = ProjectStatusChoiceManager()
+    objects = ChoiceLookupManager()
 
     def __str__(self):
         return self.name
@@ -298,10 +295,14 @@ class ProjectReviewStatusChoice(TimeStampedModel):
     """
 
     name = models.CharField(max_length=64)
+    objects = ChoiceLookupManager()
 
     def __str__(self):
         return self.name
 
+    def natural_key(self):
+        return (self.name,)
+
     class Meta:
         ordering = [
             "name",
@@ -337,12 +338,8 @@ class ProjectUserRoleChoice(TimeStampedModel):
             "name",
         ]
 
-    class ProjectUserRoleChoiceManager(models.Manager):
-        def get_by_natural_key(self, name):
-            return self.get(name=name)
-
     name = models.CharField(max_length=64, unique=True)
-    objects = ProjectUserRoleChoiceManager()
+    objects = ChoiceLookupManager()
 
     def __str__(self):
         return self.name
@@ -363,12 +360,8 @@ class ProjectUserStatusChoice(TimeStampedModel):
             "name",
         ]
 
-    class ProjectUserStatusChoiceManager(models.Manager):
-        def get_by_natural_key(self, name):
-            return self.get(name=name)
-
     name = models.CharField(max_length=64, unique=True)
-    objects = ProjectUserStatusChoiceManager()
+    objects = ChoiceLookupManager()
 
     def __str__(self):
         return self.name
@@ -0,0 +1,39 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from coldfront.core.allocation.models import Allocation, AllocationAttribute, AllocationUser
+from coldfront.core.grant.models import Grant
+from coldfront.core.project.models import Project, ProjectAttribute, ProjectUser, ProjectUserMessage
+from coldfront.core.publication.models import Publication
+from coldfront.core.research_output.models import ResearchOutput
+from coldfront.core.utils.common import invalidate_fragment_cache
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_cache(sender, instance, **kwargs):
+    invalidate_fragment_cache("project", instance.pk)
+
+
+@receiver([post_save, post_delete], sender=ProjectUser)
+@receiver([post_save, post_delete], sender=ProjectAttribute)
+@receiver([post_save, post_delete], sender=ProjectUserMessage)
+@receiver([post_save, post_delete], sender=Grant)
+@receiver([post_save, post_delete], sender=Publication)
+@receiver([post_save, post_delete], sender=ResearchOutput)
+@receiver([post_save, post_delete], sender=Allocation)
+def invalidate_project_related_cache(sender, instance, **kwargs):
+    invalidate_fragment_cache("project", instance.project_id)
+
+
+@receiver([post_save, post_delete], sender=AllocationUser)
+@receiver([post_save, post_delete], sender=AllocationAttribute)
+def invalidate_project_allocation_cache(sender, instance, **kwargs):
+    project_id = Allocation.objects.filter(pk=instance.allocation_id).values_list("project_id", flat=True).first()
+    if project_id is not None:
+        invalidate_fragment_cache("project", project_id)
+
+
+@receiver(m2m_changed, sender=Allocation.resources.through)
+def invalidate_project_allocation_resources_cache(sender, instance, **kwargs):
+    if isinstance(instance, Allocation):
+        invalidate_fragment_cache("project", instance.project_id)
@@ -1,6 +1,11 @@
 import logging
+from unittest.mock import Mock, patch
 
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from coldfront.core.test_helpers import utils
 from coldfront.core.test_helpers.factories import (
@@ -16,8 +21,13 @@ from coldfront.core.test_helpers.factories import (
     ProjectStatusChoiceFactory,
     ProjectAttributeTypeFactory,
     ProjectUserRoleChoiceFactory,
+    ResourceFactory,
 )
-from coldfront.core.project.models import ProjectUserStatusChoice
+from coldfront.core.allocation.models import Allocation, AllocationUser
+from coldfront.core.allocation.signals import allocation_activate_user, allocation_activate_users
+from coldfront.core.project.models import ProjectUser, ProjectUserStatusChoice
+from coldfront.core.project.views import ADD_USERS_SEARCH_SESSION_KEY
+from coldfront.core.user.models import UserProfile
 
 logging.disable(logging.CRITICAL)
 
@@ -125,6 +135,30 @@ class ProjectDetailViewTest(ProjectViewTestBase):
         response = utils.login_and_get_page(self.client, self.manager_user.user, self.url)
         self.assertEqual(len(response.context["allocations"]), 1)
 
+    def test_projectdetail_cached_cards_refresh(self):
+        """Test that the cached cards are refreshed when project users change"""
+        # the fragment cache is not rolled back with the database
+        self.addCleanup(cache.clear)
+        utils.page_contains_for_user(self, self.pi_user, self.url, self.project_user.username)
+        new_project_user = ProjectUserFactory(project=self.project)
+        utils.page_contains_for_user(self, self.pi_user, self.url, new_project_user.user.username)
+
+    def test_projectdetail_query_count(self):
+        """Test that the number of queries does not grow with the number of allocations"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.allocation.resources.add(ResourceFactory(name="cluster"))
+        self.client.force_login(self.admin_user, backend=self.backend)
+        with CaptureQueriesContext(connection) as single_allocation:
+            self.client.get(self.url)
+        # creating allocations invalidates the cached cards, so the page is rendered from scratch again
+        for name in ["cluster-a", "cluster-b", "cluster-c"]:
+            allocation = Allocation.objects.create(project=self.project, status=self.allocation.status)
+            allocation.resources.add(ResourceFactory(name=name))
+        with CaptureQueriesContext(connection) as many_allocations:
+            self.client.get(self.url)
+        self.assertEqual(len(many_allocations), len(single_allocation))
+
 
 class ProjectCreateTest(ProjectViewTestBase):
     """Tests for project create view"""
@@ -400,6 +434,159 @@ class ProjectAddUsersSearchView(ProjectViewTestBase):
         self.project_access_tstbase(self.url)
 
 
+class ProjectAddUsersViewTest(ProjectViewTestBase):
+    """Tests for ProjectAddUsersView"""
+
+    def setUp(self):
+        """set up the search results and allocations to add users to"""
+        self.url = f"/project/{self.project.pk}/add-users/"
+        self.addCleanup(cache.clear)
+        self.client.force_login(self.admin_user, backend=self.backend)
+        self.existing_user = UserFactory(username="existing")
+        session = self.client.session
+        session[ADD_USERS_SEARCH_SESSION_KEY.format(self.project.pk)] = [
+            {"username": "newuser", "first_name": "New", "last_name": "User", "email": "new@example.com", "source": "LDAP"},
+            {"username": "existing", "first_name": "Existing", "last_name": "User", "email": "", "source": "local"},
+        ]
+        session.save()
+        active_status = AllocationStatusChoiceFactory(name="Active")
+        self.allocations = [
+            Allocation.objects.create(project=self.project, status=active_status, justification=str(index))
+            for index in range(2)
+        ]
+        for allocation in self.allocations:
+            allocation.resources.add(ResourceFactory(is_allocatable=True))
+        AllocationUserFactory(
+            allocation=self.allocations[0],
+            user=self.existing_user,
+            status=AllocationUserStatusChoiceFactory(name="Removed"),
+        )
+
+    def post_data(self, allocations):
+        role = ProjectUserRoleChoiceFactory(name="User")
+        data = {
+            "userform-TOTAL_FORMS": "2",
+            "userform-INITIAL_FORMS": "2",
+            "userform-0-selected": "on",
+            "userform-0-role": role.pk,
+            "userform-1-selected": "on",
+            "userform-1-role": role.pk,
+            "allocationform-TOTAL_FORMS": "2",
+            "allocationform-INITIAL_FORMS": "2",
+        }
+        for index in range(allocations):
+            data[f"allocationform-{index}-selected"] = "on"
+        return data
+
+    def test_projectaddusersview_adds_users(self):
+        """test that the selected users are added to the project and allocations with one batch of signals"""
+        receiver = Mock()
+        allocation_activate_users.connect(receiver)
+        self.addCleanup(allocation_activate_users.disconnect, receiver)
+        user_receiver = Mock()
+        allocation_activate_user.connect(user_receiver)
+        self.addCleanup(allocation_activate_user.disconnect, user_receiver)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, self.post_data(allocations=2))
+        self.assertRedirects(response, f"/project/{self.project.pk}/", fetch_redirect_response=False)
+
+        new_user = User.objects.get(username="newuser")
+        self.assertEqual(new_user.email, "new@example.com")
+        self.assertTrue(UserProfile.objects.filter(user=new_user).exists())
+        project_usernames = self.project.projectuser_set.filter(status__name="Active").values_list(
+            "user__username", flat=True
+        )
+        self.assertTrue({"newuser", "existing"}.issubset(project_usernames))
+        allocation_users = AllocationUser.objects.filter(allocation__in=self.allocations, status__name="Active")
+        self.assertEqual(allocation_users.count(), 4)
+        receiver.assert_called_once()
+        self.assertEqual(
+            sorted(receiver.call_args.kwargs["allocation_user_pks"]),
+            sorted(allocation_users.values_list("pk", flat=True)),
+        )
+        user_receiver.assert_not_called()
+        self.assertNotIn(ADD_USERS_SEARCH_SESSION_KEY.format(self.project.pk), self.client.session)
+
+    @patch("coldfront.core.allocation.utils.ALLOCATION_USER_SIGNALS_PER_USER", True)
+    def test_projectaddusersview_per_user_signals(self):
+        """test that the per allocation user signal is also sent when ALLOCATION_USER_SIGNALS_PER_USER"""
+        user_receiver = Mock()
+        allocation_activate_user.connect(user_receiver)
+        self.addCleanup(allocation_activate_user.disconnect, user_receiver)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, self.post_data(allocations=2))
+
+        self.assertEqual(
+            sorted(call.kwargs["allocation_user_pk"] for call in user_receiver.call_args_list),
+            sorted(AllocationUser.objects.filter(allocation__in=self.allocations).values_list("pk", flat=True)),
+        )
+
+    def test_projectaddusersview_query_count(self):
+        """test that adding users to more allocations doesn't run more queries"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, self.post_data(allocations=1))
+        ProjectUser.objects.filter(user__username__in=["newuser", "existing"]).delete()
+        AllocationUser.objects.filter(allocation__in=self.allocations).delete()
+        User.objects.filter(username="newuser").delete()
+        AllocationUserFactory(
+            allocation=self.allocations[0],
+            user=self.existing_user,
+            status=AllocationUserStatusChoiceFactory(name="Removed"),
+        )
+        session = self.client.session
+        session[ADD_USERS_SEARCH_SESSION_KEY.format(self.project.pk)] = [
+            {"username": "newuser", "first_name": "New", "last_name": "User", "email": "", "source": "LDAP"},
+            {"username": "existing", "first_name": "Existing", "last_name": "User", "email": "", "source": "local"},
+        ]
+        session.save()
+        with CaptureQueriesContext(connection) as more_queries:
+            self.client.post(self.url, self.post_data(allocations=2))
+        self.assertEqual(len(queries), len(more_queries))
+
+    def test_projectaddusersview_expired_search(self):
+        """test that adding users without search results asks to search again"""
+        session = self.client.session
+        del session[ADD_USERS_SEARCH_SESSION_KEY.format(self.project.pk)]
+        session.save()
+        response = self.client.post(self.url, self.post_data(allocations=0))
+        self.assertRedirects(response, f"/project/{self.project.pk}/add-users-search/", fetch_redirect_response=False)
+        self.assertFalse(User.objects.filter(username="newuser").exists())
+
+
+    def test_projectaddusersview_after_search(self):
+        """test that users found by the search results view are added, and that the session stays serializable"""
+        session = self.client.session
+        del session[ADD_USERS_SEARCH_SESSION_KEY.format(self.project.pk)]
+        session.save()
+        search_url = f"/project/{self.project.pk}/add-users-search-results/"
+        response = self.client.post(search_url, {"q": "existing", "search_by": "username_only"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [match["username"] for match in self.client.session[ADD_USERS_SEARCH_SESSION_KEY.format(self.project.pk)]],
+            ["existing"],
+        )
+
+        data = self.post_data(allocations=1)
+        data.update({"userform-TOTAL_FORMS": "1", "userform-INITIAL_FORMS": "1", "userform-0-role": ""})
+        # An invalid formset keeps the search results in the session
+        response = self.client.post(self.url, data)
+        self.assertRedirects(response, f"/project/{self.project.pk}/", fetch_redirect_response=False)
+        self.assertIn(ADD_USERS_SEARCH_SESSION_KEY.format(self.project.pk), self.client.session)
+
+        data["userform-0-role"] = ProjectUserRoleChoiceFactory(name="User").pk
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, data)
+        self.assertRedirects(response, f"/project/{self.project.pk}/", fetch_redirect_response=False)
+        self.assertTrue(
+            self.project.projectuser_set.filter(user=self.existing_user, status__name="Active").exists()
+        )
+        self.assertTrue(
+            AllocationUser.objects.filter(allocation=self.allocations[0], user=self.existing_user).exists()
+        )
+
+
 class ProjectUserDetailViewTest(ProjectViewTestBase):
     """Tests for ProjectUserDetailView"""
 
@@ -1,8 +1,10 @@
 import logging
+from unittest.mock import patch
 
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 
 from coldfront.core.test_helpers.factories import (
     UserFactory,
@@ -23,6 +25,7 @@ from coldfront.core.project.models import (
     ProjectPermission,
     ProjectStatusChoice,
 )
+from coldfront.core.project.utils import add_user_to_projects
 from coldfront.core.utils.common import import_from_settings
 
 
@@ -277,3 +280,29 @@ class TestProjectAttribute(TestCase):
         new_attr = ProjectAttribute(project=self.project, proj_attr_type=proj_attr_type, value="abc")
         with self.assertRaises(ValidationError):
             new_attr.clean()
+
+
+class TestAddUserToProjects(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.projects = [ProjectFactory(title=f"Project {index}") for index in range(3)]
+        self.role = ProjectUserRoleChoiceFactory(name="Manager")
+        self.status = ProjectUserStatusChoiceFactory(name="Active")
+
+    def test_returns_only_the_new_memberships(self):
+        """Test that a membership created at the same time elsewhere is not returned as added"""
+        now = timezone.now()
+        existing = ProjectUser.objects.create(
+            project=self.projects[0], user=self.user, role=self.role, status=self.status, created=now
+        )
+        ProjectUser.objects.filter(pk=existing.pk).update(created=now)
+
+        with patch("coldfront.core.project.utils.timezone.now", return_value=now):
+            project_users = add_user_to_projects(self.user, [project.pk for project in self.projects], "Manager")
+
+        self.assertEqual(
+            sorted(project_user.project_id for project_user in project_users),
+            sorted(project.pk for project in self.projects[1:]),
+        )
+        self.assertEqual(ProjectUser.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(ProjectUser.history.filter(user=self.user, history_type="+").count(), 3)
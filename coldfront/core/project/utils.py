@@ -1,3 +1,14 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from coldfront.core.allocation.utils import set_allocation_users_status
+from coldfront.core.project.models import ProjectUser, ProjectUserRoleChoice, ProjectUserStatusChoice
+from coldfront.core.user.models import UserProfile
+from coldfront.core.utils.common import invalidate_fragment_cache, invalidate_fragment_caches
+
+
 def add_project_status_choices(apps, schema_editor):
     ProjectStatusChoice = apps.get_model("project", "ProjectStatusChoice")
 
@@ -29,3 +40,113 @@ def add_project_user_status_choices(apps, schema_editor):
         "Removed",
     ]:
         ProjectUserStatusChoice.objects.get_or_create(name=choice)
+
+
+@transaction.atomic
+def add_project_users(project_obj, users_data, allocation_objs=(), history_user=None, sender=None):
+    """Adds users to a project and to some of its allocations with bulk writes.
+
+    Params:
+        project_obj (Project): project to add the users to
+        users_data (list[dict]): username, first_name, last_name, email and role of each user
+        allocation_objs (list[Allocation]): allocations of the project to add the users to
+        history_user (User): user recorded in the history of the changed memberships
+        sender: sender of the allocation user activation signals
+
+    Returns:
+        int: number of users added
+    """
+    users_data = {user_data["username"]: user_data for user_data in users_data}
+    if not users_data:
+        return 0
+
+    # Create local copies of the users not already present in the local database
+    users = User.objects.in_bulk(users_data, field_name="username")
+    new_users = User.objects.bulk_create([User(username=username) for username in users_data if username not in users])
+    if new_users:
+        users = User.objects.in_bulk(users_data, field_name="username")
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=users[user.username]) for user in new_users], ignore_conflicts=True
+        )
+    for username, user_obj in users.items():
+        user_obj.first_name = users_data[username].get("first_name") or ""
+        user_obj.last_name = users_data[username].get("last_name") or ""
+        user_obj.email = users_data[username].get("email") or ""
+    User.objects.bulk_update(users.values(), ["first_name", "last_name", "email"])
+
+    project_user_active_status_choice = ProjectUserStatusChoice.objects.get_by_natural_key("Active")
+    project_users = {
+        project_user.user_id: project_user
+        for project_user in project_obj.projectuser_set.select_related("user").filter(user__in=users.values())
+    }
+    now = timezone.now()
+    for project_user in project_users.values():
+        project_user.role = users_data[project_user.user.username]["role"]
+        project_user.status = project_user_active_status_choice
+        project_user.modified = now
+    bulk_update_with_history(
+        project_users.values(), ProjectUser, ["role", "status", "modified"], default_user=history_user
+    )
+    bulk_create_with_history(
+        [
+            ProjectUser(
+                user=user_obj,
+                project=project_obj,
+                role=users_data[username]["role"],
+                status=project_user_active_status_choice,
+            )
+            for username, user_obj in users.items()
+            if user_obj.pk not in project_users
+        ],
+        ProjectUser,
+        default_user=history_user,
+    )
+
+    set_allocation_users_status(
+        allocation_objs, users.values(), "Active", create=True, history_user=history_user, sender=sender
+    )
+
+    # Bulk writes skip the model signals that invalidate cached page fragments
+    invalidate_fragment_cache("project", project_obj.pk)
+
+    return len(users)
+
+
+@transaction.atomic
+def add_user_to_projects(user_obj, project_pks, role_name, history_user=None):
+    """Adds a user to many projects as an active member with bulk writes, skipping the projects they are already in.
+
+    Params:
+        user_obj (User): user to add
+        project_pks (list[int]): pks of the projects to add the user to
+        role_name (str): name of the ProjectUserRoleChoice of the user in the projects
+        history_user (User): user recorded in the history of the new memberships
+
+    Returns:
+        list[ProjectUser]: the memberships created
+    """
+
+    role = ProjectUserRoleChoice.objects.get_by_natural_key(role_name)
+    status = ProjectUserStatusChoice.objects.get_by_natural_key("Active")
+    now = timezone.now()
+    existing_pks = set(
+        ProjectUser.objects.filter(user=user_obj, project_id__in=project_pks).values_list("pk", flat=True)
+    )
+    ProjectUser.objects.bulk_create(
+        [
+            ProjectUser(user=user_obj, project_id=project_pk, role=role, status=status, created=now, modified=now)
+            for project_pk in project_pks
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    # Conflicting rows are skipped without telling which, read back the memberships which didn't exist before
+    project_users = list(
+        ProjectUser.objects.filter(user=user_obj, project_id__in=project_pks).exclude(pk__in=existing_pks)
+    )
+    ProjectUser.history.bulk_history_create(project_users, batch_size=1000, default_user=history_user)
+
+    # Bulk writes skip the model signals that invalidate cached page fragments
+    invalidate_fragment_caches("project", [project_user.project_id for project_user in project_users])
+
+    return project_users
@@ -10,12 +10,12 @@ from django.contrib.auth.models import User
 from coldfront.core.utils.common import import_from_settings
 from django.contrib.messages.views import SuccessMessageMixin
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from django.forms import formset_factory
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from coldfront.core.allocation.utils import generate_guauge_data_from_usage
+from coldfront.core.allocation.utils import generate_guauge_data_from_usage, send_allocation_user_signals
 from django.views import View
 from django.views.generic import CreateView, DetailView, ListView, UpdateView
 from django.views.generic.base import TemplateView
@@ -23,14 +23,12 @@ from django.views.generic.edit import FormView
 from django.db import transaction
 from coldfront.core.allocation.models import (
     Allocation,
+    AllocationAttribute,
     AllocationStatusChoice,
-    AllocationUser,
     AllocationUserStatusChoice,
+    ordered_resources_prefetch,
 )
-from coldfront.core.allocation.signals import (
-    allocation_activate_user,
-    allocation_remove_user,
-)
+from coldfront.core.allocation.signals import allocation_remove_user, allocation_remove_users
 from coldfront.core.grant.models import Grant
 from coldfront.core.project.forms import (
     ProjectAddUserForm,
@@ -55,16 +53,18 @@ from coldfront.core.project.models import (
     ProjectUserStatusChoice,
     ProjectUserMessage,
 )
+from coldfront.core.project.utils import add_project_users
 from coldfront.core.publication.models import Publication
 from coldfront.core.research_output.models import ResearchOutput
 from coldfront.core.user.forms import UserSearchForm
 from coldfront.core.user.utils import CombinedUserSearch
-from coldfront.core.utils.common import get_domain_url
+from coldfront.core.utils.common import get_domain_url, get_fragment_cache_version
 from coldfront.core.utils.mail import send_email, send_email_template
 
 EMAIL_ENABLED = import_from_settings("EMAIL_ENABLED", False)
 ALLOCATION_ENABLE_ALLOCATION_RENEWAL = import_from_settings("ALLOCATION_ENABLE_ALLOCATION_RENEWAL", True)
 ALLOCATION_DEFAULT_ALLOCATION_LENGTH = import_from_settings("ALLOCATION_DEFAULT_ALLOCATION_LENGTH", 365)
+PROJECT_DETAIL_CACHE_TIMEOUT = import_from_settings("PROJECT_DETAIL_CACHE_TIMEOUT", 600)
 
 if EMAIL_ENABLED:
     EMAIL_DIRECTOR_EMAIL_ADDRESS = import_from_settings("EMAIL_DIRECTOR_EMAIL_ADDRESS")
@@ -72,12 +72,35 @@ if EMAIL_ENABLED:
 
 logger = logging.getLogger(__name__)
 
+# Session key of the user search results of a project, carried from ProjectAddUsersSearchResultsView to ProjectAddUsersView
+ADD_USERS_SEARCH_SESSION_KEY = "project_add_users_search_{}"
+
 
 class ProjectDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
     model = Project
     template_name = "project/project_detail.html"
     context_object_name = "project"
 
+    def get_queryset(self):
+        return Project.objects.select_related("pi", "status", "school")
+
+    def get_object(self, queryset=None):
+        """Load the project once per request, test_func and get both need it."""
+        if not hasattr(self, "_project"):
+            self._project = super().get_object(queryset)
+        return self._project
+
+    def get_project_user(self):
+        """Return the membership of the request user in the project, or None."""
+        if not hasattr(self, "_project_user"):
+            self._project_user = (
+                self.get_object()
+                .projectuser_set.select_related("role", "status")
+                .filter(user=self.request.user)
+                .first()
+            )
+        return self._project_user
+
     def test_func(self):
         """UserPassesTestMixin Tests"""
         if self.request.user.is_superuser:
@@ -86,52 +109,73 @@ class ProjectDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
         if self.request.user.has_perm("project.can_view_all_projects"):
             return True
 
-        project_obj = self.get_object()
+        project_user = self.get_project_user()
 
-        if project_obj.projectuser_set.filter(user=self.request.user, status__name="Active").exists():
+        if project_user and project_user.status.name == "Active":
             return True
 
         messages.error(self.request, "You do not have permission to view the previous page.")
         return False
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        # Can the user update the project?
-        if self.request.user.is_superuser:
-            context["is_allowed_to_update_project"] = True
-        elif self.object.projectuser_set.filter(user=self.request.user).exists():
-            project_user = self.object.projectuser_set.get(user=self.request.user)
-            if project_user.role.name == "Manager":
-                context["is_allowed_to_update_project"] = True
-            else:
-                context["is_allowed_to_update_project"] = False
+    def get_allocations(self):
+        """Return the allocations the request user can see, with everything the allocation card renders."""
+        if self.request.user.is_superuser or self.request.user.has_perm("allocation.can_view_all_allocations"):
+            allocations = Allocation.objects.filter(project=self.object).order_by("-end_date")
+        elif self.object.status.name in [
+            "Active",
+            "New",
+        ]:
+            allocations = (
+                Allocation.objects.filter(
+                    Q(project=self.object)
+                    & Q(project__projectuser__user=self.request.user)
+                    & Q(
+                        project__projectuser__status__name__in=[
+                            "Active",
+                        ]
+                    )
+                    & (
+                        (
+                            Q(allocationuser__user=self.request.user)
+                            & Q(allocationuser__status__name__in=["Active", "PendingEULA"])
+                        )
+                        | Q(project__projectuser__role__name="Manager")
+                    )
+                )
+                .distinct()
+                .order_by("-end_date")
+            )
         else:
-            context["is_allowed_to_update_project"] = False
-
-        pk = self.kwargs.get("pk")
-        project_obj = get_object_or_404(Project, pk=pk)
-
-        if self.request.user.is_superuser:
-            attributes_with_usage = [
-                attribute
-                for attribute in project_obj.projectattribute_set.all().order_by("proj_attr_type__name")
-                if hasattr(attribute, "projectattributeusage")
-            ]
+            allocations = Allocation.objects.filter(project=self.object)
+
+        return allocations.select_related("status").prefetch_related(
+            ordered_resources_prefetch(),
+            "resources__resourceattribute_set__resource_attribute_type",
+            Prefetch(
+                "allocationattribute_set",
+                queryset=AllocationAttribute.objects.select_related(
+                    "allocation_attribute_type", "allocationattributeusage"
+                ),
+            ),
+        )
 
-            attributes = [
-                attribute for attribute in project_obj.projectattribute_set.all().order_by("proj_attr_type__name")
-            ]
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        project_obj = self.object
 
-        else:
-            attributes_with_usage = [
-                attribute
-                for attribute in project_obj.projectattribute_set.filter(proj_attr_type__is_private=False)
-                if hasattr(attribute, "projectattributeusage")
-            ]
+        # Can the user update the project?
+        project_user = self.get_project_user()
+        context["is_allowed_to_update_project"] = self.request.user.is_superuser or bool(
+            project_user and project_user.role.name == "Manager"
+        )
 
-            attributes = [
-                attribute for attribute in project_obj.projectattribute_set.filter(proj_attr_type__is_private=False)
-            ]
+        attributes = project_obj.projectattribute_set.select_related(
+            "proj_attr_type__attribute_type", "projectattributeusage"
+        ).order_by("proj_attr_type__name")
+        if not self.request.user.is_superuser:
+            attributes = attributes.filter(proj_attr_type__is_private=False)
+        attributes = list(attributes)
+        attributes_with_usage = [attribute for attribute in attributes if hasattr(attribute, "projectattributeusage")]
 
         guage_data = []
         invalid_attributes = []
@@ -146,62 +190,43 @@ class ProjectDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
                 )
             except ValueError:
                 logger.error(
-                    "Allocation attribute '%s' is not an int but has a usage",
-                    attribute.allocation_attribute_type.name,
+                    "Project attribute '%s' is not an int but has a usage",
+                    attribute.proj_attr_type.name,
                 )
                 invalid_attributes.append(attribute)
 
         for a in invalid_attributes:
             attributes_with_usage.remove(a)
 
-        # Only show 'Active Users'
-        project_users = self.object.projectuser_set.filter(status__name="Active").order_by("user__username")
-
-        context["mailto"] = "mailto:" + ",".join([user.user.email for user in project_users])
-
-        if self.request.user.is_superuser or self.request.user.has_perm("allocation.can_view_all_allocations"):
-            allocations = (
-                Allocation.objects.prefetch_related("resources").filter(project=self.object).order_by("-end_date")
-            )
-        else:
-            if self.object.status.name in [
-                "Active",
-                "New",
-            ]:
-                allocations = (
-                    Allocation.objects.filter(
-                        Q(project=self.object)
-                        & Q(project__projectuser__user=self.request.user)
-                        & Q(
-                            project__projectuser__status__name__in=[
-                                "Active",
-                            ]
-                        )
-                        & (
-                            (
-                                Q(allocationuser__user=self.request.user)
-                                & Q(allocationuser__status__name__in=["Active", "PendingEULA"])
-                            )
-                            | Q(project__projectuser__role__name="Manager")
-                        )
-                    )
-                    .distinct()
-                    .order_by("-end_date")
-                )
-            else:
-                allocations = Allocation.objects.prefetch_related("resources").filter(project=self.object)
+        # The querysets below are lazy, so they only hit the database when the cached card is missing
 
-        context["publications"] = Publication.objects.filter(project=self.object, status="Active").order_by("-year")
-        context["research_outputs"] = ResearchOutput.objects.filter(project=self.object).order_by("-created")
-        context["grants"] = Grant.objects.filter(
-            project=self.object, status__name__in=["Active", "Pending", "Archived"]
+        # Only show 'Active Users'
+        context["project_users"] = (
+            project_obj.projectuser_set.filter(status__name="Active")
+            .select_related("user", "role", "status")
+            .order_by("user__username")
+        )
+        context["allocations"] = self.get_allocations()
+        context["publications"] = (
+            Publication.objects.filter(project=project_obj, status="Active").select_related("source").order_by("-year")
         )
-        context["allocations"] = allocations
+        context["research_outputs"] = (
+            ResearchOutput.objects.filter(project=project_obj).select_related("created_by").order_by("-created")
+        )
+        context["grants"] = Grant.objects.filter(
+            project=project_obj, status__name__in=["Active", "Pending", "Archived"]
+        ).select_related("status", "project__pi")
+        messages_qs = project_obj.projectusermessage_set.select_related("author")
+        if not self.request.user.is_superuser:
+            messages_qs = messages_qs.filter(is_private=False)
+        context["project_messages"] = messages_qs
+
         context["attributes"] = attributes
         context["guage_data"] = guage_data
         context["attributes_with_usage"] = attributes_with_usage
-        context["project_users"] = project_users
         context["ALLOCATION_ENABLE_ALLOCATION_RENEWAL"] = ALLOCATION_ENABLE_ALLOCATION_RENEWAL
+        context["PROJECT_DETAIL_CACHE_TIMEOUT"] = PROJECT_DETAIL_CACHE_TIMEOUT
+        context["fragment_version"] = get_fragment_cache_version("project", project_obj.pk)
 
         try:
             context["ondemand_url"] = settings.ONDEMAND_URL
@@ -533,8 +558,8 @@ class ProjectArchiveProjectView(LoginRequiredMixin, UserPassesTestMixin, Templat
     def post(self, request, *args, **kwargs):
         pk = self.kwargs.get("pk")
         project = get_object_or_404(Project, pk=pk)
-        project_status_archive = ProjectStatusChoice.objects.get(name="Archived")
-        allocation_status_expired = AllocationStatusChoice.objects.get(name="Expired")
+        project_status_archive = ProjectStatusChoice.objects.get_by_natural_key("Archived")
+        allocation_status_expired = AllocationStatusChoice.objects.get_by_natural_key("Expired")
         end_date = datetime.datetime.now()
         project.status = project_status_archive
         project.save()
@@ -596,15 +621,15 @@ class ProjectCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
 
             project_obj = form.save(commit=False)
             project_obj.pi = user
-            project_obj.status = ProjectStatusChoice.objects.get(name="New")
+            project_obj.status = ProjectStatusChoice.objects.get_by_natural_key("New")
             project_obj.save()
             self.object = project_obj
 
         ProjectUser.objects.create(
             user=user,
             project=project_obj,
-            role=ProjectUserRoleChoice.objects.get(name="Manager"),
-            status=ProjectUserStatusChoice.objects.get(name="Active"),
+            role=ProjectUserRoleChoice.objects.get_by_natural_key("Manager"),
+            status=ProjectUserStatusChoice.objects.get_by_natural_key("Active"),
         )
 
         return super().form_valid(form)
@@ -652,6 +677,43 @@ class ProjectUpdateView(SuccessMessageMixin, LoginRequiredMixin, UserPassesTestM
         return reverse("project-detail", kwargs={"pk": self.object.pk})
 
 
+def get_add_users_allocation_initial_data(project_obj):
+    """
+    Params:
+        project_obj (Project): project users are added to
+
+    Returns:
+        list[dict]: initial data of ProjectAddUsersToAllocationForm for the allocations users can be added to
+    """
+
+    allocation_objs = (
+        project_obj.allocation_set.select_related("status")
+        .prefetch_related(
+            ordered_resources_prefetch(),
+            "allocationattribute_set__allocation_attribute_type",
+            "allocationattribute_set__allocationattributeusage",
+        )
+        .filter(
+            resources__is_allocatable=True,
+            is_locked=False,
+            status__name__in=["Active", "New", "Renewal Requested", "Payment Pending", "Payment Requested", "Paid"],
+        )
+    )
+    initial_data = []
+    for allocation_obj in allocation_objs:
+        resource = allocation_obj.get_parent_resource
+        initial_data.append(
+            {
+                "pk": allocation_obj.pk,
+                "resource": resource.name,
+                "details": allocation_obj.get_information,
+                "resource_type": resource.resource_type.name,
+                "status": allocation_obj.status.name,
+            }
+        )
+    return initial_data
+
+
 class ProjectAddUsersSearchView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     template_name = "project/project_add_users.html"
 
@@ -719,24 +781,7 @@ class ProjectAddUsersSearchResultsView(LoginRequiredMixin, UserPassesTestMixin,
             return super().dispatch(request, *args, **kwargs)
 
     def get_initial_data(self, project_obj):
-        allocation_objs = project_obj.allocation_set.select_related("status").filter(
-            resources__is_allocatable=True,
-            is_locked=False,
-            status__name__in=["Active", "New", "Renewal Requested", "Payment Pending", "Payment Requested", "Paid"],
-        )
-        initial_data = []
-        for allocation_obj in allocation_objs:
-            resource = allocation_obj.get_parent_resource
-            initial_data.append(
-                {
-                    "pk": allocation_obj.pk,
-                    "resource": resource.name,
-                    "details": allocation_obj.get_information,
-                    "resource_type": resource.resource_type.name,
-                    "status": allocation_obj.status.name,
-                }
-            )
-        return initial_data
+        return get_add_users_allocation_initial_data(project_obj)
 
     def post(self, request, *args, **kwargs):
         user_search_string = request.POST.get("q")
@@ -752,12 +797,14 @@ class ProjectAddUsersSearchResultsView(LoginRequiredMixin, UserPassesTestMixin,
         context = cobmined_user_search_obj.search()
 
         matches = context.get("matches")
-        for match in matches:
-            match.update({"role": ProjectUserRoleChoice.objects.get(name="User")})
+        # Keep the results for ProjectAddUsersView so that adding users doesn't search again
+        request.session[ADD_USERS_SEARCH_SESSION_KEY.format(pk)] = matches
 
         if matches:
+            # The role is only added to copies, the session must stay JSON serializable
+            role_choice = ProjectUserRoleChoice.objects.get_by_natural_key("User")
             formset = formset_factory(ProjectAddUserForm, max_num=len(matches))
-            formset = formset(initial=matches, prefix="userform")
+            formset = formset(initial=[dict(match, role=role_choice) for match in matches], prefix="userform")
             context["formset"] = formset
             context["user_search_string"] = user_search_string
             context["search_by"] = search_by
@@ -814,41 +861,20 @@ class ProjectAddUsersView(LoginRequiredMixin, UserPassesTestMixin, View):
             return super().dispatch(request, *args, **kwargs)
 
     def get_initial_data(self, project_obj):
-        allocation_objs = project_obj.allocation_set.filter(
-            resources__is_allocatable=True,
-            is_locked=False,
-            status__name__in=["Active", "New", "Renewal Requested", "Payment Pending", "Payment Requested", "Paid"],
-        )
-        return [
-            {
-                "pk": allocation_obj.pk,
-                "resource": allocation_obj.get_parent_resource.name,
-                "details": allocation_obj.get_information,
-                "resource_type": allocation_obj.get_parent_resource.resource_type.name,
-                "status": allocation_obj.status.name,
-            }
-            for allocation_obj in allocation_objs
-        ]
+        return get_add_users_allocation_initial_data(project_obj)
 
     def post(self, request, *args, **kwargs):
-        user_search_string = request.POST.get("q")
-        search_by = request.POST.get("search_by")
         pk = self.kwargs.get("pk")
 
         project_obj = get_object_or_404(Project, pk=pk)
 
-        users_to_exclude = [ele.user.username for ele in project_obj.projectuser_set.filter(status__name="Active")]
-
-        cobmined_user_search_obj = CombinedUserSearch(user_search_string, search_by, users_to_exclude)
-
-        context = cobmined_user_search_obj.search()
-
-        matches = context.get("matches")
-        for match in matches:
-            match.update({"role": ProjectUserRoleChoice.objects.get(name="User")})
-
+        matches = request.session.get(ADD_USERS_SEARCH_SESSION_KEY.format(pk))
+        if matches is None:
+            messages.error(request, "Your user search has expired, please search again.")
+            return HttpResponseRedirect(reverse("project-add-users-search", kwargs={"pk": pk}))
+        role_choice = ProjectUserRoleChoice.objects.get_by_natural_key("User")
         formset = formset_factory(ProjectAddUserForm, max_num=len(matches))
-        formset = formset(request.POST, initial=matches, prefix="userform")
+        formset = formset(request.POST, initial=[dict(match, role=role_choice) for match in matches], prefix="userform")
 
         initial_data = self.get_initial_data(project_obj)
         allocation_formset = formset_factory(
@@ -861,12 +887,7 @@ class ProjectAddUsersView(LoginRequiredMixin, UserPassesTestMixin, View):
             prefix="allocationform",
         )
 
-        added_users_count = 0
-
         if formset.is_valid() and allocation_formset.is_valid():
-            project_user_active_status_choice = ProjectUserStatusChoice.objects.get(name="Active")
-            allocation_user_active_status_choice = AllocationUserStatusChoice.objects.get(name="Active")
-
             allocations_selected_objs = Allocation.objects.filter(
                 pk__in=[
                     allocation_form.cleaned_data.get("pk")
@@ -874,49 +895,14 @@ class ProjectAddUsersView(LoginRequiredMixin, UserPassesTestMixin, View):
                     if allocation_form.cleaned_data.get("selected")
                 ]
             )
-
-            for form in formset:
-                user_form_data = form.cleaned_data
-                if user_form_data["selected"]:
-                    added_users_count += 1
-
-                    # Will create local copy of user if not already present in local database
-                    user_obj, _ = User.objects.get_or_create(username=user_form_data.get("username"))
-                    user_obj.first_name = user_form_data.get("first_name")
-                    user_obj.last_name = user_form_data.get("last_name")
-                    user_obj.email = user_form_data.get("email")
-                    user_obj.save()
-
-                    role_choice = user_form_data.get("role")
-                    # Is the user already in the project?
-                    if project_obj.projectuser_set.filter(user=user_obj).exists():
-                        project_user_obj = project_obj.projectuser_set.get(user=user_obj)
-                        project_user_obj.role = role_choice
-                        project_user_obj.status = project_user_active_status_choice
-                        project_user_obj.save()
-                    else:
-                        project_user_obj = ProjectUser.objects.create(
-                            user=user_obj,
-                            project=project_obj,
-                            role=role_choice,
-                            status=project_user_active_status_choice,
-                        )
-
-                    for allocation in allocations_selected_objs:
-                        if allocation.allocationuser_set.filter(user=user_obj).exists():
-                            allocation_user_obj = allocation.allocationuser_set.get(user=user_obj)
-                            allocation_user_obj.status = allocation_user_active_status_choice
-                            allocation_user_obj.save()
-                        else:
-                            allocation_user_obj = AllocationUser.objects.create(
-                                allocation=allocation,
-                                user=user_obj,
-                                status=allocation_user_active_status_choice,
-                            )
-                        allocation_activate_user.send(
-                            sender=self.__class__,
-                            allocation_user_pk=allocation_user_obj.pk,
-                        )
+            added_users_count = add_project_users(
+                project_obj,
+                [form.cleaned_data for form in formset if form.cleaned_data["selected"]],
+                list(allocations_selected_objs),
+                history_user=request.user,
+                sender=self.__class__,
+            )
+            del request.session[ADD_USERS_SEARCH_SESSION_KEY.format(pk)]
 
             messages.success(request, "Added {} users to project.".format(added_users_count))
         else:
@@ -1002,8 +988,9 @@ class ProjectRemoveUsersView(LoginRequiredMixin, UserPassesTestMixin, TemplateVi
         remove_users_count = 0
 
         if formset.is_valid():
-            project_user_removed_status_choice = ProjectUserStatusChoice.objects.get(name="Removed")
-            allocation_user_removed_status_choice = AllocationUserStatusChoice.objects.get(name="Removed")
+            project_user_removed_status_choice = ProjectUserStatusChoice.objects.get_by_natural_key("Removed")
+            allocation_user_removed_status_choice = AllocationUserStatusChoice.objects.get_by_natural_key("Removed")
+            removed_allocation_user_pks = []
             for form in formset:
                 user_form_data = form.cleaned_data
                 if user_form_data["selected"]:
@@ -1031,11 +1018,14 @@ class ProjectRemoveUsersView(LoginRequiredMixin, UserPassesTestMixin, TemplateVi
                         ):
                             allocation_user_obj.status = allocation_user_removed_status_choice
                             allocation_user_obj.save()
+                            removed_allocation_user_pks.append(allocation_user_obj.pk)
 
-                            allocation_remove_user.send(
-                                sender=self.__class__,
-                                allocation_user_pk=allocation_user_obj.pk,
-                            )
+            send_allocation_user_signals(
+                allocation_remove_users,
+                allocation_remove_user,
+                removed_allocation_user_pks,
+                sender=self.__class__,
+            )
 
             if remove_users_count == 1:
                 messages.success(request, "Removed {} user from project.".format(remove_users_count))
@@ -1115,7 +1105,7 @@ class ProjectUserDetail(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
 
             if project_user_update_form.is_valid():
                 form_data = project_user_update_form.cleaned_data
-                project_user_obj.role = ProjectUserRoleChoice.objects.get(name=form_data.get("role"))
+                project_user_obj.role = ProjectUserRoleChoice.objects.get_by_natural_key(form_data.get("role"))
 
                 if project_user_obj.role.name == "Manager":
                     project_user_obj.enable_notifications = True
@@ -1241,7 +1231,7 @@ class ProjectReviewView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
         project_obj = get_object_or_404(Project, pk=self.kwargs.get("pk"))
         project_review_form = ProjectReviewForm(project_obj.pk, request.POST)
 
-        project_review_status_choice = ProjectReviewStatusChoice.objects.get(name="Pending")
+        project_review_status_choice = ProjectReviewStatusChoice.objects.get_by_natural_key("Pending")
 
         if project_review_form.is_valid():
             form_data = project_review_form.cleaned_data
@@ -1321,7 +1311,7 @@ class ProjectReviewCompleteView(LoginRequiredMixin, UserPassesTestMixin, View):
     def get(self, request, project_review_pk):
         project_review_obj = get_object_or_404(ProjectReview, pk=project_review_pk)
 
-        project_review_status_completed_obj = ProjectReviewStatusChoice.objects.get(name="Completed")
+        project_review_status_completed_obj = ProjectReviewStatusChoice.objects.get_by_natural_key("Completed")
         project_review_obj.status = project_review_status_completed_obj
         project_review_obj.project.project_needs_review = False
         project_review_obj.save()
@@ -1,7 +1,11 @@
 from django.contrib import admin
 from simple_history.admin import SimpleHistoryAdmin
 
-from coldfront.core.publication.models import Publication, PublicationSource
+from coldfront.core.publication.models import (
+    Publication,
+    PublicationBibtex,
+    PublicationSource,
+)
 
 
 @admin.register(PublicationSource)
@@ -16,3 +20,9 @@ class PublicationSourceAdmin(SimpleHistoryAdmin):
 class PublicationAdmin(SimpleHistoryAdmin):
     list_display = ("title", "author", "journal", "year")
     search_fields = ("project__pi__username", "project__pi__last_name", "title")
+
+
+@admin.register(PublicationBibtex)
+class PublicationBibtexAdmin(admin.ModelAdmin):
+    list_display = ("unique_id", "source", "modified")
+    search_fields = ("unique_id",)
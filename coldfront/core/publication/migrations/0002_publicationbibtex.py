@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:45
+
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("publication", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublicationBibtex",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now, editable=False, verbose_name="modified"
+                    ),
+                ),
+                ("unique_id", models.CharField(max_length=255, unique=True)),
+                ("bibtex", models.TextField()),
+                (
+                    "source",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="publication.publicationsource"),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
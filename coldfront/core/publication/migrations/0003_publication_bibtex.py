@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("publication", "0002_publicationbibtex"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historicalpublication",
+            name="bibtex",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="publication",
+            name="bibtex",
+            field=models.TextField(blank=True),
+        ),
+    ]
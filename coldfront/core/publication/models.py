@@ -32,6 +32,7 @@ class Publication(TimeStampedModel):
         unique_id (str): publication ID
         source (PublicationSource): represents the source of the publication
         status (str): publication status
+        bibtex (str): BibTeX entry of the publication as returned by its source, empty for manually added publications
     """
 
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
@@ -46,6 +47,7 @@ class Publication(TimeStampedModel):
         ("Archived", "Archived"),
     )
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="Active")
+    bibtex = models.TextField(blank=True)
     history = HistoricalRecords()
 
     class Meta:
@@ -56,3 +58,21 @@ class Publication(TimeStampedModel):
 
     def display_uid(self):
         return self.unique_id
+
+
+class PublicationBibtex(TimeStampedModel):
+    """A publication BibTeX caches the BibTeX of a publication ID as returned by its source, so that searching for
+    and exporting the same publication does not query the source again.
+
+    Attributes:
+        unique_id (str): publication ID
+        source (PublicationSource): the source that resolved the ID
+        bibtex (str): the BibTeX entry returned by the source
+    """
+
+    unique_id = models.CharField(max_length=255, unique=True)
+    source = models.ForeignKey(PublicationSource, on_delete=models.CASCADE)
+    bibtex = models.TextField()
+
+    def __str__(self):
+        return self.unique_id
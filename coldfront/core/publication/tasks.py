@@ -0,0 +1,17 @@
+import logging
+
+from coldfront.core.publication.models import Publication
+from coldfront.core.publication.utils import MANUAL_SOURCE, store_publication_bibtex
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_publication_bibtex(batch_size=100):
+    """Store the BibTeX of publications added before it was kept with the publication"""
+    publications = Publication.objects.filter(bibtex="").exclude(source__name=MANUAL_SOURCE).order_by("pk")
+    unique_ids = list(publications.values_list("unique_id", flat=True).distinct())
+    filled = 0
+    for start in range(0, len(unique_ids), batch_size):
+        filled += store_publication_bibtex(publications.filter(unique_id__in=unique_ids[start : start + batch_size]))
+    logger.info("Stored BibTeX for %s publications from %s publication IDs", filled, len(unique_ids))
+    return filled
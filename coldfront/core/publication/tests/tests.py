@@ -1,21 +1,29 @@
 import contextlib
 import itertools
+import logging
 from unittest.mock import Mock, sentinel, patch
 import bibtexparser.bibdatabase
 import bibtexparser.bparser
+from django.contrib.messages import get_messages
 from django.test import TestCase
-import doi2bib
+from django.urls import reverse
+import requests
 
 from coldfront.core.test_helpers.factories import (
     ProjectFactory,
+    ProjectStatusChoiceFactory,
     PublicationSourceFactory,
+    UserFactory,
 )
 from coldfront.core.test_helpers.decorators import (
     makes_remote_requests,
 )
-from coldfront.core.publication.models import Publication
-from coldfront.core.publication.views import PublicationSearchResultView
-import coldfront.core.publication
+from coldfront.core.publication.models import Publication, PublicationBibtex, PublicationSource
+from coldfront.core.publication.tasks import backfill_publication_bibtex
+from coldfront.core.publication.utils import fetch_bibtex, get_publication_dict
+import coldfront.core.publication.utils
+
+logging.disable(logging.CRITICAL)
 
 
 class TestPublication(TestCase):
@@ -145,16 +153,16 @@ class TestDataRetrieval(TestCase):
             self._bibdatabase_first_entry = bibdatabase_first_entry.copy()
             self._unique_id = unique_id
 
-            def mock_get_bib(unique_id):
+            def mock_get(url, **kwargs):
                 # ensure specified unique_id is used here
-                if unique_id == self._unique_id:
-                    return sentinel.status, sentinel.bib_str
+                if url == "https://doi.org/{}".format(self._unique_id):
+                    return Mock(spec_set=requests.Response, text=sentinel.bib_str)
 
-            crossref = Mock(spec_set=doi2bib.crossref)
-            crossref.get_bib.side_effect = mock_get_bib
+            requests_module = Mock(spec_set=requests)
+            requests_module.get.side_effect = mock_get
 
             def mock_parse(thing_to_parse):
-                # ensure bib_str from get_bib() is used
+                # ensure bib_str from get() is used
                 if thing_to_parse is sentinel.bib_str:
                     bibdatabase_cls = Mock(
                         spec_set=bibtexparser.bibdatabase.BibDatabase
@@ -169,20 +177,20 @@ class TestDataRetrieval(TestCase):
             as_text = Mock(spec_set=bibtexparser.bibdatabase.as_text)
             as_text.side_effect = lambda bib_entry: "as_text({})".format(bib_entry)
 
-            self.crossref = crossref
+            self.requests = requests_module
             self.bibtexparser_cls = bibtexparser_cls
             self.as_text = as_text
 
         @contextlib.contextmanager
         def patch(self):
             def dotpath(qualname):
-                module_under_test = coldfront.core.publication.views
+                module_under_test = coldfront.core.publication.utils
                 return "{}.{}".format(module_under_test.__name__, qualname)
 
             with contextlib.ExitStack() as stack:
                 patches = [
                     patch(dotpath("BibTexParser"), new=self.bibtexparser_cls),
-                    patch(dotpath("crossref"), new=self.crossref),
+                    patch(dotpath("requests"), new=self.requests),
                     patch(dotpath("as_text"), new=self.as_text),
                 ]
                 for p in patches:
@@ -192,12 +200,9 @@ class TestDataRetrieval(TestCase):
     def setUp(self):
         self.data = self.Data()
 
-    def run_target_method(self, unique_id, *args, **kwargs):
-        target_method = PublicationSearchResultView._search_id
-
-        # this method is defined as an instance method but doesn't use any instance data
-        # thus, we use None for its 'self' argument
-        return target_method(None, unique_id, *args, **kwargs)
+    def run_target_method(self, unique_id):
+        source, bib_str, bib_json = fetch_bibtex(unique_id, PublicationSource.objects.all())
+        return get_publication_dict(unique_id, source, bib_json)
 
     @makes_remote_requests()
     def test_doi_retrieval(self):
@@ -265,3 +270,152 @@ class TestDataRetrieval(TestCase):
                 with mocks.patch():
                     retrieved_data = self.run_target_method(unique_id)
                 self.assertEqual(expected_data, retrieved_data)
+
+
+class TestPublicationLookup(TestCase):
+    """Tests for looking up and exporting publications through the BibTeX cache"""
+
+    def setUp(self):
+        self.project = ProjectFactory(status=ProjectStatusChoiceFactory(name="Active"))
+        self.source = PublicationSourceFactory()
+        self.user = UserFactory(is_superuser=True)
+        self.client.force_login(self.user, backend="django.contrib.auth.backends.ModelBackend")
+
+        def mock_fetch_bibtex(unique_id, sources):
+            bib_str = "@article{{{0},\n title = {{Title {0}}},\n author = {{Author}},\n year = {{2020}}\n}}\n".format(
+                unique_id.replace("/", "_")
+            )
+            return self.source, bib_str, {}
+
+        patcher = patch("coldfront.core.publication.utils.fetch_bibtex", side_effect=mock_fetch_bibtex)
+        self.fetch_bibtex = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_search_results_are_cached(self):
+        """Test that each ID is looked up once and then served from the BibTeX cache"""
+        url = reverse("publication-search-result", kwargs={"project_pk": self.project.pk})
+        response = self.client.post(url, {"search_id": "10.1/a 10.1/b 10.1/a"})
+        self.assertEqual(len(response.context["pubs"]), 2)
+        self.assertEqual(self.fetch_bibtex.call_count, 2)
+
+        response = self.client.post(url, {"search_id": "10.1/a 10.1/b 10.1/c"})
+        self.assertEqual(
+            sorted(pub["title"] for pub in response.context["pubs"]),
+            ["Title 10.1_a", "Title 10.1_b", "Title 10.1_c"],
+        )
+        self.assertEqual(self.fetch_bibtex.call_count, 3)
+        self.assertEqual(PublicationBibtex.objects.count(), 3)
+
+    def test_add_stores_bibtex(self):
+        """Test that adding a looked up publication keeps its BibTeX"""
+        self.client.post(
+            reverse("publication-search-result", kwargs={"project_pk": self.project.pk}),
+            {"search_id": "10.1/a"},
+        )
+        pub = {
+            "title": "Title 10.1_a",
+            "author": "Author",
+            "year": "2020",
+            "journal": "Journal",
+            "unique_id": "10.1/a",
+            "source_pk": self.source.pk,
+        }
+        response = self.client.post(
+            reverse("add-publication", kwargs={"project_pk": self.project.pk}),
+            {
+                "pubs": repr([pub]),
+                "pubform-TOTAL_FORMS": "1",
+                "pubform-INITIAL_FORMS": "1",
+                "pubform-0-selected": "on",
+                "pubform-0-title": "Title 10.1_a",
+                "pubform-0-author": "Author",
+                "pubform-0-year": "2020",
+                "pubform-0-journal": "Journal",
+                "pubform-0-unique_id": "10.1/a",
+                "pubform-0-source_pk": self.source.pk,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        publication = Publication.objects.get(project=self.project, unique_id="10.1/a")
+        self.assertIn("Title 10.1_a", publication.bibtex)
+
+    def test_export_streams_stored_bibtex(self):
+        """Test that exporting publications streams their stored BibTeX without looking them up"""
+        for year, unique_id in [(2019, "10.1/a"), (2021, "10.1/b")]:
+            Publication.objects.create(
+                project=self.project,
+                title="Title",
+                author="Author",
+                year=year,
+                journal="Journal",
+                unique_id=unique_id,
+                source=self.source,
+                bibtex=f"@article{{{unique_id}}}\n",
+            )
+        url = reverse("publication-export-publications", kwargs={"project_pk": self.project.pk})
+        response = self.client.post(
+            url,
+            {
+                "publicationform-TOTAL_FORMS": "2",
+                "publicationform-INITIAL_FORMS": "2",
+                "publicationform-0-selected": "on",
+                "publicationform-1-selected": "on",
+            },
+        )
+        self.assertEqual(b"".join(response.streaming_content), b"@article{10.1/b}\n@article{10.1/a}\n")
+        self.fetch_bibtex.assert_not_called()
+
+    def test_export_warns_about_publications_without_bibtex(self):
+        """Test that exporting looks nothing up, and reports the publications without stored BibTeX"""
+        manual_source = PublicationSourceFactory(name="manual")
+        for title, unique_id, source in [("Stored", "10.1/a", self.source), ("Manual", "manual-1", manual_source)]:
+            Publication.objects.create(
+                project=self.project,
+                title=title,
+                author="Author",
+                year=2020,
+                journal="Journal",
+                unique_id=unique_id,
+                source=source,
+            )
+        url = reverse("publication-export-publications", kwargs={"project_pk": self.project.pk})
+        response = self.client.post(
+            url,
+            {
+                "publicationform-TOTAL_FORMS": "2",
+                "publicationform-INITIAL_FORMS": "2",
+                "publicationform-0-selected": "on",
+                "publicationform-1-selected": "on",
+            },
+        )
+
+        self.assertEqual(b"".join(response.streaming_content), b"")
+        self.fetch_bibtex.assert_not_called()
+        self.assertEqual(Publication.objects.get(unique_id="10.1/a").bibtex, "")
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            [
+                "No BibTeX is available for 2 of the selected publications, they were left out of refs.bib: "
+                "Stored; Manual"
+            ],
+        )
+
+    def test_backfill_publication_bibtex(self):
+        """Test that the backfill task stores BibTeX for publications without it"""
+        PublicationBibtex.objects.create(unique_id="10.1/a", source=self.source, bibtex="@article{cached}\n")
+        for unique_id in ["10.1/a", "10.1/b"]:
+            Publication.objects.create(
+                project=self.project,
+                title="Title",
+                author="Author",
+                year=2020,
+                journal="Journal",
+                unique_id=unique_id,
+                source=self.source,
+            )
+
+        self.assertEqual(backfill_publication_bibtex(), 2)
+        self.assertEqual(Publication.objects.get(unique_id="10.1/a").bibtex, "@article{cached}\n")
+        self.assertIn("Title 10.1_b", Publication.objects.get(unique_id="10.1/b").bibtex)
+        self.assertEqual(self.fetch_bibtex.call_count, 1)
+        self.assertEqual(backfill_publication_bibtex(), 0)
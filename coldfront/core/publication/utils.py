@@ -0,0 +1,183 @@
+import logging
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from bibtexparser.bibdatabase import as_text
+from bibtexparser.bparser import BibTexParser
+
+from coldfront.core.publication.models import Publication, PublicationBibtex, PublicationSource
+from coldfront.core.utils.common import import_from_settings
+
+logger = logging.getLogger(__name__)
+
+MANUAL_SOURCE = "manual"
+PUBLICATION_SOURCE_TIMEOUT = import_from_settings("PUBLICATION_SOURCE_TIMEOUT", 5)
+PUBLICATION_SEARCH_MAX_WORKERS = import_from_settings("PUBLICATION_SEARCH_MAX_WORKERS", 8)
+
+
+def fetch_bibtex(unique_id, sources):
+    """
+    Params:
+        unique_id (str): publication ID
+        sources (list[PublicationSource]): sources to query, in order
+
+    Returns:
+        tuple: the first source that resolves the ID, its BibTeX and the parsed BibTeX entry, or (None, None, None)
+    """
+
+    for source in sources:
+        if source.name == "doi":
+            try:
+                r = requests.get(
+                    "https://doi.org/{}".format(unique_id),
+                    headers={"Accept": "application/x-bibtex; charset=utf-8"},
+                    timeout=PUBLICATION_SOURCE_TIMEOUT,
+                )
+                r.raise_for_status()
+                bp = BibTexParser(interpolate_strings=False)
+                bib_database = bp.parse(r.text)
+                return source, r.text, bib_database.entries[0]
+            except Exception:
+                continue
+
+        elif source.name == "adsabs":
+            try:
+                url = "http://adsabs.harvard.edu/cgi-bin/nph-bib_query?bibcode={}&data_type=BIBTEX".format(unique_id)
+                r = requests.get(url, timeout=PUBLICATION_SOURCE_TIMEOUT)
+                bp = BibTexParser(interpolate_strings=False)
+                bib_database = bp.parse(r.text)
+                return source, r.text, bib_database.entries[0]
+            except Exception:
+                continue
+
+    return None, None, None
+
+
+def get_bibtex(unique_ids):
+    """
+    Params:
+        unique_ids (list[str]): publication IDs
+
+    Returns:
+        dict: the source and BibTeX of each resolved ID. IDs are read from the PublicationBibtex cache, and the others
+        are looked up concurrently and cached.
+    """
+
+    bibtex_by_id = {
+        cached.unique_id: (cached.source, cached.bibtex)
+        for cached in PublicationBibtex.objects.filter(unique_id__in=unique_ids).select_related("source")
+    }
+    missing_ids = [unique_id for unique_id in unique_ids if unique_id not in bibtex_by_id]
+    if not missing_ids:
+        return bibtex_by_id
+
+    sources = list(PublicationSource.objects.all())
+    max_workers = min(PUBLICATION_SEARCH_MAX_WORKERS, len(missing_ids))
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(fetch_bibtex, unique_id, sources): unique_id for unique_id in missing_ids}
+        # Each request times out on its own, so the lookup waits one source timeout per round of workers
+        rounds = math.ceil(len(missing_ids) / max_workers)
+        done, not_done = wait(futures, timeout=PUBLICATION_SOURCE_TIMEOUT * rounds)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not_done:
+        logger.warning(
+            "Publication lookup timed out for %s",
+            ", ".join(futures[future] for future in not_done),
+        )
+
+    fetched = []
+    for future in done:
+        source, bib_str, bib_json = future.result()
+        if source:
+            fetched.append(PublicationBibtex(unique_id=futures[future], source=source, bibtex=bib_str))
+    PublicationBibtex.objects.bulk_create(fetched, ignore_conflicts=True)
+    bibtex_by_id.update({cached.unique_id: (cached.source, cached.bibtex) for cached in fetched})
+    return bibtex_by_id
+
+
+def store_publication_bibtex(publications):
+    """Stores the BibTeX of publications added without it, from the PublicationBibtex cache or looked up
+
+    Params:
+        publications (QuerySet[Publication]): publications without BibTeX, not entered manually
+
+    Returns:
+        int: number of publications whose BibTeX was found and stored
+    """
+
+    publications = list(publications)
+    bibtex_by_id = get_bibtex(list({publication.unique_id for publication in publications}))
+    to_update = []
+    for publication in publications:
+        if publication.unique_id in bibtex_by_id:
+            publication.bibtex = bibtex_by_id[publication.unique_id][1]
+            to_update.append(publication)
+    Publication.objects.bulk_update(to_update, ["bibtex"])
+    return len(to_update)
+
+
+def get_publication_dict(unique_id, source, bib_json):
+    """
+    Params:
+        unique_id (str): publication ID
+        source (PublicationSource): the source that resolved the ID
+        bib_json (dict): the parsed BibTeX entry
+
+    Returns:
+        dict: the publication fields shown on the search results
+    """
+
+    year = as_text(bib_json["year"])
+    author = (
+        as_text(bib_json["author"])
+        .replace("{\\textquotesingle}", "'")
+        .replace("{\\textendash}", "-")
+        .replace("{\\textemdash}", "-")
+        .replace("{\\textasciigrave}", " ")
+        .replace("{\\textdaggerdbl}", " ")
+        .replace("{\\textdagger}", " ")
+    )
+    title = (
+        as_text(bib_json["title"])
+        .replace("{\\textquotesingle}", "'")
+        .replace("{\\textendash}", "-")
+        .replace("{\\textemdash}", "-")
+        .replace("{\\textasciigrave}", " ")
+        .replace("{\\textdaggerdbl}", " ")
+        .replace("{\\textdagger}", " ")
+    )
+
+    author = re.sub("{|}", "", author)
+    title = re.sub("{|}", "", title)
+
+    # not all bibtex entries will have a journal field
+    if "journal" in bib_json:
+        journal = (
+            as_text(bib_json["journal"])
+            .replace("{\\textquotesingle}", "'")
+            .replace("{\\textendash}", "-")
+            .replace("{\\textemdash}", "-")
+            .replace("{\\textasciigrave}", " ")
+            .replace("{\\textdaggerdbl}", " ")
+            .replace("{\\textdagger}", " ")
+        )
+        journal = re.sub("{|}", "", journal)
+    else:
+        # fallback: clearly indicate that data was absent
+        source_name = source.name
+        journal = "[no journal info from {}]".format(source_name.upper())
+
+    pub_dict = {}
+    pub_dict["author"] = author
+    pub_dict["year"] = year
+    pub_dict["title"] = title
+    pub_dict["journal"] = journal
+    pub_dict["unique_id"] = unique_id
+    pub_dict["source_pk"] = source.pk
+
+    return pub_dict
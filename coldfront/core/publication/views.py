@@ -1,14 +1,10 @@
 import ast
-import re
 import uuid
-import requests
-import io
-from bibtexparser.bibdatabase import as_text
 from bibtexparser.bparser import BibTexParser
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.forms import formset_factory
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.views.generic import TemplateView, View
@@ -22,11 +18,12 @@ from coldfront.core.publication.forms import (
     PublicationSearchForm,
     PublicationExportForm,
 )
-from coldfront.core.publication.models import Publication, PublicationSource
-from doi2bib import crossref
-
-
-MANUAL_SOURCE = "manual"
+from coldfront.core.publication.models import (
+    Publication,
+    PublicationBibtex,
+    PublicationSource,
+)
+from coldfront.core.publication.utils import MANUAL_SOURCE, get_bibtex, get_publication_dict
 
 
 class PublicationSearchView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
@@ -104,97 +101,21 @@ class PublicationSearchResultView(
         else:
             return super().dispatch(request, *args, **kwargs)
 
-    def _search_id(self, unique_id):
-        matching_source_obj = None
-        for source in PublicationSource.objects.all():
-            if source.name == "doi":
-                try:
-                    status, bib_str = crossref.get_bib(unique_id)
-                    bp = BibTexParser(interpolate_strings=False)
-                    bib_database = bp.parse(bib_str)
-                    bib_json = bib_database.entries[0]
-                    matching_source_obj = source
-                    break
-                except:
-                    continue
-
-            elif source.name == "adsabs":
-                try:
-                    url = "http://adsabs.harvard.edu/cgi-bin/nph-bib_query?bibcode={}&data_type=BIBTEX".format(
-                        unique_id
-                    )
-                    r = requests.get(url, timeout=5)
-                    bp = BibTexParser(interpolate_strings=False)
-                    bib_database = bp.parse(r.text)
-                    bib_json = bib_database.entries[0]
-                    matching_source_obj = source
-                    break
-                except:
-                    continue
-
-        if not matching_source_obj:
-            return False
-
-        year = as_text(bib_json["year"])
-        author = (
-            as_text(bib_json["author"])
-            .replace("{\\textquotesingle}", "'")
-            .replace("{\\textendash}", "-")
-            .replace("{\\textemdash}", "-")
-            .replace("{\\textasciigrave}", " ")
-            .replace("{\\textdaggerdbl}", " ")
-            .replace("{\\textdagger}", " ")
-        )
-        title = (
-            as_text(bib_json["title"])
-            .replace("{\\textquotesingle}", "'")
-            .replace("{\\textendash}", "-")
-            .replace("{\\textemdash}", "-")
-            .replace("{\\textasciigrave}", " ")
-            .replace("{\\textdaggerdbl}", " ")
-            .replace("{\\textdagger}", " ")
-        )
-
-        author = re.sub("{|}", "", author)
-        title = re.sub("{|}", "", title)
-
-        # not all bibtex entries will have a journal field
-        if "journal" in bib_json:
-            journal = (
-                as_text(bib_json["journal"])
-                .replace("{\\textquotesingle}", "'")
-                .replace("{\\textendash}", "-")
-                .replace("{\\textemdash}", "-")
-                .replace("{\\textasciigrave}", " ")
-                .replace("{\\textdaggerdbl}", " ")
-                .replace("{\\textdagger}", " ")
-            )
-            journal = re.sub("{|}", "", journal)
-        else:
-            # fallback: clearly indicate that data was absent
-            source_name = matching_source_obj.name
-            journal = "[no journal info from {}]".format(source_name.upper())
-
-        pub_dict = {}
-        pub_dict["author"] = author
-        pub_dict["year"] = year
-        pub_dict["title"] = title
-        pub_dict["journal"] = journal
-        pub_dict["unique_id"] = unique_id
-        pub_dict["source_pk"] = matching_source_obj.pk
-
-        return pub_dict
-
     def post(self, request, *args, **kwargs):
         search_ids = list(set(request.POST.get("search_id").split()))
         project_pk = self.kwargs.get("project_pk")
 
         project_obj = get_object_or_404(Project, pk=project_pk)
+        bibtex_by_id = get_bibtex(search_ids)
         pubs = []
         for ele in search_ids:
-            pub_dict = self._search_id(ele)
-            if pub_dict:
-                pubs.append(pub_dict)
+            if ele in bibtex_by_id:
+                source, bib_str = bibtex_by_id[ele]
+                bp = BibTexParser(interpolate_strings=False)
+                bib_database = bp.parse(bib_str)
+                pubs.append(
+                    get_publication_dict(ele, source, bib_database.entries[0])
+                )
 
         formset = formset_factory(PublicationResultForm, max_num=len(pubs))
         formset = formset(initial=pubs, prefix="pubform")
@@ -250,31 +171,36 @@ class PublicationAddView(LoginRequiredMixin, UserPassesTestMixin, View):
         publications_added = 0
         publications_skipped = []
         if formset.is_valid():
-            for form in formset:
-                form_data = form.cleaned_data
-
-                if form_data["selected"]:
-                    source_obj = PublicationSource.objects.get(
-                        pk=form_data.get("source_pk")
-                    )
-                    author = form_data.get("author")
-                    if len(author) > 1024:
-                        author = author[:1024]
-                    publication_obj, created = Publication.objects.get_or_create(
-                        project=project_obj,
-                        unique_id=form_data.get("unique_id"),
-                        defaults={
-                            "title": form_data.get("title"),
-                            "author": author,
-                            "year": form_data.get("year"),
-                            "journal": form_data.get("journal"),
-                            "source": source_obj,
-                        },
-                    )
-                    if created:
-                        publications_added += 1
-                    else:
-                        publications_skipped.append(form_data.get("unique_id"))
+            selected = [form.cleaned_data for form in formset if form.cleaned_data["selected"]]
+            sources = PublicationSource.objects.in_bulk(
+                [form_data.get("source_pk") for form_data in selected]
+            )
+            # The search stored the BibTeX of every result, keep it with the publication
+            bibtex_by_id = dict(
+                PublicationBibtex.objects.filter(
+                    unique_id__in=[form_data.get("unique_id") for form_data in selected]
+                ).values_list("unique_id", "bibtex")
+            )
+            for form_data in selected:
+                author = form_data.get("author")
+                if len(author) > 1024:
+                    author = author[:1024]
+                publication_obj, created = Publication.objects.get_or_create(
+                    project=project_obj,
+                    unique_id=form_data.get("unique_id"),
+                    defaults={
+                        "title": form_data.get("title"),
+                        "author": author,
+                        "year": form_data.get("year"),
+                        "journal": form_data.get("journal"),
+                        "source": sources[form_data.get("source_pk")],
+                        "bibtex": bibtex_by_id.get(form_data.get("unique_id"), ""),
+                    },
+                )
+                if created:
+                    publications_added += 1
+                else:
+                    publications_skipped.append(form_data.get("unique_id"))
 
             msg = ""
             if publications_added:
@@ -525,31 +451,30 @@ class PublicationExportPublicationsView(
             request.POST, initial=publications_do_export, prefix="publicationform"
         )
 
-        publications_deleted_count = 0
-        bib_text = ""
         if formset.is_valid():
-            for form in formset:
-                publication_form_data = form.cleaned_data
-                if publication_form_data["selected"]:
-                    publication_obj = Publication.objects.get(
-                        project=project_obj,
-                        title=publication_form_data.get("title"),
-                        year=publication_form_data.get("year"),
-                        unique_id=publication_form_data.get("unique_id"),
-                    )
-                    logger.info("id is" + publication_obj.display_uid())
-                    temp_id = publication_obj.display_uid()
-                    status, bib_str = crossref.get_bib(publication_obj.display_uid())
-                    bp = BibTexParser(interpolate_strings=False)
-                    bib_database = bp.parse(bib_str)
-                    bib_text += bib_str
-            response = HttpResponse(content_type="text/plain")
+            selected_ids = [
+                form.cleaned_data.get("unique_id")
+                for form in formset
+                if form.cleaned_data["selected"]
+            ]
+            selected = project_obj.publication_set.filter(unique_id__in=selected_ids)
+            # The export never looks BibTeX up, backfill_publication_bibtex stores it for the older publications
+            skipped = list(selected.filter(bibtex="").values_list("title", flat=True))
+            if skipped:
+                messages.warning(
+                    request,
+                    "No BibTeX is available for {} of the selected publications, they were left out of "
+                    "refs.bib: {}".format(len(skipped), "; ".join(skipped)),
+                )
+            bibtex = (
+                selected.exclude(bibtex="")
+                .order_by("-year")
+                .values_list("bibtex", flat=True)
+            )
+            response = StreamingHttpResponse(
+                bibtex.iterator(), content_type="text/plain"
+            )
             response["Content-Disposition"] = "attachment; filename=refs.bib"
-            buffer = io.StringIO()
-            buffer.write(bib_text)
-            output = buffer.getvalue()
-            buffer.close()
-            response.write(output)
             return response
         else:
             for error in formset.errors:
@@ -245,9 +245,19 @@ class Resource(TimeStampedModel):
             str: If the resource has OnDemand status or not
         """
 
-        ondemand = self.resourceattribute_set.filter(
-            resource_attribute_type__name="OnDemand"
-        ).first()
+        if "resourceattribute_set" in getattr(self, "_prefetched_objects_cache", {}):
+            ondemand = next(
+                (
+                    attribute
+                    for attribute in self.resourceattribute_set.all()
+                    if attribute.resource_attribute_type.name == "OnDemand"
+                ),
+                None,
+            )
+        else:
+            ondemand = self.resourceattribute_set.filter(
+                resource_attribute_type__name="OnDemand"
+            ).first()
         if ondemand:
             return ondemand.value
         return None
@@ -2,10 +2,12 @@ import argparse
 import logging
 
 from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
 
-from coldfront.core.project.models import Project, ProjectUser, ProjectUserRoleChoice, ProjectUserStatusChoice
+from coldfront.core.project.models import Project, ProjectUser
+from coldfront.core.project.utils import add_user_to_projects
 from coldfront.core.school.models import School
-from coldfront.core.user.models import User, ApproverProfile
+from coldfront.core.user.models import User
 from coldfront.core.utils.common import import_from_settings
 
 logger = logging.getLogger(__name__)
@@ -49,29 +51,31 @@ class Command(BaseCommand):
             approver: User = User.objects.get(username=options["username"])
             school: School = School.objects.get(description=options["school"])
             dry_run: bool = options["dry_run"]
-            manager_role: ProjectUserRoleChoice = ProjectUserRoleChoice.objects.get(name="Manager")
-            active_status: ProjectUserStatusChoice = ProjectUserStatusChoice.objects.get(name="Active")
 
             approver_profile = approver.userprofile.approver_profile
-            schools_for_approver = approver_profile.schools.all()
-
-            if school not in schools_for_approver:
+            if not approver_profile.schools.filter(pk=school.pk).exists():
                 logger.warning(f"User {approver} is not school approver for {school}")
                 return
 
-            projects_for_school = Project.objects.filter(school=school)
-            for project in projects_for_school:
-                approver_in_project = ProjectUser.objects.filter(project=project, user=approver).exists()
-                if not approver_in_project:
-                    logger.info(f"approver '{approver}' not in project '{project}' and will be added")
-                    if not dry_run:
-                        approver_as_manager, status = ProjectUser.objects.get_or_create(
-                            user=approver,
-                            project=project,
-                            role=manager_role,
-                            status=active_status,
-                        )
-                        logger.info(f"Status of adding approver '{approver}' to project '{project}' is '{status}'")
+            # The projects of the school the approver isn't in yet, in one query
+            missing_projects = list(
+                Project.objects.filter(school=school)
+                .exclude(Exists(ProjectUser.objects.filter(project=OuterRef("pk"), user=approver)))
+                .order_by("pk")
+                .values_list("pk", "title")
+            )
+            for project_pk, title in missing_projects:
+                self.stdout.write(f"+ {approver.username} as Manager of project {project_pk} '{title}'")
+
+            if dry_run:
+                self.stdout.write(f"Dry run, {len(missing_projects)} projects would be changed")
+                return
+
+            project_users = add_user_to_projects(
+                approver, [project_pk for project_pk, _ in missing_projects], "Manager"
+            )
+            logger.info(f"Added approver '{approver}' to {len(project_users)} projects of school '{school}'")
+            self.stdout.write(f"Added {approver.username} to {len(project_users)} projects")
 
         except Exception:
             logger.warning("Exception occurred with traceback:", exc_info=True)
@@ -1,8 +1,10 @@
 import os
 
-from django.core.management.base import BaseCommand
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
 
 from coldfront.core.school.models import School
+from coldfront.core.utils.importer import FORMATS, BulkImporter, read_records
 
 app_commands_dir = os.path.dirname(__file__)
 
@@ -16,22 +18,31 @@ class Command(BaseCommand):
             "--csv-file-path",
             type=str,
             default=default_path,
-            help="Filesystem path to the tab‑delimited school_data.csv",
+            help="Filesystem path to the school data, by default the tab‑delimited school_data.csv",
         )
+        parser.add_argument(
+            "--format",
+            choices=sorted(set(FORMATS.values())),
+            default="tsv",
+            help="Format of the file. CSV and TSV files have pk and description columns without a header row, JSON "
+            "files have pk and description keys.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of schools written at a time")
+        parser.add_argument("--dry-run", action="store_true", help="Count the changes without making them")
 
     def handle(self, *args, **options):
-        print("Adding schools ...")
-        file_path = options["csv_file_path"]
-        with open(file_path, "r") as fp:
-            for line in fp:
-                pk, description = line.strip().split("\t")
-                _, created = School.objects.get_or_create(
-                    pk=pk,
-                    description=description,
+        self.stdout.write("Adding schools ...")
+        importer = BulkImporter(School, ["pk"], ["description"], batch_size=options["batch_size"])
+        with open(options["csv_file_path"], "r", encoding="utf-8", newline="") as fp:
+            try:
+                result = importer.run(
+                    read_records(fp, options["format"], fieldnames=["pk", "description"]),
+                    dry_run=options["dry_run"],
                 )
-                if created:
-                    print(f"created school {description}")
-                else:
-                    print(f"school {description} already exists")
+            except ValidationError as e:
+                raise CommandError(f"Invalid school data: {'; '.join(e.messages)}")
 
-        print("Finished adding schools")
+        if options["dry_run"]:
+            self.stdout.write(f"Dry run, schools would be {result}")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Finished adding schools: {result}"))
@@ -3,7 +3,9 @@ from io import StringIO
 from django.contrib.auth.models import Permission
 from django.core.exceptions import ValidationError
 from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from coldfront.core.project.models import ProjectUser
 from coldfront.core.school.models import School
@@ -191,6 +193,16 @@ class TestAddSchoolApproverToAllProjectsCommand(TestCase):
             stdout=out
         )
 
+        # Verify the projects that would be changed are listed
+        self.assertEqual(
+            out.getvalue().splitlines(),
+            [
+                f"+ approver123 as Manager of project {self.project1.pk} 'Test Project 1'",
+                f"+ approver123 as Manager of project {self.project2.pk} 'Test Project 2'",
+                "Dry run, 2 projects would be changed",
+            ],
+        )
+
         # Verify no changes were made
         self.assertFalse(ProjectUser.objects.filter(
             user=self.approver,
@@ -201,6 +213,24 @@ class TestAddSchoolApproverToAllProjectsCommand(TestCase):
             project=self.project2
         ).exists())
 
+    def test_command_queries_do_not_grow_with_projects(self):
+        """Test that the approver is added to all projects with a fixed number of queries, recording their history."""
+        for i in range(20):
+            ProjectFactory(pi=self.pi_user, school=self.school, title=f"Bulk Project {i}", status=self.project_status)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                "add_school_approver_to_all_projects",
+                "--username", "approver123",
+                "--school", "Test School",
+                stdout=StringIO()
+            )
+
+        self.assertLess(len(queries), 15)
+        project_users = ProjectUser.objects.filter(user=self.approver, role=self.manager_role)
+        self.assertEqual(project_users.count(), 22)
+        self.assertEqual(ProjectUser.history.filter(user=self.approver).count(), 22)
+
     def test_command_skips_projects_where_approver_already_exists(self):
         """Test that command skips projects where approver is already a member."""
         # Add approver to one project with User role
@@ -1,10 +1,13 @@
 import json
 import logging
 import os
+from collections import defaultdict
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from coldfront.core.school.models import School
 from coldfront.core.user.models import UserProfile, ApproverProfile
+from coldfront.core.utils.importer import BulkImporter
 from django.contrib.auth.models import User, Permission
 
 logger = logging.getLogger(__name__)
@@ -12,56 +15,117 @@ logger = logging.getLogger(__name__)
 app_commands_dir = os.path.dirname(__file__)
 
 
-def load_approver_schools(json_data):
-    """
-    Grant is_staff, approver_profile, "can_review_allocation_requests" permission associated with schools
+PERMISSION_CODENAME = "can_review_allocation_requests"
+
+
+@transaction.atomic
+def load_approver_schools(json_data, dry_run=False):
     """
-    for approver_username, school_descriptions in json_data.items():
-        try:
-            # Check if the user exists
-            user = User.objects.get(username=approver_username)
-            # Make as a staff to let an approver view admin navigation bar
-            user.is_staff = True
-            user.save()
-        except User.DoesNotExist:
-            logger.info(f"User {approver_username} not found. Skipping.")
-            continue  # Skip to the next user
+    Grant is_staff, approver_profile, "can_review_allocation_requests" permission associated with schools, with a
+    few bulk writes whatever the number of approvers
 
-        # Get UserProfile for the user
-        user_profile = UserProfile.objects.filter(user=user).first()
+    Params:
+        json_data (dict): school descriptions by approver username, the schools of each approver are replaced with them
+        dry_run (bool): only compute the changes
 
-        # Grant 'can_review_allocation_requests' permission if not already granted
-        perm_codename = "can_review_allocation_requests"
-        perm = Permission.objects.filter(codename=perm_codename).first()
+    Returns:
+        list[str]: the changes made, or that would be made with dry_run
+    """
+    changes = []
+    users = User.objects.in_bulk(list(json_data), field_name="username")
+    for approver_username in json_data:
+        if approver_username not in users:
+            logger.info(f"User {approver_username} not found. Skipping.")
 
-        if perm and not user.has_perm(f"allocation.{perm_codename}"):
-            user.user_permissions.add(perm)
-            user.save()
-            logger.info(f"Granted '{perm_codename}' permission to {approver_username}")
+    # Make as a staff to let an approver view admin navigation bar
+    new_staff = [user for user in users.values() if not user.is_staff]
+    changes += [f"~ {user.username}: staff" for user in new_staff]
 
-        # Ensure user is an approver
-        if not user_profile.is_approver():
-            logger.info(
-                f"Skipping {approver_username}: User does not have approver permission."
-            )
+    perm = Permission.objects.filter(codename=PERMISSION_CODENAME).first()
+    user_permission = User.user_permissions.through
+    if perm:
+        granted = set(
+            user_permission.objects.filter(permission=perm, user__in=users.values()).values_list("user_id", flat=True)
+        )
+        new_permissions = [user for user in users.values() if user.pk not in granted]
+        approvers = list(users.values())
+    else:
+        new_permissions = []
+        approvers = [user for user in users.values() if user.has_perm(f"allocation.{PERMISSION_CODENAME}")]
+    changes += [f"+ {user.username}: permission {PERMISSION_CODENAME}" for user in new_permissions]
+    for user in set(users.values()) - set(approvers):
+        logger.info(f"Skipping {user.username}: User does not have approver permission.")
+
+    user_profiles = {
+        user_profile.user_id: user_profile for user_profile in UserProfile.objects.filter(user__in=approvers)
+    }
+    approver_profiles = dict(
+        ApproverProfile.objects.filter(user_profile__in=user_profiles.values()).values_list(
+            "user_profile__user_id", "pk"
+        )
+    )
+    changes += [
+        f"+ {user.username}: approver profile"
+        for user in approvers
+        if user.pk in user_profiles and user.pk not in approver_profiles
+    ]
+
+    descriptions = {description for user in approvers for description in json_data[user.username]}
+    schools = School.objects.in_bulk(list(descriptions), field_name="description")
+    changes += [f"+ school {description}" for description in sorted(descriptions - set(schools))]
+
+    approver_school = ApproverProfile.schools.through
+    current_schools = defaultdict(dict)
+    for pk, approver_profile_id, description in approver_school.objects.filter(
+        approverprofile__in=approver_profiles.values()
+    ).values_list("pk", "approverprofile_id", "school__description"):
+        current_schools[approver_profile_id][description] = pk
+    added_schools = {}
+    removed_school_pks = []
+    for user in approvers:
+        if user.pk not in user_profiles:
             continue
-
-        # Create ApproverProfile if it does not exist
-        approver_profile, created = ApproverProfile.objects.get_or_create(
-            user_profile=user_profile
+        current = current_schools[approver_profiles.get(user.pk)]
+        wanted = set(json_data[user.username])
+        added_schools[user.pk] = sorted(wanted - set(current))
+        removed_school_pks += [pk for description, pk in current.items() if description not in wanted]
+        changes += [f"+ {user.username}: school {description}" for description in added_schools[user.pk]]
+        changes += [f"- {user.username}: school {description}" for description in sorted(set(current) - wanted)]
+
+    for change in changes:
+        logger.info(change)
+    if dry_run:
+        return changes
+
+    User.objects.filter(pk__in=[user.pk for user in new_staff]).update(is_staff=True)
+    user_permission.objects.bulk_create(
+        [user_permission(user=user, permission=perm) for user in new_permissions], ignore_conflicts=True
+    )
+    BulkImporter(School, ["description"]).run(
+        {"description": description} for description in descriptions if description not in schools
+    )
+    schools = School.objects.in_bulk(list(descriptions), field_name="description")
+    BulkImporter(ApproverProfile, ["user_profile"]).run(
+        {"user_profile_id": user_profile.pk}
+        for user_id, user_profile in user_profiles.items()
+        if user_id not in approver_profiles
+    )
+    approver_profiles = dict(
+        ApproverProfile.objects.filter(user_profile__in=user_profiles.values()).values_list(
+            "user_profile__user_id", "pk"
         )
+    )
+    approver_school.objects.filter(pk__in=removed_school_pks).delete()
+    approver_school.objects.bulk_create(
+        [
+            approver_school(approverprofile_id=approver_profiles[user_id], school=schools[description])
+            for user_id, descriptions in added_schools.items()
+            for description in descriptions
+        ],
+        ignore_conflicts=True,
+    )
 
-        # Ensure all schools exist before assigning
-        school_objects = [
-            School.objects.get_or_create(description=desc)[0]
-            for desc in school_descriptions
-        ]
-
-        # Update schools for the approver
-        approver_profile.schools.set(school_objects)
-        approver_profile.save()
-
-        logger.info(f"Updated {approver_username} with schools: {school_descriptions}")
+    return changes
 
 
 class Command(BaseCommand):
@@ -77,6 +141,11 @@ class Command(BaseCommand):
             default=default_path,
             help="Path to approver_schools_data.json",
         )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the changes without making them",
+        )
 
     def handle(self, *args, **options):
         json_file_path = options["json_file_path"]
@@ -84,6 +153,11 @@ class Command(BaseCommand):
 
         with open(json_file_path, "r", encoding="utf-8") as fp:
             json_data = json.load(fp)
-            load_approver_schools(json_data)
-
-        self.stdout.write(self.style.SUCCESS("Finished adding approvers."))
+            changes = load_approver_schools(json_data, dry_run=options["dry_run"])
+
+        for change in changes:
+            self.stdout.write(change)
+        if options["dry_run"]:
+            self.stdout.write(f"Dry run, {len(changes)} changes would be made")
+        else:
+            self.stdout.write(self.style.SUCCESS("Finished adding approvers."))
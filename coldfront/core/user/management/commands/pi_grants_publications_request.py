@@ -1,14 +1,17 @@
 import argparse
+import itertools
 import logging
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef, Q
+from django.template.loader import render_to_string
 
 from coldfront.core.grant.models import Grant
 from coldfront.core.project.models import Project
 from coldfront.core.publication.models import Publication
-from coldfront.core.user.models import UserProfile
 from coldfront.core.utils.common import import_from_settings
-from coldfront.core.utils.mail import send_email_template
+from coldfront.core.utils.mail import build_email, send_emails
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +20,37 @@ EMAIL_SIGNATURE = import_from_settings("EMAIL_SIGNATURE")
 EMAIL_SENDER = import_from_settings("EMAIL_SENDER")
 CENTER_BASE_URL = import_from_settings("CENTER_BASE_URL")
 
+# has_* annotation -> subject and template of the nudge sent for the projects without them
+NUDGES = {
+    "has_grants": ("Please update grant info for HPC project", "email/request_to_add_grants.txt"),
+    "has_publications": ("Please update publication info for HPC projects", "email/request_to_add_publications.txt"),
+}
+
+
+def get_projects_to_nudge(resume_after=None):
+    """
+    Params:
+        resume_after (int): only include the PIs with a greater user id
+
+    Returns:
+        QuerySet: values of the active and new projects of PIs missing grants or publications, with has_grants and
+        has_publications, ordered by PI
+    """
+
+    projects = (
+        Project.objects.filter(pi__userprofile__is_pi=True, status__name__in=["Active", "New"])
+        .annotate(
+            has_grants=Exists(Grant.objects.filter(project=OuterRef("pk"))),
+            has_publications=Exists(Publication.objects.filter(project=OuterRef("pk"))),
+        )
+        .filter(Q(has_grants=False) | Q(has_publications=False))
+    )
+    if resume_after is not None:
+        projects = projects.filter(pi_id__gt=resume_after)
+    return projects.order_by("pi_id", "pk").values(
+        "pk", "title", "pi_id", "pi__username", "pi__first_name", "pi__email", "has_grants", "has_publications"
+    )
+
 
 class Command(BaseCommand):
     help = "Send emails to PIs with projects that have no grants/publications associated with them"
@@ -28,56 +62,91 @@ class Command(BaseCommand):
             default=False,
             help="dry run, log email content and recipients without sending the emails",
         )
+        parser.add_argument(
+            "--batch-size", type=int, default=100, help="Number of emails sent over each connection to the mail server"
+        )
+        parser.add_argument(
+            "--resume-after",
+            type=int,
+            help="User id of the last PI whose emails were all sent by an interrupted run, printed with its progress",
+        )
 
     def handle(self, *args, **options):
         dry_run: bool = options["dry_run"]
-        for pi_profile in UserProfile.objects.filter(is_pi=True):
-            try:
-                logger.info(f"processing projects for PI: {pi_profile.user.username}")
-                projects_for_pi = Project.objects.filter(pi=pi_profile.user, status__name__in=["Active", "New"])
-                projects_without_grants = {}
-                projects_without_publications = {}
-
-                for project in projects_for_pi:
-                    logger.info(f"processing project: {project}")
-                    if Grant.objects.filter(project=project).count() == 0:
-                        projects_without_grants[project.title] = f"{CENTER_BASE_URL.strip('/')}/project/{project.pk}/"
-
-                    if Publication.objects.filter(project=project).count() == 0:
-                        projects_without_publications[project.title] = (
-                            f"{CENTER_BASE_URL.strip('/')}/project/{project.pk}/"
-                        )
-
-                grant_notification_context = {
-                    "pi_first_name": pi_profile.user.first_name,
-                    "project_dict": projects_without_grants,
-                    "signature": EMAIL_SIGNATURE,
-                }
-                logger.info(f"grant nudge context: {grant_notification_context}")
-                if projects_without_grants and not dry_run:
-                    logger.info(f"sending grant nudge to {pi_profile.user.username}")
-                    send_email_template(
-                        "Please update grant info for HPC project",
-                        "email/request_to_add_grants.txt",
-                        grant_notification_context,
-                        EMAIL_SENDER,
-                        [pi_profile.user.email],
-                    )
+        self.batch_size = max(1, options["batch_size"])
+        self.emails = []
+        # Last email of each PI in the batch -> the PI's user id
+        self.pi_last_emails = {}
+        self.last_pi_id = None
+        self.last_sent_pi_id = options["resume_after"]
+        self.pi_count = 0
+        self.sent = 0
+        self.start = time.perf_counter()
 
-                publication_notification_context = {
-                    "pi_first_name": pi_profile.user.first_name,
-                    "project_dict": projects_without_publications,
+        projects = get_projects_to_nudge(options["resume_after"]).iterator(chunk_size=2000)
+        for pi_id, pi_projects in itertools.groupby(projects, key=lambda project: project["pi_id"]):
+            pi_projects = list(pi_projects)
+            pi = pi_projects[0]
+            logger.info(f"processing projects for PI: {pi['pi__username']}")
+            if not pi["pi__email"]:
+                logger.warning(f"Skipping PI {pi['pi__username']} without an email address")
+                continue
+
+            pi_emails = []
+            for annotation, (subject, template_name) in NUDGES.items():
+                context = {
+                    "pi_first_name": pi["pi__first_name"],
+                    "project_dict": {
+                        project["title"]: f"{CENTER_BASE_URL.strip('/')}/project/{project['pk']}/"
+                        for project in pi_projects
+                        if not project[annotation]
+                    },
                     "signature": EMAIL_SIGNATURE,
                 }
-                logger.info(f"publication nudge context: {publication_notification_context}")
-                if projects_without_publications and not dry_run:
-                    logger.info(f"sending publication nudge to {pi_profile.user.username}")
-                    send_email_template(
-                        "Please update publication info for HPC projects",
-                        "email/request_to_add_publications.txt",
-                        publication_notification_context,
-                        EMAIL_SENDER,
-                        [pi_profile.user.email],
+                if not context["project_dict"]:
+                    continue
+                logger.info(f"{subject} to {pi['pi__username']}: {context}")
+                if not dry_run:
+                    email = build_email(
+                        subject, render_to_string(template_name, context), EMAIL_SENDER, [pi["pi__email"]]
                     )
-            except Exception:
-                logger.exception("Exception occurred with traceback:", exc_info=True)
+                    if email is not None:
+                        pi_emails.append(email)
+
+            if pi_emails:
+                self.pi_last_emails[pi_emails[-1]] = pi_id
+                self.emails += pi_emails
+            self.pi_count += 1
+            self.last_pi_id = pi_id
+            # The emails of a PI go in the same batch
+            if len(self.emails) >= self.batch_size:
+                self.send_batch()
+
+        self.send_batch()
+        self.stdout.write(self.style.SUCCESS(f"Processed {self.pi_count} PIs, sent {self.sent} emails"))
+
+    def email_sent(self, email):
+        self.sent += 1
+        # A PI is done once its last email is sent, so resuming after it sends it no duplicate
+        if email in self.pi_last_emails:
+            self.last_sent_pi_id = self.pi_last_emails[email]
+
+    def send_batch(self):
+        if self.emails:
+            try:
+                send_emails(self.emails, fail_silently=False, on_sent=self.email_sent)
+            except Exception as e:
+                logger.exception("Failed to send the nudge emails")
+                resume = "" if self.last_sent_pi_id is None else f" with --resume-after {self.last_sent_pi_id}"
+                raise CommandError(f"Failed to send emails ({e}), run again{resume}")
+            self.emails = []
+            self.pi_last_emails = {}
+        # Including the PIs without emails to send
+        if self.last_pi_id is not None:
+            self.last_sent_pi_id = self.last_pi_id
+
+        elapsed = time.perf_counter() - self.start
+        self.stdout.write(
+            f"Sent {self.sent} emails to {self.pi_count} PIs in {elapsed:.1f}s ({self.sent / elapsed:.1f}/s), "
+            f"last PI id {self.last_sent_pi_id}"
+        )
@@ -114,3 +114,34 @@ class LoadApproverSchoolsTest(TestCase):
             ApproverProfile.objects.filter(user_profile=self.approver2_profile).count(),
             1,
         )
+
+    def test_dry_run_lists_changes_without_making_them(self):
+        """Test that a dry run returns the changes and leaves the database unchanged."""
+        changes = load_approver_schools(self.json_data, dry_run=True)
+
+        self.assertIn("~ approver1: staff", changes)
+        self.assertIn("+ approver1: approver profile", changes)
+        self.assertIn("+ approver2: school NYU IT", changes)
+        self.approver1.refresh_from_db()
+        self.assertFalse(self.approver1.is_staff)
+        self.assertFalse(ApproverProfile.objects.exists())
+
+    def test_schools_are_replaced(self):
+        """Test that schools missing from the data are removed and new ones are created."""
+        load_approver_schools(self.json_data)
+        changes = load_approver_schools({"approver2": ["Tandon School of Engineering", "Stern School of Business"]})
+
+        self.assertEqual(
+            changes,
+            [
+                "+ school Stern School of Business",
+                "+ approver2: school Stern School of Business",
+                "+ approver2: school Tandon School of Engineering",
+                "- approver2: school NYU IT",
+            ],
+        )
+        approver2_profile = ApproverProfile.objects.get(user_profile=self.approver2_profile)
+        self.assertEqual(
+            set(approver2_profile.schools.values_list("description", flat=True)),
+            {"Tandon School of Engineering", "Stern School of Business"},
+        )
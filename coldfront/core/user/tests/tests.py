@@ -1,10 +1,38 @@
-from coldfront.core.test_helpers.factories import UserFactory
+import datetime
+import itertools
+import logging
+import time
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
+
+from coldfront.core.grant.models import Grant
+from coldfront.core.publication.models import Publication
+from coldfront.core.test_helpers.factories import (
+    GrantFundingAgencyFactory,
+    GrantStatusChoiceFactory,
+    ProjectFactory,
+    ProjectStatusChoiceFactory,
+    PublicationSourceFactory,
+    UserFactory,
+)
+from coldfront.core.user.management.commands.pi_grants_publications_request import NUDGES, get_projects_to_nudge
+from coldfront.core.user.utils import CombinedUserSearch, LocalUserSearch, UserSearch
 from coldfront.core.user.models import UserProfile, ApproverProfile
 from coldfront.core.school.models import School
 from django.test import TestCase
 from django.contrib.auth.models import Permission
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db import models
 
+logging.disable(logging.CRITICAL)
+
+COMMAND_MODULE = "coldfront.core.user.management.commands.pi_grants_publications_request"
+
 
 class TestUserProfile(TestCase):
     class Data:
@@ -145,3 +173,158 @@ class TestUserProfile(TestCase):
             list(approver_profile.schools.values_list("description", flat=True)),
             ["Arts & Science"],
         )
+
+
+class SlowUserSearch(UserSearch):
+    search_source = "slow"
+
+    def search_a_user(self, user_search_string=None, search_by="all_fields"):
+        time.sleep(0.5)
+        return [{"username": "slow_user", "source": self.search_source}]
+
+
+class RemoteUserSearch(UserSearch):
+    search_source = "remote"
+
+    def search_a_user(self, user_search_string=None, search_by="all_fields"):
+        return [
+            {"username": "local_user", "first_name": "Remote", "source": self.search_source},
+            {"username": "remote_user", "first_name": "Remote", "source": self.search_source},
+        ]
+
+
+class FailingUserSearch(UserSearch):
+    search_source = "failing"
+
+    def search_a_user(self, user_search_string=None, search_by="all_fields"):
+        raise ConnectionError("directory is down")
+
+
+class TestCombinedUserSearch(TestCase):
+    def setUp(self):
+        UserFactory(username="local_user", first_name="Local")
+
+    def search(self, *search_classes):
+        with mock.patch(
+            "coldfront.core.user.utils.get_user_search_classes", return_value=[LocalUserSearch, *search_classes]
+        ):
+            return CombinedUserSearch("user", "all_fields").search()
+
+    def test_results_are_merged_by_username(self):
+        """Test that the first backend to return a username provides its details"""
+        matches = self.search(RemoteUserSearch)["matches"]
+        self.assertEqual(
+            [(m["username"], m["source"]) for m in matches],
+            [("local_user", "local"), ("remote_user", "remote")],
+        )
+
+    @mock.patch("coldfront.core.user.utils.USER_SEARCH_BACKEND_TIMEOUT", 0.1)
+    def test_partial_results(self):
+        """Test that failing and slow backends are skipped"""
+        matches = self.search(SlowUserSearch, FailingUserSearch, RemoteUserSearch)["matches"]
+        self.assertEqual([m["username"] for m in matches], ["local_user", "remote_user"])
+
+
+class PiGrantsPublicationsRequestTests(TestCase):
+    """Tests for the emails asking PIs to add the grants and publications of their projects"""
+
+    def setUp(self):
+        active = ProjectStatusChoiceFactory(name="Active")
+        self.pis = []
+        for username in ["pi_one", "pi_two", "pi_three"]:
+            pi = UserFactory(username=username)
+            UserProfile.objects.update_or_create(user=pi, defaults={"is_pi": True})
+            self.pis.append(pi)
+        self.projects = [ProjectFactory(title=f"Project {pi.username}", pi=pi, status=active) for pi in self.pis]
+        # The first PI's project has a grant and a publication, so only its second project is nudged
+        ProjectFactory(title="Archived project", pi=self.pis[0], status=ProjectStatusChoiceFactory(name="Archived"))
+        Grant.objects.create(
+            project=self.projects[0],
+            title="Grant",
+            grant_number="123",
+            role="PI",
+            funding_agency=GrantFundingAgencyFactory(name="NSF"),
+            grant_start=datetime.date(2024, 1, 1),
+            grant_end=datetime.date(2025, 1, 1),
+            percent_credit=100,
+            direct_funding=1000,
+            total_amount_awarded=1000,
+            status=GrantStatusChoiceFactory(name="Active"),
+        )
+        Publication.objects.create(
+            project=self.projects[0],
+            title="Publication",
+            author="Author",
+            year=2024,
+            journal="Journal",
+            unique_id="10.1/a",
+            source=PublicationSourceFactory(),
+        )
+        ProjectFactory(title="Second project", pi=self.pis[0], status=active)
+
+        patchers = [
+            mock.patch("coldfront.core.utils.mail.EMAIL_ENABLED", True),
+            mock.patch(f"{COMMAND_MODULE}.EMAIL_SENDER", "hpc@example.com"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def call_command(self, *args):
+        out = StringIO()
+        call_command("pi_grants_publications_request", *args, stdout=out)
+        return out.getvalue()
+
+    def test_projects_to_nudge(self):
+        """Test that the projects missing grants or publications are listed by PI in one query"""
+        with self.assertNumQueries(1):
+            projects = list(get_projects_to_nudge())
+        self.assertEqual(
+            [(project["pi__username"], project["title"]) for project in projects],
+            [("pi_one", "Second project"), ("pi_two", "Project pi_two"), ("pi_three", "Project pi_three")],
+        )
+        self.assertEqual(
+            [project["title"] for project in get_projects_to_nudge(resume_after=self.pis[1].pk)],
+            ["Project pi_three"],
+        )
+
+    def test_send_emails(self):
+        """Test that each PI gets one email per missing kind over a single connection"""
+        with mock.patch("coldfront.core.utils.mail.get_connection", wraps=get_connection) as get_connection_mock:
+            output = self.call_command()
+
+        get_connection_mock.assert_called_once()
+        self.assertIn("Processed 3 PIs, sent 6 emails", output)
+        self.assertEqual(
+            # Subjects are prefixed with EMAIL_SUBJECT_PREFIX
+            sorted((email.to[0], email.subject.split("] ", 1)[-1]) for email in mail.outbox),
+            sorted((pi.email, subject) for pi in self.pis for subject, _ in NUDGES.values()),
+        )
+        self.assertTrue(all("Project pi_one" not in email.body for email in mail.outbox))
+
+    def test_dry_run(self):
+        """Test that a dry run sends no emails"""
+        output = self.call_command("--dry-run")
+        self.assertIn("Processed 3 PIs, sent 0 emails", output)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_resume_after_failure(self):
+        """Test that a failure mid-batch reports the last PI whose emails were all sent, and resuming emails only the
+        remaining PIs
+        """
+        send_messages = locmem.EmailBackend.send_messages
+        calls = itertools.count()
+
+        def fail_on_fourth_email(backend, messages):
+            if next(calls) == 3:
+                raise SMTPException("Connection refused")
+            return send_messages(backend, messages)
+
+        with mock.patch.object(locmem.EmailBackend, "send_messages", fail_on_fourth_email):
+            with self.assertRaisesMessage(CommandError, f"run again with --resume-after {self.pis[0].pk}"):
+                self.call_command()
+        self.assertEqual([email.to[0] for email in mail.outbox], [self.pis[0].email] * 2 + [self.pis[1].email])
+
+        mail.outbox = []
+        self.call_command("--resume-after", str(self.pis[0].pk))
+        self.assertEqual({email.to[0] for email in mail.outbox}, {self.pis[1].email, self.pis[2].email})
@@ -1,5 +1,8 @@
 import abc
+import functools
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from django.contrib.auth.models import User
 from django.db.models import Q
@@ -9,6 +12,8 @@ from coldfront.core.utils.common import import_from_settings
 
 logger = logging.getLogger(__name__)
 
+USER_SEARCH_BACKEND_TIMEOUT = import_from_settings("USER_SEARCH_BACKEND_TIMEOUT", 10)
+
 
 class UserSearch(abc.ABC):
     def __init__(self, user_search_string, search_by):
@@ -72,28 +77,72 @@ class LocalUserSearch(UserSearch):
         return users
 
 
+@functools.cache
+def get_user_search_classes():
+    """
+    Returns:
+        list: the user search classes, LocalUserSearch first and then ADDITIONAL_USER_SEARCH_CLASSES in order. They are
+        imported once per process.
+    """
+
+    return [LocalUserSearch] + [
+        import_string(search_class) for search_class in import_from_settings("ADDITIONAL_USER_SEARCH_CLASSES", [])
+    ]
+
+
 class CombinedUserSearch:
     def __init__(self, user_search_string, search_by, usernames_names_to_exclude=[]):
-        self.USER_SEARCH_CLASSES = list(import_from_settings("ADDITIONAL_USER_SEARCH_CLASSES", []))
-        self.USER_SEARCH_CLASSES.insert(0, "coldfront.core.user.utils.LocalUserSearch")
+        self.USER_SEARCH_CLASSES = get_user_search_classes()
         self.user_search_string = user_search_string
         self.search_by = search_by
         self.usernames_names_to_exclude = usernames_names_to_exclude
+        self.latencies = {}
+
+    def search_backend(self, cls):
+        """Run one search backend, recording how long it took."""
+        start = time.monotonic()
+        try:
+            return cls(self.user_search_string, self.search_by).search()
+        finally:
+            self.latencies[cls.__name__] = time.monotonic() - start
+            logger.info("User search backend %s took %.3fs", cls.__name__, self.latencies[cls.__name__])
 
     def search(self):
-        matches = []
-        usernames_not_found = []
-        usernames_found = []
+        """Query the local database and, concurrently, every additional search backend. A backend that fails or
+        does not answer within USER_SEARCH_BACKEND_TIMEOUT seconds is skipped, so its users are missing from the
+        results."""
+        local_search_class, *remote_search_classes = self.USER_SEARCH_CLASSES
+        results = {}
+
+        executor = ThreadPoolExecutor(max_workers=max(len(remote_search_classes), 1))
+        try:
+            futures = {executor.submit(self.search_backend, cls): cls for cls in remote_search_classes}
+            # The local search uses the database connection of this thread, so it is not run on the pool
+            results[local_search_class] = self.search_backend(local_search_class)
+            done, not_done = wait(futures, timeout=USER_SEARCH_BACKEND_TIMEOUT)
+        finally:
+            # Do not wait for backends that timed out
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        for future in done:
+            try:
+                results[futures[future]] = future.result()
+            except Exception:
+                logger.exception("User search backend %s failed", futures[future].__name__)
+        for future in not_done:
+            logger.warning(
+                "User search backend %s did not answer within %ss", futures[future].__name__, USER_SEARCH_BACKEND_TIMEOUT
+            )
 
+        # Merge in backend order, so that the first backend to know a username provides its details
+        matches = []
+        usernames_found = set()
+        usernames_to_exclude = set(self.usernames_names_to_exclude)
         for search_class in self.USER_SEARCH_CLASSES:
-            cls = import_string(search_class)
-            search_class_obj = cls(self.user_search_string, self.search_by)
-            users = search_class_obj.search()
-
-            for user in users:
+            for user in results.get(search_class, []):
                 username = user.get("username")
-                if username not in usernames_found and username not in self.usernames_names_to_exclude:
-                    usernames_found.append(username)
+                if username not in usernames_found and username not in usernames_to_exclude:
+                    usernames_found.add(username)
                     matches.append(user)
 
         if len(self.user_search_string.split()) > 1:
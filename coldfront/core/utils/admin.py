@@ -1 +1,87 @@
-# Register your models here.
+import datetime
+from collections import defaultdict
+
+import plotly.express as px
+from django.contrib import admin
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+from plotly.offline import plot
+
+from coldfront.core.utils.common import import_from_settings
+from coldfront.core.utils.models import TaskRun
+
+TASK_RUN_TREND_DAYS = import_from_settings("TASK_RUN_TREND_DAYS", 30)
+
+
+@admin.register(TaskRun)
+class TaskRunAdmin(admin.ModelAdmin):
+    list_display = ("name", "kind", "started", "duration", "query_count", "rows", "succeeded")
+    list_filter = ("kind", "succeeded", "name")
+    search_fields = ["name"]
+    date_hierarchy = "started"
+    change_list_template = "utils/taskrun_change_list.html"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context["task_summary"] = get_task_summary()
+        extra_context["task_trends"] = get_task_trends(timezone.now() - datetime.timedelta(days=TASK_RUN_TREND_DAYS))
+        extra_context["trend_days"] = TASK_RUN_TREND_DAYS
+        return super().changelist_view(request, extra_context=extra_context)
+
+
+def get_task_summary():
+    """
+    Returns:
+        QuerySet: runs, failures, last run and average duration, queries and rows of every task and command
+    """
+
+    return (
+        TaskRun.objects.order_by()
+        .values("name", "kind")
+        .annotate(
+            runs=Count("pk"),
+            failures=Count("pk", filter=Q(succeeded=False)),
+            last_started=Max("started"),
+            avg_duration=Avg("duration"),
+            avg_query_count=Avg("query_count"),
+            avg_rows=Avg("rows"),
+        )
+        .order_by("name")
+    )
+
+
+def get_task_trends(since):
+    """
+    Params:
+        since (datetime): start of the charted period
+
+    Returns:
+        list: (name, chart div) of the duration and queries of the runs of every task and command since then
+    """
+
+    runs = defaultdict(lambda: {"started": [], "value": [], "metric": []})
+    for name, started, duration, query_count in (
+        TaskRun.objects.filter(started__gte=since)
+        .order_by("name", "started")
+        .values_list("name", "started", "duration", "query_count")
+        .iterator(chunk_size=2000)
+    ):
+        data = runs[name]
+        data["started"] += [started, started]
+        data["value"] += [duration, query_count]
+        data["metric"] += ["duration (s)", "queries"]
+
+    trends = []
+    for name, data in runs.items():
+        fig = px.line(data, x="started", y="value", facet_row="metric", markers=True, height=400)
+        # Seconds and query counts don't share a scale
+        fig.update_yaxes(matches=None, title_text="")
+        fig.for_each_annotation(lambda annotation: annotation.update(text=annotation.text.split("=")[-1]))
+        trends.append((name, plot(fig, output_type="div", include_plotlyjs=False)))
+    return trends
@@ -1,7 +1,9 @@
 # import the logging library
 import logging
+import uuid
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 
 # Get an instance of a logger
@@ -27,6 +29,25 @@ def get_domain_url(request):
     return request.build_absolute_uri().replace(request.get_full_path(), "")
 
 
+def get_fragment_cache_version(name, pk):
+    """Return the token that versions the cached template fragments of an object.
+
+    Templates pass the token to ``{% cache %}`` as a vary_on argument, so every cached
+    fragment of the object goes stale at once when the token is invalidated.
+    """
+    return cache.get_or_set(f"fragment-version:{name}:{pk}", lambda: uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_fragment_cache(name, pk):
+    """Invalidate all cached template fragments of an object, see get_fragment_cache_version."""
+    cache.delete(f"fragment-version:{name}:{pk}")
+
+
+def invalidate_fragment_caches(name, pks):
+    """Invalidate all cached template fragments of many objects at once, see invalidate_fragment_cache."""
+    cache.delete_many([f"fragment-version:{name}:{pk}" for pk in pks])
+
+
 class Echo:
     """An object that implements just the write method of the file-like
     interface.
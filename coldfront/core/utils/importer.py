@@ -0,0 +1,202 @@
+import csv
+import itertools
+import json
+import os
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+
+# File extension -> format
+FORMATS = {".csv": "csv", ".tsv": "tsv", ".json": "json", ".jsonl": "jsonl"}
+
+
+def get_format(path):
+    """
+    Params:
+        path (str): path of a reference data file
+
+    Returns:
+        str: the format of the file from its extension, see read_records
+    """
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unknown format of {path}, expected one of {', '.join(FORMATS)}")
+    return FORMATS[extension]
+
+
+def read_records(fp, format, fieldnames=None):
+    """Streams the records of a reference data file. Only JSON files are read into memory at once.
+
+    Params:
+        fp (file): the open file
+        format (str): csv, tsv, json (a list of objects) or jsonl (an object per line)
+        fieldnames (list[str]): names of the columns of a CSV or TSV file without a header row
+
+    Yields:
+        dict: the values of each record by field name
+    """
+
+    if format in ("csv", "tsv"):
+        yield from csv.DictReader(fp, fieldnames=fieldnames, delimiter="\t" if format == "tsv" else ",")
+    elif format == "json":
+        yield from json.load(fp)
+    elif format == "jsonl":
+        for line in fp:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown format {format}")
+
+
+@dataclass
+class ImportResult:
+    """Number of records of an import by what happened to them"""
+
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def __str__(self):
+        return f"{self.inserted} inserted, {self.updated} updated, {self.unchanged} unchanged"
+
+
+class BulkImporter:
+    """Upserts reference data, like schools, into a model in a single transaction.
+
+    Records are read in batches. Each batch is validated with full_clean, with one query per foreign key checking the
+    rows it refers to, compared with the stored rows matching its unique fields, and its new and changed rows are
+    written with one bulk_create(update_conflicts=True). Invalid records make the whole import fail with a
+    ValidationError listing them.
+
+    Attributes:
+        model (Model): model to import into
+        unique_fields (list[str]): fields identifying a row, "pk" included
+        update_fields (list[str]): fields updated in the existing rows, none to only insert the missing rows
+        batch_size (int): number of records validated and written at a time
+    """
+
+    def __init__(self, model, unique_fields, update_fields=(), batch_size=1000):
+        self.model = model
+        self.unique_fields = list(unique_fields)
+        self.update_fields = list(update_fields)
+        self.batch_size = batch_size
+        self.unique_attnames = [self.get_attname(name) for name in self.unique_fields]
+        self.update_attnames = [self.get_attname(name) for name in self.update_fields]
+        # Checked for the whole batch rather than by full_clean, which queries each row
+        self.relation_fields = [field for field in model._meta.concrete_fields if field.is_relation]
+
+    def get_attname(self, name):
+        opts = self.model._meta
+        return opts.pk.attname if name == "pk" else opts.get_field(name).attname
+
+    def get_key(self, obj):
+        return tuple(getattr(obj, attname) for attname in self.unique_attnames)
+
+    def run(self, records, dry_run=False):
+        """
+        Params:
+            records (iterable[dict]): values of the rows by field name, e.g. from read_records
+            dry_run (bool): only count what would change
+
+        Returns:
+            ImportResult: number of records inserted, updated and unchanged
+        """
+
+        result = ImportResult()
+        using = router.db_for_write(self.model)
+        records = iter(records)
+        with transaction.atomic(using=using):
+            for start in itertools.count(step=self.batch_size):
+                batch = list(itertools.islice(records, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch, start, result, dry_run)
+
+            if result.inserted and not dry_run and "pk" in self.unique_fields:
+                # Rows inserted with their primary key leave the sequence behind on some databases
+                connection = connections[using]
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(no_style(), [self.model]):
+                        cursor.execute(sql)
+        return result
+
+    def validate_relations(self, numbered_objs):
+        """
+        Params:
+            numbered_objs (list[tuple[int, Model]]): record numbers and objects of a batch
+
+        Returns:
+            list[str]: errors of the objects missing a required relation or referring to rows that don't exist
+        """
+
+        errors = []
+        for field in self.relation_fields:
+            target = field.target_field.attname
+            values = {getattr(obj, field.attname) for _, obj in numbered_objs} - {None}
+            found = set(
+                field.remote_field.model._base_manager.filter(**{f"{target}__in": values}).values_list(
+                    target, flat=True
+                )
+            )
+            for number, obj in numbered_objs:
+                value = getattr(obj, field.attname)
+                if value is None and not field.null:
+                    errors.append(f"Record {number}: {field.name} is required")
+                elif value is not None and value not in found:
+                    errors.append(f"Record {number}: {field.name} {value} does not exist")
+        return errors
+
+    def import_batch(self, records, start, result, dry_run):
+        numbered_objs = []
+        errors = []
+        for number, record in enumerate(records, start=start + 1):
+            try:
+                obj = self.model(**record)
+                # Uniqueness is what the upsert resolves
+                obj.full_clean(
+                    exclude=[field.name for field in self.relation_fields],
+                    validate_unique=False,
+                    validate_constraints=False,
+                )
+                for field in self.relation_fields:
+                    setattr(obj, field.attname, field.target_field.to_python(getattr(obj, field.attname)))
+            except (TypeError, ValueError) as e:
+                errors.append(f"Record {number}: {e}")
+                continue
+            except ValidationError as e:
+                errors.append(f"Record {number}: {'; '.join(e.messages)}")
+                continue
+            numbered_objs.append((number, obj))
+        errors += self.validate_relations(numbered_objs)
+        if errors:
+            raise ValidationError(errors)
+
+        # A record repeated in the batch can't be upserted twice by the same statement, the last one wins
+        objs = {self.get_key(obj): obj for _, obj in numbered_objs}
+
+        # Rows matching the first unique field, narrowed down to the full key below
+        stored = self.model.objects.filter(**{f"{self.unique_attnames[0]}__in": {key[0] for key in objs}})
+        existing = {self.get_key(obj): obj for obj in stored.only(*self.unique_attnames, *self.update_attnames)}
+        writes = []
+        for key, obj in objs.items():
+            if key not in existing:
+                result.inserted += 1
+            elif any(getattr(obj, attname) != getattr(existing[key], attname) for attname in self.update_attnames):
+                result.updated += 1
+            else:
+                result.unchanged += 1
+                continue
+            writes.append(obj)
+
+        if not writes or dry_run:
+            return
+        if not self.update_fields:
+            self.model.objects.bulk_create(writes, ignore_conflicts=True)
+            return
+        options = {"update_conflicts": True, "update_fields": self.update_fields}
+        if connections[router.db_for_write(self.model)].features.supports_update_conflicts_with_target:
+            options["unique_fields"] = self.unique_fields
+        self.model.objects.bulk_create(writes, **options)
@@ -0,0 +1,136 @@
+import contextlib
+import functools
+import logging
+import threading
+import time
+import traceback
+
+from django.db import connection
+from django.dispatch import receiver
+from django.utils import timezone
+from django_q.signals import post_execute_in_worker, pre_enqueue, pre_execute
+from django_q.utils import get_func_repr
+
+from coldfront.core.utils.log import correlation_id, correlation_id_scope, get_correlation_id
+from coldfront.core.utils.models import TaskRun
+
+logger = logging.getLogger(__name__)
+
+# Runs of the Django Q tasks executing in this thread
+_task_runs = threading.local()
+
+
+class QueryCounter:
+    """Database execute wrapper counting the queries issued"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def save_task_run(run):
+    try:
+        run.save()
+    except Exception:
+        # The history must never make the task itself fail
+        logger.exception("Could not record the run of %s", run.name)
+    else:
+        logger.info(
+            "%s %s in %.3fs with %s queries",
+            run.name,
+            "succeeded" if run.succeeded else "failed",
+            run.duration,
+            run.query_count,
+            extra={
+                "task": run.name,
+                "duration": run.duration,
+                "query_count": run.query_count,
+                "rows": run.rows,
+                "succeeded": run.succeeded,
+            },
+        )
+
+
+@contextlib.contextmanager
+def record_task_run(name, kind=TaskRun.KIND_TASK):
+    """Records the duration, queries and failure of the block as a TaskRun. Set rows on the yielded run to record the
+    rows processed. The block logs with the current correlation ID, or a new one.
+    """
+
+    run = TaskRun(name=name, kind=kind, started=timezone.now())
+    counter = QueryCounter()
+    start = time.perf_counter()
+    try:
+        with correlation_id_scope(get_correlation_id()), connection.execute_wrapper(counter):
+            yield run
+    except BaseException as e:
+        # sys.exit(0) ends a command successfully
+        if not isinstance(e, SystemExit) or e.code not in (None, 0):
+            run.succeeded = False
+            run.error = traceback.format_exc()
+        raise
+    finally:
+        run.duration = time.perf_counter() - start
+        run.query_count = counter.count
+        save_task_run(run)
+
+
+def instrument_command(handle):
+    """Decorates the handle method of a management command to record its runs. The command reports the rows it
+    processed by setting self.rows_processed.
+    """
+
+    @functools.wraps(handle)
+    def wrapper(self, *args, **options):
+        name = self.__module__.rsplit(".", 1)[-1]
+        with record_task_run(name, TaskRun.KIND_COMMAND) as run:
+            try:
+                return handle(self, *args, **options)
+            finally:
+                run.rows = getattr(self, "rows_processed", None)
+
+    return wrapper
+
+
+@receiver(pre_enqueue, dispatch_uid="coldfront_set_task_correlation_id")
+def set_task_correlation_id(sender, task, **kwargs):
+    # Tasks queued while handling a request log with its correlation ID
+    task.setdefault("correlation_id", get_correlation_id())
+
+
+@receiver(pre_execute, dispatch_uid="coldfront_start_task_run")
+def start_task_run(sender, func, task, **kwargs):
+    counter = QueryCounter()
+    connection.execute_wrappers.append(counter)
+    token = correlation_id.set(task.get("correlation_id") or task["id"])
+    _task_runs.__dict__[task["id"]] = (counter, timezone.now(), time.perf_counter(), token)
+
+
+@receiver(post_execute_in_worker, dispatch_uid="coldfront_finish_task_run")
+def finish_task_run(sender, func, task, **kwargs):
+    counter, started, start, token = _task_runs.__dict__.pop(task["id"], (None, None, None, None))
+    if counter is None:
+        return
+    connection.execute_wrappers.remove(counter)
+
+    # Sync tasks that raise send the signal from the except block, before setting success and result
+    succeeded = task.get("success", False)
+    result = task.get("result")
+    # Tasks report the rows they processed by returning their number
+    rows = result if succeeded and isinstance(result, int) and not isinstance(result, bool) and result >= 0 else None
+    save_task_run(
+        TaskRun(
+            name=task["func"] if isinstance(task["func"], str) else get_func_repr(task["func"]),
+            kind=TaskRun.KIND_TASK,
+            started=started,
+            duration=time.perf_counter() - start,
+            query_count=counter.count,
+            rows=rows,
+            succeeded=succeeded,
+            error="" if succeeded else str(result) if result is not None else traceback.format_exc(),
+        )
+    )
+    correlation_id.reset(token)
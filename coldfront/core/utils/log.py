@@ -0,0 +1,229 @@
+import atexit
+import contextlib
+import contextvars
+import copy
+import datetime
+import json
+import logging
+import logging.config
+import logging.handlers
+import multiprocessing.util
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+
+# Correlation ID of the request, task or command being handled, added to the records it logs
+correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+# QueueHandlers configured by configure_logging, with a listener thread each
+_queue_handlers = []
+
+
+def new_correlation_id():
+    return uuid.uuid4().hex
+
+
+def get_correlation_id():
+    """
+    Returns:
+        str: correlation ID of the request, task or command being handled, None outside of them
+    """
+
+    return correlation_id.get()
+
+
+@contextlib.contextmanager
+def correlation_id_scope(value=None):
+    """Sets the correlation ID of the records logged in the block, a new one by default, and yields it"""
+
+    token = correlation_id.set(value or new_correlation_id())
+    try:
+        yield correlation_id.get()
+    finally:
+        correlation_id.reset(token)
+
+
+class CorrelationIdFilter(logging.Filter):
+    """Adds the correlation ID of the current context to the records as correlation_id. It must run in the thread
+    logging the record, i.e. before the record is queued.
+    """
+
+    def filter(self, record):
+        record.correlation_id = correlation_id.get() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a share of the records below ERROR of some loggers, and all the others.
+
+    Attributes:
+        rates (dict): share of the records kept by logger name, which also applies to its child loggers
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        # Most specific logger first
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def get_rate(self, name):
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(f"{prefix}."):
+                return rate
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+        # Handlers sharing the filter keep or drop a record together
+        if "_sampled" not in record.__dict__:
+            record._sampled = random.random() < self.get_rate(record.name)
+        return record._sampled
+
+
+class RateLimitFilter(logging.Filter):
+    """Limits the records below ERROR of each logger to rate per second, with bursts of up to burst records. The first
+    record kept after some were dropped has their number as suppressed.
+
+    Attributes:
+        rate (float): records per second, 0 for no limit
+        burst (int): records logged at once before the limit applies
+    """
+
+    def __init__(self, rate=0, burst=100):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(1, burst)
+        # Logger name -> [tokens, time of the last record, records dropped]
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.rate or record.levelno >= logging.ERROR:
+            return True
+        if "_rate_limited" in record.__dict__:
+            return not record._rate_limited
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(record.name, [self.burst, now, 0])
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            record._rate_limited = tokens < 1
+            if record._rate_limited:
+                bucket[0] = tokens
+                bucket[2] += 1
+                return False
+            bucket[0] = tokens - 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, with the values passed as extra"""
+
+    # Attributes of every record, the others were passed as extra
+    RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "correlation_id"}
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "process": record.process,
+            "thread": record.thread,
+            "correlation_id": getattr(record, "correlation_id", None),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Queues the records for the listener thread writing them to the handlers, so that logging never waits on I/O.
+
+    Records logged while the queue is full are dropped, and the number dropped is added to the next record queued as
+    dropped.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Unlike the base class, keep the traceback apart from the message for the formatters
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            record.dropped = self.dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        else:
+            self.dropped = 0
+
+
+def stop_listeners():
+    """Writes the queued records and stops the listener threads"""
+
+    for handler in _queue_handlers:
+        if handler.listener._thread is not None:
+            handler.listener.stop()
+
+
+def restart_listeners():
+    # Forked processes copy the queues but not the listener threads, a parent thread may even hold a queue's lock
+    for handler in _queue_handlers:
+        handler.queue = handler.listener.queue = queue.Queue(handler.queue.maxsize)
+        handler.listener._thread = None
+        handler.listener.start()
+
+
+def stop_listeners_on_exit(_):
+    # Multiprocessing children, like the Django Q workers, end with os._exit rather than running atexit
+    multiprocessing.util.Finalize(None, stop_listeners, exitpriority=-100)
+
+
+os.register_at_fork(after_in_child=restart_listeners)
+atexit.register(stop_listeners)
+
+
+def configure_logging(config):
+    """LOGGING_CONFIG of ColdFront: applies the LOGGING dictConfig and starts the listener threads of its QueueHandlers.
+
+    Params:
+        config (dict): the LOGGING setting
+    """
+
+    stop_listeners()
+    _queue_handlers.clear()
+    logging.config.dictConfig(config)
+    for name in config.get("handlers", {}):
+        handler = logging.getHandlerByName(name)
+        if isinstance(handler, logging.handlers.QueueHandler) and handler.listener is not None:
+            _queue_handlers.append(handler)
+            handler.listener.start()
+    if _queue_handlers:
+        multiprocessing.util.register_after_fork(_queue_handlers[0], stop_listeners_on_exit)
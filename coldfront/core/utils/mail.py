@@ -1,12 +1,16 @@
 import logging
+from collections import defaultdict
 from smtplib import SMTPException
 
 from django.conf import settings
-from django.core.mail import EmailMessage, send_mail
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, OuterRef
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.contrib.auth.models import User
 
+from coldfront.core.allocation.models import AllocationUser
+from coldfront.core.project.models import ProjectUser
 from coldfront.core.utils.common import import_from_settings
 
 logger = logging.getLogger(__name__)
@@ -21,19 +25,20 @@ EMAIL_CENTER_NAME = import_from_settings("CENTER_NAME")
 CENTER_BASE_URL = import_from_settings("CENTER_BASE_URL")
 
 
-def send_email(subject, body, sender, receiver_list, cc=None):
-    """Helper function for sending emails"""
+def build_email(subject, body, sender, receiver_list, cc=None):
+    """Builds an email with the subject prefix and the CC to the ticket system
 
-    if not EMAIL_ENABLED:
-        return
+    Returns:
+        EmailMessage: the email, None when it is missing its receivers or sender
+    """
 
     if len(receiver_list) == 0:
         logger.error("Failed to send email missing receiver_list")
-        return
+        return None
 
     if len(sender) == 0:
         logger.error("Failed to send email missing sender address")
-        return
+        return None
 
     if len(EMAIL_SUBJECT_PREFIX) > 0:
         subject = EMAIL_SUBJECT_PREFIX + " " + subject
@@ -46,14 +51,22 @@ def send_email(subject, body, sender, receiver_list, cc=None):
     # Always CC to EMAIL_TICKET_SYSTEM_ADDRESS to keep us in the loop
     cc.append(EMAIL_TICKET_SYSTEM_ADDRESS)
 
+    return EmailMessage(subject, body, sender, receiver_list, cc=cc)
+
+
+def send_email(subject, body, sender, receiver_list, cc=None):
+    """Helper function for sending emails"""
+
+    if not EMAIL_ENABLED:
+        return
+
+    email = build_email(subject, body, sender, receiver_list, cc=cc)
+    if email is None:
+        return
+
     try:
-        if cc:
-            email = EmailMessage(subject, body, sender, receiver_list, cc=cc)
-            email.send(fail_silently=False)
-            logger.info(f"Email sent to {receiver_list} and CC'ed to {cc}")
-        else:
-            send_mail(subject, body, sender, receiver_list, fail_silently=False)
-            logger.info(f"Email sent to {receiver_list}")
+        email.send(fail_silently=False)
+        logger.info(f"Email sent to {email.to} and CC'ed to {email.cc}")
     except SMTPException:
         logger.error(
             "Failed to send email to %s from %s with subject %s",
@@ -63,6 +76,37 @@ def send_email(subject, body, sender, receiver_list, cc=None):
         )
 
 
+def send_emails(emails, fail_silently=True, on_sent=None):
+    """Sends emails built by build_email one at a time over a single connection to the mail server
+
+    Params:
+        emails (list[EmailMessage]): emails to send
+        fail_silently (bool): whether to log errors of the mail server instead of raising them
+        on_sent (callable): called with each email once it is sent, to track the progress of a failing batch
+
+    Returns:
+        int: number of emails sent
+    """
+
+    if not EMAIL_ENABLED or not emails:
+        return 0
+
+    sent = 0
+    try:
+        with get_connection(fail_silently=False) as connection:
+            for email in emails:
+                sent += connection.send_messages([email])
+                if on_sent is not None:
+                    on_sent(email)
+    except SMTPException:
+        if not fail_silently:
+            raise
+        logger.error("Failed to send %s of %s emails", len(emails) - sent, len(emails), exc_info=True)
+        return sent
+    logger.info(f"Sent {sent} emails")
+    return sent
+
+
 def send_email_template(subject, template_name, template_context, sender, receiver_list):
     """Helper function for sending emails from a template"""
     if not EMAIL_ENABLED:
@@ -177,3 +221,65 @@ def send_allocation_customer_email(allocation_obj, subject, template_name, url_p
         email_receiver_list.append(approver.email)
 
     send_email_template(subject, template_name, ctx, EMAIL_SENDER, email_receiver_list)
+
+
+def send_allocation_customer_emails(allocation_objs, subject, template_name, domain_url=""):
+    """Sends send_allocation_customer_email to many allocations, looking up all their receivers with a few queries and
+    sending over a single connection to the mail server
+
+    Params:
+        allocation_objs (list[Allocation]): allocations with their project and ordered resources prefetched
+        subject (str): subject of the emails
+        template_name (str): template of the email body
+        domain_url (str): base URL of the allocation links
+
+    Returns:
+        int: number of emails sent
+    """
+
+    if not EMAIL_ENABLED or not allocation_objs:
+        return 0
+
+    school_ids = {allocation_obj.project.school_id for allocation_obj in allocation_objs}
+    approver_emails = defaultdict(list)
+    for school_id, email in (
+        User.objects.filter(userprofile__approver_profile__schools__in=school_ids, is_active=True)
+        .values_list("userprofile__approver_profile__schools", "email")
+        .distinct()
+    ):
+        approver_emails[school_id].append(email)
+
+    user_emails = defaultdict(list)
+    for allocation_id, email in (
+        AllocationUser.objects.filter(allocation__in=allocation_objs)
+        .exclude(status__name__in=["Removed", "Error"])
+        .filter(
+            Exists(
+                ProjectUser.objects.filter(
+                    project=OuterRef("allocation__project"), user=OuterRef("user"), enable_notifications=True
+                )
+            )
+        )
+        .order_by("pk")
+        .values_list("allocation_id", "user__email")
+    ):
+        user_emails[allocation_id].append(email)
+
+    emails = []
+    for allocation_obj in allocation_objs:
+        ctx = email_template_context()
+        ctx["project"] = allocation_obj.project.title
+        ctx["resource"] = allocation_obj.get_parent_resource
+        ctx["school"] = allocation_obj.project.school
+        ctx["url"] = build_link(reverse("allocation-detail", kwargs={"pk": allocation_obj.pk}), domain_url=domain_url)
+
+        email = build_email(
+            subject,
+            render_to_string(template_name, ctx),
+            EMAIL_SENDER,
+            user_emails[allocation_obj.pk] + approver_emails[allocation_obj.project.school_id],
+        )
+        if email is not None:
+            emails.append(email)
+
+    return send_emails(emails)
@@ -23,3 +23,21 @@ class Command(BaseCommand):
             schedule_type="D",
             next_run=date,
         )
+
+        schedule(
+            "coldfront.core.portal.tasks.refresh_stats_snapshots",
+            schedule_type="H",
+            next_run=timezone.now(),
+        )
+
+        schedule(
+            "coldfront.core.publication.tasks.backfill_publication_bibtex",
+            schedule_type="D",
+            next_run=date,
+        )
+
+        schedule(
+            "coldfront.core.utils.tasks.prune_task_runs",
+            schedule_type="D",
+            next_run=date,
+        )
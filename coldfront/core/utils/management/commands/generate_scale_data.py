@@ -0,0 +1,250 @@
+import datetime
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from coldfront.core.allocation.models import (
+    Allocation,
+    AllocationAttribute,
+    AllocationAttributeType,
+    AllocationAttributeUsage,
+    AllocationStatusChoice,
+    AllocationUser,
+    AllocationUserStatusChoice,
+)
+from coldfront.core.project.models import (
+    Project,
+    ProjectStatusChoice,
+    ProjectUser,
+    ProjectUserRoleChoice,
+    ProjectUserStatusChoice,
+)
+from coldfront.core.resource.models import Resource
+from coldfront.core.school.models import School
+from coldfront.core.user.models import UserProfile
+from coldfront.core.utils.management.commands.load_test_data import Users
+
+# name: weight
+PROJECT_STATUS_WEIGHTS = {"Active": 80, "New": 10, "Archived": 10}
+ALLOCATION_STATUS_WEIGHTS = {
+    "Active": 65,
+    "Expired": 15,
+    "New": 5,
+    "Renewal Requested": 5,
+    "Denied": 3,
+    "Revoked": 2,
+    "Paid": 2,
+    "Payment Pending": 1,
+    "Payment Requested": 1,
+    "Unpaid": 1,
+}
+ALLOCATION_USER_STATUS_WEIGHTS = {"Active": 90, "Removed": 8, "Error": 2}
+
+NAMES = [user.split("\t") for user in Users]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate users, projects, allocations and allocation attributes at production scale to measure performance "
+        "against. Run after initial_setup, on a database that returns primary keys from bulk inserts "
+        "(PostgreSQL, SQLite or MariaDB)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=40000, help="Number of users")
+        parser.add_argument("--projects", type=int, default=8000, help="Number of projects")
+        parser.add_argument(
+            "--allocations-per-project", type=float, default=3.0, help="Average number of allocations per project"
+        )
+        parser.add_argument(
+            "--attributes-per-allocation", type=int, default=20, help="Number of attributes per allocation"
+        )
+        parser.add_argument(
+            "--users-per-project", type=int, default=8, help="Average number of users per project besides the PI"
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Number of projects written at a time")
+        parser.add_argument("--prefix", default="scale", help="Prefix of the generated usernames and project titles")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.prefix = options["prefix"]
+        self.load_choices()
+
+        users = self.create_users(options["users"])
+        if not users:
+            raise CommandError("--users must be at least 1")
+        pis = users[: max(1, len(users) // 5)]
+        UserProfile.objects.filter(user__in=pis).update(is_pi=True)
+
+        today = timezone.now().date()
+        created = {"projects": 0, "allocations": 0, "attributes": 0}
+        for start in range(0, options["projects"], options["chunk_size"]):
+            count = min(options["chunk_size"], options["projects"] - start)
+            with transaction.atomic():
+                totals = self.create_projects(start, count, users, pis, today, options)
+            for key, value in totals.items():
+                created[key] += value
+            self.stdout.write(f"{start + count}/{options['projects']} projects")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(users)} users, {created['projects']} projects, {created['allocations']} allocations "
+                f"and {created['attributes']} allocation attributes"
+            )
+        )
+
+    def load_choices(self):
+        def by_name(model, names):
+            choices = model.objects.get_lookup()
+            missing = set(names) - set(choices)
+            if missing:
+                raise CommandError(f"Missing {model.__name__} {', '.join(sorted(missing))}, run initial_setup first")
+            return {name: choices[name] for name in names}
+
+        self.project_statuses = by_name(ProjectStatusChoice, list(PROJECT_STATUS_WEIGHTS))
+        self.allocation_statuses = by_name(AllocationStatusChoice, list(ALLOCATION_STATUS_WEIGHTS))
+        self.allocation_user_statuses = by_name(AllocationUserStatusChoice, list(ALLOCATION_USER_STATUS_WEIGHTS))
+        self.roles = by_name(ProjectUserRoleChoice, ["Manager", "User"])
+        self.project_user_active = by_name(ProjectUserStatusChoice, ["Active"])["Active"]
+        self.schools = list(School.objects.all())
+        self.resources = list(Resource.objects.filter(is_allocatable=True))
+        self.attribute_types = list(AllocationAttributeType.objects.select_related("attribute_type"))
+        if not self.schools or not self.resources or not self.attribute_types:
+            raise CommandError("Schools, resources and allocation attribute types are missing, run initial_setup first")
+
+    def choose(self, weights):
+        return self.rng.choices(list(weights), weights=list(weights.values()))[0]
+
+    def create_users(self, count):
+        first = User.objects.filter(username__startswith=self.prefix).count()
+        users = []
+        for i in range(first, first + count):
+            first_name, last_name = self.rng.choice(NAMES)
+            users.append(
+                User(
+                    username=f"{self.prefix}{i:06d}",
+                    first_name=first_name,
+                    last_name=last_name,
+                    email=f"{self.prefix}{i:06d}@example.edu",
+                    password="!",
+                )
+            )
+        users = User.objects.bulk_create(users, batch_size=1000)
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users], batch_size=1000)
+        return users
+
+    def create_projects(self, start, count, users, pis, today, options):
+        projects = Project.objects.bulk_create(
+            [
+                Project(
+                    title=f"{self.prefix} project {start + i}",
+                    description="Generated by generate_scale_data to measure performance.",
+                    pi=self.rng.choice(pis),
+                    school=self.rng.choice(self.schools),
+                    status=self.project_statuses[self.choose(PROJECT_STATUS_WEIGHTS)],
+                )
+                for i in range(count)
+            ]
+        )
+
+        project_users = []
+        members = {}
+        for project in projects:
+            size = self.rng.randint(0, 2 * options["users_per_project"])
+            members[project.pk] = [project.pi] + [
+                user for user in self.rng.sample(users, min(size, len(users))) if user.pk != project.pi_id
+            ]
+            project_users += [
+                ProjectUser(
+                    project=project,
+                    user=user,
+                    role=self.roles["Manager" if user.pk == project.pi_id else "User"],
+                    status=self.project_user_active,
+                )
+                for user in members[project.pk]
+            ]
+        ProjectUser.objects.bulk_create(project_users, batch_size=1000)
+
+        allocations = []
+        for project in projects:
+            mean = options["allocations_per_project"]
+            for _ in range(self.rng.randint(int(mean // 2), int(mean * 1.5 + 0.5))):
+                start_date = today - datetime.timedelta(days=self.rng.randint(0, 3 * 365))
+                allocations.append(
+                    Allocation(
+                        project=project,
+                        status=self.allocation_statuses[self.choose(ALLOCATION_STATUS_WEIGHTS)],
+                        quantity=self.rng.randint(1, 10),
+                        start_date=start_date,
+                        end_date=start_date + datetime.timedelta(days=365),
+                        justification="Generated by generate_scale_data.",
+                        is_changeable=True,
+                    )
+                )
+        allocations = Allocation.objects.bulk_create(allocations, batch_size=1000)
+        Allocation.resources.through.objects.bulk_create(
+            [
+                Allocation.resources.through(
+                    allocation_id=allocation.pk, resource_id=self.rng.choice(self.resources).pk
+                )
+                for allocation in allocations
+            ],
+            batch_size=1000,
+        )
+
+        AllocationUser.objects.bulk_create(
+            [
+                AllocationUser(
+                    allocation=allocation,
+                    user=user,
+                    status=self.allocation_user_statuses[self.choose(ALLOCATION_USER_STATUS_WEIGHTS)],
+                )
+                for allocation in allocations
+                for user in members[allocation.project_id]
+                if self.rng.random() < 0.9
+            ],
+            batch_size=1000,
+        )
+
+        attributes = AllocationAttribute.objects.bulk_create(
+            [
+                AllocationAttribute(
+                    allocation=allocation,
+                    allocation_attribute_type=attribute_type,
+                    value=self.attribute_value(attribute_type, allocation, today),
+                )
+                for allocation in allocations
+                for attribute_type in self.rng.sample(
+                    self.attribute_types, min(options["attributes_per_allocation"], len(self.attribute_types))
+                )
+            ],
+            batch_size=1000,
+        )
+        AllocationAttributeUsage.objects.bulk_create(
+            [
+                AllocationAttributeUsage(
+                    allocation_attribute=attribute, value=round(float(attribute.value) * self.rng.random(), 2)
+                )
+                for attribute in attributes
+                if attribute.allocation_attribute_type.has_usage
+            ],
+            batch_size=1000,
+        )
+
+        return {"projects": len(projects), "allocations": len(allocations), "attributes": len(attributes)}
+
+    def attribute_value(self, attribute_type, allocation, today):
+        value_type = attribute_type.attribute_type.name
+        if value_type == "Int":
+            return str(self.rng.randint(1, 100000))
+        if value_type == "Float":
+            return f"{self.rng.uniform(0, 1000):.2f}"
+        if value_type == "Yes/No":
+            return self.rng.choice(["Yes", "No"])
+        if value_type == "Date":
+            return (today + datetime.timedelta(days=self.rng.randint(-365, 365))).isoformat()
+        return f"{self.prefix}_{allocation.project_id}_{allocation.pk}"
@@ -0,0 +1,218 @@
+import io
+import json
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from coldfront.core.allocation import tasks as allocation_tasks
+from coldfront.core.allocation.models import Allocation
+from coldfront.core.portal.utils import refresh_stats_snapshot
+from coldfront.core.project.models import Project
+
+PREFIX = "bench"
+USERS_PER_PROJECT = 5
+
+# name -> (function of the benchmark context, whether it can be run once before being measured, required app)
+BENCHMARKS = {}
+
+
+def benchmark(name, warm_up=True, app=None):
+    """Registers a benchmark, skipped when app is not installed"""
+
+    def register(func):
+        BENCHMARKS[name] = (func, warm_up, app)
+        return func
+
+    return register
+
+
+def get(context, url, params=None):
+    response = context.client.get(url, params)
+    if response.status_code != 200:
+        raise CommandError(f"GET {url} returned {response.status_code}")
+    # Consume streamed responses so that their queries are counted
+    return b"".join(response.streaming_content) if response.streaming else response.content
+
+
+@benchmark("allocation-list")
+def allocation_list(context):
+    get(context, reverse("allocation-list"), {"show_all_allocations": "on"})
+
+
+@benchmark("allocation-detail")
+def allocation_detail(context):
+    get(context, reverse("allocation-detail", kwargs={"pk": context.allocation.pk}))
+
+
+@benchmark("project-list")
+def project_list(context):
+    get(context, reverse("project-list"), {"show_all_projects": "on"})
+
+
+@benchmark("project-detail")
+def project_detail(context):
+    get(context, reverse("project-detail", kwargs={"pk": context.project.pk}))
+
+
+@benchmark("home")
+def home(context):
+    get(context, reverse("home"))
+
+
+@benchmark("center-summary")
+def center_summary(context):
+    refresh_stats_snapshot("center_summary")
+    get(context, reverse("center-summary"))
+
+
+@benchmark("api-allocations", app="coldfront.plugins.api")
+def api_allocations(context):
+    get(context, reverse("allocations-list"), {"allocation_users": "true", "allocation_attributes": "true"})
+
+
+@benchmark("api-projects", app="coldfront.plugins.api")
+def api_projects(context):
+    get(context, reverse("projects-list"), {"project_users": "true", "allocations": "true"})
+
+
+@benchmark("slurm-dump", app="coldfront.plugins.slurm")
+def slurm_dump(context):
+    with tempfile.TemporaryDirectory() as output:
+        call_command("slurm_dump", output=output)
+
+
+@benchmark("update-statuses", warm_up=False)
+def update_statuses(context):
+    allocation_tasks.update_statuses()
+
+
+@benchmark("send-expiry-emails", warm_up=False)
+def send_expiry_emails(context):
+    allocation_tasks.send_expiry_emails()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the query count, wall time and peak memory of the core views, API and tasks against generated "
+        "datasets of increasing size, and fail when the query count grows with the dataset. The generated data is "
+        "rolled back. Run after initial_setup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="50,200,800",
+            help="Comma separated numbers of projects to generate, in increasing order",
+        )
+        parser.add_argument(
+            "--benchmark",
+            action="append",
+            choices=list(BENCHMARKS),
+            help="Benchmark to run, all if omitted. Can be repeated.",
+        )
+        parser.add_argument(
+            "--max-query-growth",
+            type=int,
+            default=0,
+            help="Queries a benchmark may add between the smallest and the largest dataset",
+        )
+        parser.add_argument("--json", help="Write the results to this file")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        names = [
+            name
+            for name in options["benchmark"] or BENCHMARKS
+            if BENCHMARKS[name][2] is None or apps.is_installed(BENCHMARKS[name][2])
+        ]
+
+        with override_settings(
+            # Measure the work done when nothing is cached
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+        ):
+            with transaction.atomic():
+                results = self.run_benchmarks(names, sizes)
+                transaction.set_rollback(True)
+
+        self.stdout.write(f"{'benchmark':<20} {'projects':>8} {'queries':>8} {'time (ms)':>10} {'peak (KiB)':>11}")
+        for result in results:
+            self.stdout.write(
+                f"{result['benchmark']:<20} {result['projects']:>8} {result['queries']:>8} "
+                f"{result['time'] * 1000:>10.1f} {result['peak_memory'] / 1024:>11.1f}"
+            )
+        if options["json"]:
+            with open(options["json"], "w") as fp:
+                json.dump(results, fp, indent=2)
+
+        growing = []
+        for name in names:
+            queries = [result["queries"] for result in results if result["benchmark"] == name]
+            if queries[-1] - queries[0] > options["max_query_growth"]:
+                growing.append(f"{name} ({' -> '.join(str(count) for count in queries)})")
+        if growing:
+            raise CommandError(f"Query count grows with the dataset: {', '.join(growing)}")
+
+    def run_benchmarks(self, names, sizes):
+        admin = User.objects.create_superuser(f"{PREFIX}_admin", f"{PREFIX}_admin@example.edu")
+        client = Client()
+        client.force_login(admin)
+
+        results = []
+        generated = 0
+        for index, size in enumerate(sizes):
+            call_command(
+                "generate_scale_data",
+                users=(size - generated) * USERS_PER_PROJECT,
+                projects=size - generated,
+                seed=index,
+                prefix=f"{PREFIX}{index}_",
+                stdout=io.StringIO(),
+            )
+            generated = size
+            context = SimpleNamespace(
+                client=client,
+                # The busiest objects, whose pages grow the most with the dataset
+                allocation=Allocation.objects.annotate(users=Count("allocationuser")).order_by("-users").first(),
+                project=Project.objects.annotate(allocations=Count("allocation")).order_by("-allocations").first(),
+            )
+            for name in names:
+                results.append({"benchmark": name, "projects": size, **self.measure(BENCHMARKS[name], context)})
+        return results
+
+    def measure(self, benchmark, context):
+        func, warm_up, _ = benchmark
+        if warm_up:
+            # Leave out template compilation and other first-call costs
+            func(context)
+
+        # With DEBUG on, the queries of earlier runs fill the log until a request resets it
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func(context)
+            elapsed = time.perf_counter() - start
+        # Read before the next request resets the query log the captured queries are sliced from
+        query_count = len(queries)
+
+        tracemalloc.start()
+        try:
+            func(context)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {"queries": query_count, "time": elapsed, "peak_memory": peak}
@@ -1,36 +1,108 @@
-from django.conf import settings
+import csv
+import itertools
+import json
+from collections import defaultdict
+
+from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from coldfront.core.allocation.models import Allocation, AllocationUser
+from coldfront.core.allocation.utils import set_allocation_users_status
+from coldfront.core.project.models import ProjectUser
+
+PROJECT_STATUSES = ("Active", "New")
+ALLOCATION_STATUSES = (
+    "Active",
+    "New",
+    "Paid",
+    "Payment Pending",
+    "Payment Requested",
+    "Renewal Requested",
+)
 
-from coldfront.core.project.models import Project
 
-base_dir = settings.BASE_DIR
+def get_users_not_in_allocation():
+    """
+    Returns:
+        QuerySet: (project id, project title, PI username, user id, username) of the active users of active and new
+        projects who are not active users of any of the project's allocations, ordered by project
+    """
+
+    in_allocation = AllocationUser.objects.filter(
+        allocation__project=OuterRef("project"),
+        allocation__status__name__in=ALLOCATION_STATUSES,
+        user=OuterRef("user"),
+        status__name="Active",
+    )
+    return (
+        ProjectUser.objects.filter(project__status__name__in=PROJECT_STATUSES, status__name="Active")
+        .exclude(Exists(in_allocation))
+        .order_by("project_id", "user__username")
+        .values_list("project_id", "project__title", "project__pi__username", "user_id", "user__username")
+    )
 
 
 class Command(BaseCommand):
+    help = "Show the active project users who are not active users of any of the project's allocations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=["text", "csv", "json"],
+            default="text",
+            help="Output format",
+        )
+        parser.add_argument(
+            "--add-to-allocations",
+            action="store_true",
+            help="Add the users to the project's allocations",
+        )
+
     def handle(self, *args, **options):
-        for project in Project.objects.filter(status__name__in=["Active", "New"]):
-            users_in_project = list(
-                project.projectuser_set.filter(status__name="Active").values_list(
-                    "user__username", flat=True
-                )
+        projects = [
+            {
+                "project_id": project_id,
+                "project_title": title,
+                "pi": pi,
+                "users": {user_id: username for *_, user_id, username in rows},
+            }
+            for (project_id, title, pi), rows in itertools.groupby(
+                get_users_not_in_allocation().iterator(), key=lambda row: row[:3]
             )
-            users_in_allocation = []
-            for allocation in project.allocation_set.filter(
-                status__name__in=(
-                    "Active",
-                    "New",
-                    "Paid",
-                    "Payment Pending",
-                    "Payment Requested",
-                    "Renewal Requested",
-                )
-            ):
-                users_in_allocation.extend(
-                    allocation.allocationuser_set.filter(
-                        status__name="Active"
-                    ).values_list("user__username", flat=True)
+        ]
+
+        if options["format"] == "json":
+            self.stdout.write(
+                json.dumps([dict(project, users=list(project["users"].values())) for project in projects], indent=2)
+            )
+        elif options["format"] == "csv":
+            writer = csv.writer(self.stdout)
+            writer.writerow(["project_id", "project_title", "pi", "username"])
+            for project in projects:
+                for username in project["users"].values():
+                    writer.writerow([project["project_id"], project["project_title"], project["pi"], username])
+        else:
+            for project in projects:
+                self.stdout.write(
+                    f"{project['project_id']} {project['project_title']} {project['pi']} "
+                    f"{list(project['users'].values())}"
                 )
 
-            extra_users = list(set(users_in_project) - set(users_in_allocation))
-            if extra_users:
-                print(project.id, project.title, project.pi, extra_users)
+        if options["add_to_allocations"]:
+            self.add_to_allocations(projects)
+
+    def add_to_allocations(self, projects):
+        allocations_by_project = defaultdict(list)
+        for allocation in Allocation.objects.filter(
+            project_id__in=[project["project_id"] for project in projects], status__name__in=ALLOCATION_STATUSES
+        ):
+            allocations_by_project[allocation.project_id].append(allocation)
+        users = User.objects.in_bulk({user_id for project in projects for user_id in project["users"]})
+
+        added = 0
+        for project in projects:
+            allocation_objs = allocations_by_project[project["project_id"]]
+            user_objs = [users[user_id] for user_id in project["users"]]
+            added += len(set_allocation_users_status(allocation_objs, user_objs, "Active", create=True))
+        self.stderr.write(f"Set {added} allocation users to Active")
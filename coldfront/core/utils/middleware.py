@@ -0,0 +1,214 @@
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from coldfront.core.utils.common import import_from_settings
+from coldfront.core.utils.log import correlation_id_scope
+
+REQUEST_METRICS_ENABLE = import_from_settings("REQUEST_METRICS_ENABLE", False)
+REQUEST_METRICS_SAMPLE_RATE = import_from_settings("REQUEST_METRICS_SAMPLE_RATE", 0.1)
+REQUEST_METRICS_SERVER_TIMING = import_from_settings("REQUEST_METRICS_SERVER_TIMING", True)
+LOG_REQUEST_ID_HEADER = import_from_settings("LOG_REQUEST_ID_HEADER", "X-Request-ID")
+
+logger = logging.getLogger(__name__)
+
+# Request IDs accepted from the proxy, others are replaced to keep the logs parseable
+VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+# Lists of placeholders, e.g. "IN (%s, %s, %s)", so that the same query with more values gets the same fingerprint
+PLACEHOLDER_LIST = re.compile(r"\((?:%s, )*%s\)")
+
+
+def get_query_fingerprint(sql):
+    """
+    Params:
+        sql (str): SQL of a query, with placeholders for its parameters
+
+    Returns:
+        str: short hash identifying the query whatever its parameters
+    """
+
+    return hashlib.sha1(PLACEHOLDER_LIST.sub("(...)", sql).encode()).hexdigest()[:12]
+
+
+class QueryRecorder:
+    """Database execute wrapper recording the number of queries, their total time and how often each one repeats"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            fingerprint = get_query_fingerprint(sql)
+            self.fingerprints[fingerprint] += 1
+            self.statements.setdefault(fingerprint, sql)
+
+    def get_duplicates(self):
+        """
+        Returns:
+            dict: number of executions by fingerprint of the queries run more than once, most repeated first
+        """
+
+        return {fingerprint: count for fingerprint, count in self.fingerprints.most_common() if count > 1}
+
+
+class RequestMetrics:
+    """Counters of the requests and logins handled by this process, rendered in the Prometheus text format.
+
+    Every process keeps its own counters, labelled with its pid, so that the series of the workers of a multi-process
+    server are told apart. Each scrape returns the counters of the worker answering it.
+    """
+
+    METRICS = {
+        "coldfront_requests_total": ("counter", "Requests handled"),
+        "coldfront_request_duration_seconds_total": ("counter", "Time spent handling requests"),
+        "coldfront_sampled_requests_total": ("counter", "Requests whose database queries were recorded"),
+        "coldfront_db_queries_total": ("counter", "Database queries of the sampled requests"),
+        "coldfront_db_duration_seconds_total": ("counter", "Database time of the sampled requests"),
+        "coldfront_db_duplicate_queries_total": (
+            "counter",
+            "Repeated executions of the same query in the sampled requests",
+        ),
+        "coldfront_logins_total": ("counter", "Logins by authentication backend and result"),
+        "coldfront_login_duration_seconds_total": ("counter", "Time spent authenticating logins"),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def observe(self, view, method, status, duration, recorder=None):
+        with self._lock:
+            self._values["coldfront_requests_total", (("view", view), ("method", method), ("status", str(status)))] += 1
+            self._values["coldfront_request_duration_seconds_total", (("view", view),)] += duration
+            if recorder is not None:
+                self._values["coldfront_sampled_requests_total", (("view", view),)] += 1
+                self._values["coldfront_db_queries_total", (("view", view),)] += recorder.count
+                self._values["coldfront_db_duration_seconds_total", (("view", view),)] += recorder.duration
+                self._values["coldfront_db_duplicate_queries_total", (("view", view),)] += sum(
+                    count - 1 for count in recorder.get_duplicates().values()
+                )
+
+    def observe_login(self, backend, succeeded, duration):
+        with self._lock:
+            self._values[
+                "coldfront_logins_total", (("backend", backend), ("result", "success" if succeeded else "failure"))
+            ] += 1
+            self._values["coldfront_login_duration_seconds_total", (("backend", backend),)] += duration
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+
+        pid = ("pid", str(os.getpid()))
+        lines = []
+        for name, (metric_type, description) in self.METRICS.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {metric_type}"]
+            for (metric, labels), value in values:
+                if metric == name:
+                    label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in (*labels, pid))
+                    lines.append(f"{name}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """Records the duration of every request, and the database queries of a REQUEST_METRICS_SAMPLE_RATE share of them.
+
+    Sampled requests are logged with their view, query count, database time and repeated queries, and get a
+    Server-Timing header. The counters of all requests are served by the metrics view. Queries run while streaming a
+    response are not recorded.
+    """
+
+    def __init__(self, get_response):
+        if not REQUEST_METRICS_ENABLE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        recorder = None
+        if random.random() < REQUEST_METRICS_SAMPLE_RATE:
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = request.resolver_match.view_name if request.resolver_match else "unresolved"
+        request_metrics.observe(view, request.method, response.status_code, duration, recorder)
+
+        timings = [f"app;dur={duration * 1000:.1f}"]
+        if recorder is not None:
+            timings.append(f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"')
+            duplicates = recorder.get_duplicates()
+            logger.info(
+                "%s %s (%s) %s in %.1fms, %s queries in %.1fms, %s repeated",
+                request.method,
+                request.path,
+                view,
+                response.status_code,
+                duration * 1000,
+                recorder.count,
+                recorder.duration * 1000,
+                len(duplicates),
+                extra={
+                    "view": view,
+                    "method": request.method,
+                    "status": response.status_code,
+                    "duration": duration,
+                    "query_count": recorder.count,
+                    "db_duration": recorder.duration,
+                    "duplicate_queries": [
+                        {"fingerprint": fingerprint, "count": count, "sql": recorder.statements[fingerprint][:200]}
+                        for fingerprint, count in list(duplicates.items())[:5]
+                    ],
+                },
+            )
+        if REQUEST_METRICS_SERVER_TIMING:
+            response["Server-Timing"] = ", ".join(timings)
+        return response
+
+
+class CorrelationIdMiddleware:
+    """Sets the correlation ID of the records logged while handling a request to the request ID sent by the proxy in
+    the LOG_REQUEST_ID_HEADER header, or a new one, and returns it in the same header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get(LOG_REQUEST_ID_HEADER, "") if LOG_REQUEST_ID_HEADER else ""
+        with correlation_id_scope(request_id if VALID_REQUEST_ID.fullmatch(request_id) else None) as request_id:
+            response = self.get_response(request)
+        if LOG_REQUEST_ID_HEADER:
+            response[LOG_REQUEST_ID_HEADER] = request_id
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('kind', models.CharField(choices=[('task', 'Task'), ('command', 'Command')], max_length=16)),
+                ('started', models.DateTimeField()),
+                ('duration', models.FloatField()),
+                ('query_count', models.PositiveIntegerField(default=0)),
+                ('rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('succeeded', models.BooleanField(default=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-started'],
+                'indexes': [models.Index(fields=['name', '-started'], name='utils_taskr_name_8c0094_idx')],
+            },
+        ),
+    ]
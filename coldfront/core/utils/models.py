@@ -1 +1,109 @@
-# Create your models here.
+import copy
+import functools
+import time
+
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+from coldfront.core.utils.common import import_from_settings
+
+CHOICE_LOOKUP_CACHE_TIMEOUT = import_from_settings("CHOICE_LOOKUP_CACHE_TIMEOUT", 300)
+
+# Model label -> (time loaded, rows by name)
+_choice_lookups = {}
+
+
+def clear_choice_lookups(sender=None, **kwargs):
+    """Clears the cached rows of a ChoiceLookupManager model, or of all of them when sender is None"""
+    if sender is None or not isinstance(sender, type) or not issubclass(sender, models.Model):
+        _choice_lookups.clear()
+    else:
+        _choice_lookups.pop(sender._meta.label, None)
+
+
+def _clear_choice_lookup(sender, using=None, **kwargs):
+    clear_choice_lookups(sender)
+    # Clear it again once the write commits, in case another thread reloaded the old rows in between
+    transaction.on_commit(functools.partial(clear_choice_lookups, sender), using=using)
+
+
+# flush, e.g. between TransactionTestCases, truncates the tables without sending post_delete
+post_migrate.connect(clear_choice_lookups, dispatch_uid="clear_choice_lookups")
+
+
+class ChoiceLookupManager(models.Manager):
+    """Manager of a small lookup table, like a status or role choice, whose rows are cached in the process by name.
+
+    The whole table is loaded by the first get_by_natural_key and kept for CHOICE_LOOKUP_CACHE_TIMEOUT seconds. Saving
+    or deleting a row clears it. Rows read inside a transaction are only cached once it commits.
+    """
+
+    def contribute_to_class(self, cls, name):
+        super().contribute_to_class(cls, name)
+        if not cls._meta.abstract:
+            post_save.connect(_clear_choice_lookup, sender=cls, dispatch_uid=f"choice_lookup_{cls._meta.label}")
+            post_delete.connect(_clear_choice_lookup, sender=cls, dispatch_uid=f"choice_lookup_{cls._meta.label}")
+
+    def get_lookup(self):
+        """
+        Returns:
+            dict: the rows of the table by name
+        """
+
+        label = self.model._meta.label
+        cached = _choice_lookups.get(label)
+        if cached is not None and time.monotonic() - cached[0] < CHOICE_LOOKUP_CACHE_TIMEOUT:
+            return cached[1]
+
+        rows = {}
+        for obj in self.all():
+            rows.setdefault(obj.name, obj)
+        entry = (time.monotonic(), rows)
+        if transaction.get_connection(self.db).in_atomic_block:
+            # Don't serve rows that could still be rolled back
+            transaction.on_commit(functools.partial(_choice_lookups.__setitem__, label, entry), using=self.db)
+        else:
+            _choice_lookups[label] = entry
+        return rows
+
+    def get_by_natural_key(self, name):
+        obj = self.get_lookup().get(name)
+        if obj is None:
+            # Created since the table was loaded, or raises DoesNotExist
+            return self.get(name=name)
+        # Callers may change the instance they get
+        return copy.copy(obj)
+
+
+class TaskRun(models.Model):
+    """A run of a Django Q task or management command, see coldfront.core.utils.instrumentation
+
+    Attributes:
+        name (str): dotted path of the task function, or name of the command
+        kind (str): task or command
+        started (datetime): when the run started
+        duration (float): seconds the run took
+        query_count (int): database queries issued by the run
+        rows (int): rows processed, when the task or command reports it
+        succeeded (bool): whether the run finished without an error
+        error (str): traceback of the error that made the run fail
+    """
+
+    KIND_TASK = "task"
+    KIND_COMMAND = "command"
+
+    class Meta:
+        ordering = ["-started"]
+        indexes = [models.Index(fields=["name", "-started"])]
+
+    name = models.CharField(max_length=255)
+    kind = models.CharField(max_length=16, choices=[(KIND_TASK, "Task"), (KIND_COMMAND, "Command")])
+    started = models.DateTimeField()
+    duration = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    rows = models.PositiveIntegerField(blank=True, null=True)
+    succeeded = models.BooleanField(default=True)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.name} at {self.started}"
@@ -0,0 +1,130 @@
+import contextlib
+import functools
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+from django_q.brokers import get_broker
+from django_q.tasks import async_task
+
+from coldfront.core.utils.common import import_from_settings
+
+SIGNAL_HANDLERS_RUN_ASYNC = import_from_settings("SIGNAL_HANDLERS_RUN_ASYNC", True)
+SIGNAL_HANDLERS_IDEMPOTENCY_TIMEOUT = import_from_settings("SIGNAL_HANDLERS_IDEMPOTENCY_TIMEOUT", 86400)
+SIGNAL_HANDLERS_LOCK_TIMEOUT = import_from_settings("SIGNAL_HANDLERS_LOCK_TIMEOUT", 120)
+
+logger = logging.getLogger(__name__)
+
+_coalescing = threading.local()
+
+
+def connect_batch_handler(signal, handler, pks_arg="allocation_user_pks", run_async=None, sender=None):
+    """Connects a handler to a batch signal.
+
+    The handler is called with the list of pks sent with the signal and an idempotency_key keyword argument which
+    stays the same when a call is retried. It runs once the current transaction commits, in a Django Q task unless
+    run_async (or SIGNAL_HANDLERS_RUN_ASYNC when run_async is None) is False.
+
+    Params:
+        signal (Signal): batch signal, e.g. allocation_activate_users
+        handler (str): dotted path of the handler
+        pks_arg (str): keyword argument of the signal holding the pks
+        run_async (bool): whether to run the handler in a Django Q task
+        sender: only handle the signals sent by this sender
+    """
+
+    def receiver(sender, **kwargs):
+        queue_batch_handler(handler, kwargs[pks_arg], SIGNAL_HANDLERS_RUN_ASYNC if run_async is None else run_async)
+
+    signal.connect(receiver, sender=sender, weak=False, dispatch_uid=(handler, pks_arg))
+    return receiver
+
+
+@contextlib.contextmanager
+def coalesce_batch_handlers():
+    """Collects the batches sent inside the block so that each handler is called once with all their pks on exit"""
+    stack = _coalescing.__dict__.setdefault("stack", [])
+    stack.append(defaultdict(list))
+    try:
+        yield
+    finally:
+        pending = stack.pop()
+        for (handler, run_async), pks in pending.items():
+            queue_batch_handler(handler, list(dict.fromkeys(pks)), run_async)
+
+
+def queue_batch_handler(handler, pks, run_async):
+    if not pks:
+        return
+    stack = getattr(_coalescing, "stack", None)
+    if stack:
+        stack[-1][(handler, run_async)].extend(pks)
+        return
+
+    transaction.on_commit(functools.partial(dispatch_batch_handler, handler, list(pks), run_async))
+
+
+def dispatch_batch_handler(handler, pks, run_async):
+    idempotency_key = f"signal-handler:{handler}:{uuid.uuid4().hex}"
+    if not run_async:
+        run_batch_handler(handler, pks, idempotency_key)
+        return
+
+    async_task("coldfront.core.utils.signals.run_batch_handler", handler, pks, idempotency_key)
+    queue_depth = get_queue_depth()
+    logger.info(
+        "Queued signal handler %s for %s pks, queue depth %s",
+        handler,
+        len(pks),
+        queue_depth,
+        extra={"handler": handler, "batch_size": len(pks), "queue_depth": queue_depth},
+    )
+
+
+def get_queue_depth():
+    """
+    Returns:
+        int: number of tasks waiting in the Django Q broker, None when the broker can't tell
+    """
+
+    try:
+        return get_broker().queue_size()
+    except Exception:
+        logger.debug("Could not get the Django Q queue size", exc_info=True)
+        return None
+
+
+def run_batch_handler(handler, pks, idempotency_key):
+    """Runs a batch signal handler unless the call with this idempotency key already ran or is running"""
+    done_key = f"{idempotency_key}:done"
+    if cache.get(done_key):
+        logger.info("Skipping signal handler %s, %s already ran", handler, idempotency_key)
+        return
+    # The lock expires when the worker running the call is killed, so that a retry of the task runs it again
+    if not cache.add(idempotency_key, True, SIGNAL_HANDLERS_LOCK_TIMEOUT):
+        logger.info("Skipping signal handler %s, %s is running", handler, idempotency_key)
+        return
+
+    start = time.monotonic()
+    try:
+        # The call may have finished between the check and the lock
+        if cache.get(done_key):
+            return
+        import_string(handler)(pks, idempotency_key=idempotency_key)
+        cache.set(done_key, True, SIGNAL_HANDLERS_IDEMPOTENCY_TIMEOUT)
+    finally:
+        # A failed call is not done, so a retry of the task runs the handler again
+        cache.delete(idempotency_key)
+    latency = time.monotonic() - start
+    logger.info(
+        "Signal handler %s handled %s pks in %.3fs",
+        handler,
+        len(pks),
+        latency,
+        extra={"handler": handler, "batch_size": len(pks), "latency": latency},
+    )
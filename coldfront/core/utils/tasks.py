@@ -0,0 +1,20 @@
+import datetime
+import logging
+
+from django.utils import timezone
+
+from coldfront.core.utils.common import import_from_settings
+from coldfront.core.utils.models import TaskRun
+
+logger = logging.getLogger(__name__)
+
+TASK_RUN_RETENTION_DAYS = import_from_settings("TASK_RUN_RETENTION_DAYS", 90)
+
+
+def prune_task_runs():
+    """Deletes the task and command runs older than TASK_RUN_RETENTION_DAYS"""
+    deleted, _ = TaskRun.objects.filter(
+        started__lt=timezone.now() - datetime.timedelta(days=TASK_RUN_RETENTION_DAYS)
+    ).delete()
+    logger.info("Deleted %s task runs older than %s days", deleted, TASK_RUN_RETENTION_DAYS)
+    return deleted
@@ -1,6 +1,81 @@
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+from unittest.mock import patch
+
+import django.dispatch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed, ValidationError
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
 from django.template import Context, Template
-from django.test import RequestFactory, SimpleTestCase
-from django.urls import resolve
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from coldfront.core.allocation.models import Allocation, AllocationAttribute, AllocationStatusChoice
+from coldfront.core.project.models import Project
+from coldfront.core.school.models import School
+from coldfront.core.test_helpers.factories import (
+    AllocationFactory,
+    AllocationUserFactory,
+    AllocationUserStatusChoiceFactory,
+    ProjectFactory,
+    ProjectStatusChoiceFactory,
+    ProjectUserFactory,
+    UserFactory,
+)
+from coldfront.core.user.models import ApproverProfile, UserProfile
+from coldfront.core.utils.importer import BulkImporter, read_records
+from coldfront.core.utils.instrumentation import (
+    finish_task_run,
+    instrument_command,
+    set_task_correlation_id,
+    start_task_run,
+)
+from coldfront.core.utils.log import (
+    CorrelationIdFilter,
+    JSONFormatter,
+    QueueHandler,
+    RateLimitFilter,
+    SamplingFilter,
+    correlation_id_scope,
+    get_correlation_id,
+)
+from coldfront.core.utils.middleware import CorrelationIdMiddleware, RequestMetricsMiddleware, request_metrics
+from coldfront.core.utils.models import TaskRun, clear_choice_lookups
+from coldfront.core.utils.signals import coalesce_batch_handlers, connect_batch_handler, run_batch_handler
+from coldfront.core.utils.tasks import prune_task_runs
+
+HANDLER = "coldfront.core.utils.tests.tests.record_batch"
+FAILING_HANDLER = "coldfront.core.utils.tests.tests.fail_batch"
+handled_batches = []
+
+logging.disable(logging.CRITICAL)
+
+
+def record_batch(pks, idempotency_key):
+    handled_batches.append((pks, idempotency_key))
+
+
+def fail_batch(pks, idempotency_key):
+    raise RuntimeError("handler failed")
+
+
+class CountingCommand(BaseCommand):
+    @instrument_command
+    def handle(self, *args, **options):
+        self.rows_processed = User.objects.count()
+        if options.get("fail"):
+            raise CommandError("command failed")
 
 
 class NavbarActiveItemTests(SimpleTestCase):
@@ -19,3 +94,589 @@ class NavbarActiveItemTests(SimpleTestCase):
         rendered = template.render(Context({"request": request}))
 
         self.assertEqual(rendered, "active")
+
+
+class BatchSignalHandlerTests(TestCase):
+    def setUp(self):
+        self.signal = django.dispatch.Signal()
+        handled_batches.clear()
+        self.addCleanup(cache.clear)
+
+    def send(self, pks):
+        self.signal.send(sender=None, allocation_user_pks=pks)
+
+    def test_handler_runs_after_commit(self):
+        connect_batch_handler(self.signal, HANDLER, run_async=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.send([1, 2])
+            self.assertEqual(handled_batches, [])
+
+        self.assertEqual([pks for pks, _ in handled_batches], [[1, 2]])
+
+    def test_coalesce_batch_handlers(self):
+        connect_batch_handler(self.signal, HANDLER, run_async=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with coalesce_batch_handlers():
+                self.send([1, 2])
+                self.send([2, 3])
+
+        self.assertEqual([pks for pks, _ in handled_batches], [[1, 2, 3]])
+
+    def test_handler_runs_in_task(self):
+        connect_batch_handler(self.signal, HANDLER, run_async=True)
+
+        with (
+            patch("coldfront.core.utils.signals.async_task") as async_task,
+            patch("coldfront.core.utils.signals.get_broker") as get_broker,
+        ):
+            get_broker.return_value.queue_size.return_value = 3
+            with self.captureOnCommitCallbacks(execute=True):
+                self.send([1])
+
+        async_task.assert_called_once()
+        self.assertEqual(
+            async_task.call_args.args[:3], ("coldfront.core.utils.signals.run_batch_handler", HANDLER, [1])
+        )
+        self.assertEqual(handled_batches, [])
+
+    def test_run_batch_handler_is_idempotent(self):
+        run_batch_handler(HANDLER, [1], "key")
+        run_batch_handler(HANDLER, [1], "key")
+        self.assertEqual(handled_batches, [([1], "key")])
+
+        with self.assertRaises(RuntimeError):
+            run_batch_handler(FAILING_HANDLER, [1], "failing-key")
+        # A failed call can be retried
+        self.assertTrue(cache.add("failing-key", True))
+
+    def test_run_batch_handler_lock(self):
+        # The lock of a running call, or of a killed worker until it expires, skips the call without marking it done
+        cache.add("key", True)
+        run_batch_handler(HANDLER, [1], "key")
+        self.assertEqual(handled_batches, [])
+
+        cache.delete("key")
+        run_batch_handler(HANDLER, [1], "key")
+        self.assertEqual(handled_batches, [([1], "key")])
+        self.assertTrue(cache.get("key:done"))
+
+
+class ChoiceLookupManagerTests(TestCase):
+    def setUp(self):
+        self.active = AllocationStatusChoice.objects.create(name="Active")
+        AllocationStatusChoice.objects.create(name="Expired")
+        self.addCleanup(clear_choice_lookups)
+
+    def test_lookup_is_cached_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(AllocationStatusChoice.objects.get_by_natural_key("Active"), self.active)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(AllocationStatusChoice.objects.get_by_natural_key("Active").pk, self.active.pk)
+            self.assertEqual(AllocationStatusChoice.objects.get_by_natural_key("Expired").name, "Expired")
+
+    def test_lookup_is_not_cached_before_commit(self):
+        AllocationStatusChoice.objects.get_by_natural_key("Active")
+
+        with self.assertNumQueries(1):
+            AllocationStatusChoice.objects.get_by_natural_key("Active")
+
+    def test_save_clears_lookup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AllocationStatusChoice.objects.get_by_natural_key("Active")
+
+        self.active.name = "Inactive"
+        self.active.save()
+
+        with self.assertRaises(AllocationStatusChoice.DoesNotExist):
+            AllocationStatusChoice.objects.get_by_natural_key("Active")
+        self.assertEqual(AllocationStatusChoice.objects.get_by_natural_key("Inactive").pk, self.active.pk)
+
+    def test_lookup_returns_copies(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AllocationStatusChoice.objects.get_by_natural_key("Active").name = "Changed"
+
+        self.assertEqual(AllocationStatusChoice.objects.get_by_natural_key("Active").name, "Active")
+
+    def test_missing_name_raises_does_not_exist(self):
+        with self.assertRaises(AllocationStatusChoice.DoesNotExist):
+            AllocationStatusChoice.objects.get_by_natural_key("Unknown")
+
+
+class ShowUsersInProjectButNotInAllocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        active = ProjectStatusChoiceFactory(name="Active")
+        cls.project = ProjectFactory(status=active, title="Missing users")
+        cls.allocation = AllocationFactory(project=cls.project)
+        cls.in_allocation = AllocationUserFactory(allocation=cls.allocation).user
+        ProjectUserFactory(project=cls.project, user=cls.in_allocation)
+        cls.missing = ProjectUserFactory(project=cls.project, user=UserFactory(username="missing")).user
+        # Every user of this project is in its allocation
+        complete_project = ProjectFactory(status=active)
+        ProjectUserFactory(
+            project=complete_project,
+            user=AllocationUserFactory(allocation=AllocationFactory(project=complete_project)).user,
+        )
+        AllocationUserStatusChoiceFactory(name="Removed")
+
+    def test_json_output(self):
+        out = io.StringIO()
+        with self.assertNumQueries(1):
+            call_command("show_users_in_project_but_not_in_allocation", "--format", "json", stdout=out)
+
+        self.assertEqual(
+            json.loads(out.getvalue()),
+            [
+                {
+                    "project_id": self.project.pk,
+                    "project_title": "Missing users",
+                    "pi": self.project.pi.username,
+                    "users": ["missing"],
+                }
+            ],
+        )
+
+    def test_csv_output(self):
+        out = io.StringIO()
+        call_command("show_users_in_project_but_not_in_allocation", "--format", "csv", stdout=out)
+
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0], ["project_id", "project_title", "pi", "username"])
+        self.assertEqual(rows[1:], [[str(self.project.pk), "Missing users", self.project.pi.username, "missing"]])
+
+    def test_add_to_allocations(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                "show_users_in_project_but_not_in_allocation",
+                "--add-to-allocations",
+                stdout=io.StringIO(),
+                stderr=io.StringIO(),
+            )
+
+        self.assertEqual(self.allocation.allocationuser_set.get(user=self.missing).status.name, "Active")
+        out = io.StringIO()
+        call_command("show_users_in_project_but_not_in_allocation", stdout=out)
+        self.assertEqual(out.getvalue(), "")
+
+
+def run_initial_setup_defaults():
+    for command in (
+        "import_school_data",
+        "add_default_project_choices",
+        "add_resource_defaults",
+        "add_university_school_default_resources",
+        "add_allocation_defaults",
+    ):
+        call_command(command, stdout=io.StringIO())
+
+
+class GenerateScaleDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        run_initial_setup_defaults()
+
+    def generate(self, *args):
+        call_command(
+            "generate_scale_data", "--users", "30", "--projects", "7", "--chunk-size", "3", *args, stdout=io.StringIO()
+        )
+
+    def test_creates_requested_scale(self):
+        self.generate("--allocations-per-project", "2", "--attributes-per-allocation", "4")
+
+        self.assertEqual(User.objects.filter(username__startswith="scale").count(), 30)
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith="scale", is_pi=True).count(), 6)
+        projects = Project.objects.filter(title__startswith="scale")
+        self.assertEqual(projects.count(), 7)
+        self.assertFalse(projects.exclude(projectuser__role__name="Manager").exists())
+        allocations = Allocation.objects.filter(project__in=projects)
+        self.assertTrue(allocations.exists())
+        self.assertEqual(
+            AllocationAttribute.objects.filter(allocation__in=allocations).count(), 4 * allocations.count()
+        )
+        self.assertFalse(allocations.filter(resources=None).exists())
+
+    def test_seed_makes_data_reproducible(self):
+        self.generate("--seed", "3", "--prefix", "first")
+        self.generate("--seed", "3", "--prefix", "second")
+
+        def summary(prefix):
+            return list(
+                Allocation.objects.filter(project__title__startswith=prefix)
+                .order_by("pk")
+                .values_list("status__name", "quantity", "start_date")
+            )
+
+        self.assertEqual(summary("first"), summary("second"))
+
+    def test_requires_initial_setup(self):
+        AllocationStatusChoice.objects.filter(name="Expired").delete()
+
+        with self.assertRaisesMessage(CommandError, "Expired"):
+            self.generate()
+
+
+def query_per_project(context):
+    for project in Project.objects.all():
+        project.pi.username
+
+
+class RunBenchmarksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        run_initial_setup_defaults()
+
+    def test_records_results_and_rolls_back(self):
+        with tempfile.NamedTemporaryFile(suffix=".json") as results_file:
+            call_command(
+                "run_benchmarks",
+                "--sizes",
+                "2,6",
+                "--benchmark",
+                "allocation-detail",
+                "--benchmark",
+                "project-detail",
+                "--json",
+                results_file.name,
+                stdout=io.StringIO(),
+            )
+            results = json.load(results_file)
+
+        self.assertEqual(
+            [(result["benchmark"], result["projects"]) for result in results],
+            [("allocation-detail", 2), ("project-detail", 2), ("allocation-detail", 6), ("project-detail", 6)],
+        )
+        self.assertTrue(all(result["queries"] > 0 and result["peak_memory"] > 0 for result in results))
+        self.assertFalse(Project.objects.exists())
+
+    @patch.dict(
+        "coldfront.core.utils.management.commands.run_benchmarks.BENCHMARKS",
+        {"query-per-project": (query_per_project, True, None)},
+    )
+    def test_fails_when_queries_grow(self):
+        with self.assertRaisesMessage(CommandError, "query-per-project"):
+            call_command("run_benchmarks", "--sizes", "1,3", "--benchmark", "query-per-project", stdout=io.StringIO())
+
+        call_command(
+            "run_benchmarks",
+            "--sizes",
+            "1,3",
+            "--benchmark",
+            "query-per-project",
+            "--max-query-growth",
+            "2",
+            stdout=io.StringIO(),
+        )
+
+
+@patch("coldfront.core.utils.middleware.REQUEST_METRICS_ENABLE", True)
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        request_metrics.reset()
+        self.addCleanup(request_metrics.reset)
+
+    def get_response(self, request):
+        for username in ("first", "second"):
+            User.objects.filter(username=username).exists()
+        User.objects.filter(username__in=["a", "b", "c"]).exists()
+        User.objects.filter(username__in=["a"]).exists()
+        return HttpResponse()
+
+    def get(self, sample_rate):
+        request = RequestFactory().get("/")
+        request.resolver_match = resolve("/")
+        with patch("coldfront.core.utils.middleware.REQUEST_METRICS_SAMPLE_RATE", sample_rate):
+            return RequestMetricsMiddleware(self.get_response)(request)
+
+    def render_metrics(self):
+        # Every series is labelled with the pid of the process
+        return request_metrics.render().replace(f',pid="{os.getpid()}"}}', "}")
+
+    def test_disabled_by_default(self):
+        with patch("coldfront.core.utils.middleware.REQUEST_METRICS_ENABLE", False):
+            with self.assertRaises(MiddlewareNotUsed):
+                RequestMetricsMiddleware(self.get_response)
+
+    def test_sampled_request_records_queries(self):
+        with patch("coldfront.core.utils.middleware.logger") as logger:
+            response = self.get(1.0)
+
+        self.assertRegex(response["Server-Timing"], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="4 queries"$')
+        extra = logger.info.call_args.kwargs["extra"]
+        self.assertEqual(extra["view"], "home")
+        self.assertEqual(extra["query_count"], 4)
+        # The same queries with other parameters, or more values in an IN list, are repeats
+        self.assertEqual([duplicate["count"] for duplicate in extra["duplicate_queries"]], [2, 2])
+        metrics = self.render_metrics()
+        self.assertIn('coldfront_requests_total{view="home",method="GET",status="200"} 1', metrics)
+        self.assertIn('coldfront_db_queries_total{view="home"} 4', metrics)
+        self.assertIn('coldfront_db_duplicate_queries_total{view="home"} 2', metrics)
+        self.assertIn(f'coldfront_db_queries_total{{view="home",pid="{os.getpid()}"}} 4', request_metrics.render())
+
+    def test_unsampled_request_only_records_duration(self):
+        response = self.get(0.0)
+
+        self.assertRegex(response["Server-Timing"], r"^app;dur=[\d.]+$")
+        metrics = self.render_metrics()
+        self.assertIn('coldfront_requests_total{view="home",method="GET",status="200"} 1', metrics)
+        self.assertNotIn("coldfront_db_queries_total{", metrics)
+
+    def test_login_metrics(self):
+        request_metrics.observe_login("mokey_oidc", True, 0.25)
+        request_metrics.observe_login("mokey_oidc", False, 0.5)
+
+        metrics = self.render_metrics()
+        self.assertIn('coldfront_logins_total{backend="mokey_oidc",result="success"} 1', metrics)
+        self.assertIn('coldfront_logins_total{backend="mokey_oidc",result="failure"} 1', metrics)
+        self.assertIn('coldfront_login_duration_seconds_total{backend="mokey_oidc"} 0.75', metrics)
+
+
+@patch("coldfront.core.utils.views.REQUEST_METRICS_ENABLE", True)
+@patch("coldfront.core.utils.views.REQUEST_METRICS_TOKEN", "secret")
+class MetricsViewTests(TestCase):
+    def test_requires_superuser_or_token(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, headers={"Authorization": "Bearer wrong"}).status_code, 403)
+
+        response = self.client.get(url, headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "# TYPE coldfront_requests_total counter")
+
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.edu"))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_not_found_when_disabled(self):
+        with patch("coldfront.core.utils.views.REQUEST_METRICS_ENABLE", False):
+            self.assertEqual(
+                self.client.get(reverse("metrics"), headers={"Authorization": "Bearer secret"}).status_code, 404
+            )
+
+
+class TaskRunTests(TestCase):
+    def test_command_records_run(self):
+        UserFactory.create_batch(3)
+        CountingCommand().handle()
+
+        run = TaskRun.objects.get()
+        self.assertEqual((run.name, run.kind), ("tests", TaskRun.KIND_COMMAND))
+        self.assertEqual((run.rows, run.query_count), (3, 1))
+        self.assertTrue(run.succeeded)
+
+    def test_command_records_failure(self):
+        with self.assertRaisesMessage(CommandError, "command failed"):
+            CountingCommand().handle(fail=True)
+
+        run = TaskRun.objects.get()
+        self.assertFalse(run.succeeded)
+        self.assertIn("command failed", run.error)
+
+    def test_task_signals_record_run(self):
+        task = {"id": "task-1", "func": "coldfront.core.allocation.tasks.update_statuses"}
+        start_task_run(sender=None, func=task["func"], task=task)
+        User.objects.exists()
+        User.objects.exists()
+        task.update(success=True, result=2)
+        finish_task_run(sender=None, func=task["func"], task=task)
+        # Queries after the task aren't counted
+        User.objects.exists()
+
+        task = {"id": "task-2", "func": "coldfront.core.allocation.tasks.send_expiry_emails"}
+        start_task_run(sender=None, func=task["func"], task=task)
+        task.update(success=False, result="Traceback: failed")
+        finish_task_run(sender=None, func=task["func"], task=task)
+
+        succeeded, failed = TaskRun.objects.order_by("started")
+        self.assertEqual((succeeded.name, succeeded.kind), ("coldfront.core.allocation.tasks.update_statuses", "task"))
+        self.assertEqual((succeeded.query_count, succeeded.rows, succeeded.succeeded), (2, 2, True))
+        self.assertEqual((failed.rows, failed.succeeded, failed.error), (None, False, "Traceback: failed"))
+
+    def test_task_logs_with_correlation_id(self):
+        ids = []
+        with correlation_id_scope("request-1"):
+            queued = {"id": "task-1", "func": "coldfront.core.allocation.tasks.update_statuses"}
+            set_task_correlation_id(sender=None, task=queued)
+        scheduled = {"id": "task-2", "func": "coldfront.core.allocation.tasks.update_statuses"}
+        set_task_correlation_id(sender=None, task=scheduled)
+
+        for task in (queued, scheduled):
+            start_task_run(sender=None, func=task["func"], task=task)
+            ids.append(get_correlation_id())
+            task.update(success=True, result=None)
+            finish_task_run(sender=None, func=task["func"], task=task)
+
+        # Tasks queued by a request log with its ID, the others with their own
+        self.assertEqual(ids, ["request-1", "task-2"])
+        self.assertIsNone(get_correlation_id())
+
+    def test_prune_task_runs(self):
+        for days in (1, 89, 91, 365):
+            TaskRun.objects.create(
+                name="coldfront.core.allocation.tasks.update_statuses",
+                kind=TaskRun.KIND_TASK,
+                started=timezone.now() - datetime.timedelta(days=days),
+                duration=1.0,
+            )
+
+        with patch("coldfront.core.utils.tasks.TASK_RUN_RETENTION_DAYS", 90):
+            self.assertEqual(prune_task_runs(), 2)
+        self.assertEqual(TaskRun.objects.count(), 2)
+
+    def test_admin_shows_summary_and_trends(self):
+        for succeeded in (True, False):
+            TaskRun.objects.create(
+                name="coldfront.core.allocation.tasks.update_statuses",
+                kind=TaskRun.KIND_TASK,
+                started=timezone.now(),
+                duration=1.5,
+                query_count=10,
+                succeeded=succeeded,
+            )
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.edu"))
+
+        response = self.client.get(reverse("admin:utils_taskrun_changelist"))
+
+        self.assertEqual(response.status_code, 200)
+        summary = response.context["task_summary"].get()
+        self.assertEqual((summary["runs"], summary["failures"]), (2, 1))
+        self.assertEqual([name for name, _ in response.context["task_trends"]], [summary["name"]])
+        self.assertContains(response, "plotly-graph-div")
+
+
+class LoggingTests(SimpleTestCase):
+    def make_record(self, name="coldfront.core.utils.mail", level=logging.INFO, **kwargs):
+        return logging.makeLogRecord(
+            {"name": name, "levelno": level, "levelname": logging.getLevelName(level), **kwargs}
+        )
+
+    def test_json_formatter(self):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            record = self.make_record(msg="Sent %s emails", args=(3,), exc_info=sys.exc_info(), count=3)
+        with correlation_id_scope("request-1"):
+            CorrelationIdFilter().filter(record)
+
+        entry = json.loads(JSONFormatter().format(record))
+
+        self.assertEqual(entry["message"], "Sent 3 emails")
+        self.assertEqual((entry["level"], entry["correlation_id"], entry["count"]), ("INFO", "request-1", 3))
+        self.assertIn("ZeroDivisionError", entry["exception"])
+
+    def test_sampling_filter(self):
+        sampling = SamplingFilter({"coldfront.plugins": 1.0, "coldfront.plugins.xdmod": 0.0})
+
+        self.assertFalse(sampling.filter(self.make_record("coldfront.plugins.xdmod.management.commands")))
+        self.assertTrue(sampling.filter(self.make_record("coldfront.plugins.xdmod", logging.ERROR)))
+        self.assertTrue(sampling.filter(self.make_record("coldfront.plugins.xdmodx")))
+        self.assertTrue(sampling.filter(self.make_record("coldfront.core")))
+
+    def test_rate_limit_filter(self):
+        rate_limit = RateLimitFilter(rate=1, burst=2)
+        with patch("coldfront.core.utils.log.time.monotonic", return_value=100.0):
+            kept = [rate_limit.filter(self.make_record()) for _ in range(5)]
+            # Other loggers and errors have their own limits
+            self.assertTrue(rate_limit.filter(self.make_record("coldfront.core.project")))
+            self.assertTrue(rate_limit.filter(self.make_record(level=logging.ERROR)))
+        self.assertEqual(kept, [True, True, False, False, False])
+
+        record = self.make_record()
+        with patch("coldfront.core.utils.log.time.monotonic", return_value=101.0):
+            self.assertTrue(rate_limit.filter(record))
+            self.assertFalse(rate_limit.filter(self.make_record()))
+        self.assertEqual(record.suppressed, 3)
+
+    def test_queue_handler_drops_records_when_full(self):
+        handler = QueueHandler(queue.Queue(maxsize=1))
+        handler.handle(self.make_record(msg="queued"))
+        handler.handle(self.make_record(msg="dropped"))
+        handler.queue.get_nowait()
+        handler.handle(self.make_record(msg="after"))
+
+        record = handler.queue.get_nowait()
+        self.assertEqual((record.getMessage(), record.dropped), ("after", 1))
+
+    def test_queued_traceback_is_kept_apart(self):
+        handler = QueueHandler(queue.Queue())
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            handler.handle(self.make_record(msg="failed %s", args=("sync",), exc_info=sys.exc_info()))
+
+        record = handler.queue.get_nowait()
+        self.assertEqual(record.getMessage(), "failed sync")
+        self.assertIsNone(record.exc_info)
+        self.assertIn("ZeroDivisionError", json.loads(JSONFormatter().format(record))["exception"])
+
+    def test_correlation_id_middleware(self):
+        ids = []
+
+        def get_response(request):
+            ids.append(get_correlation_id())
+            return HttpResponse()
+
+        middleware = CorrelationIdMiddleware(get_response)
+        response = middleware(RequestFactory().get("/", headers={"X-Request-ID": "proxy-id"}))
+        self.assertEqual((ids[-1], response["X-Request-ID"]), ("proxy-id", "proxy-id"))
+
+        response = middleware(RequestFactory().get("/", headers={"X-Request-ID": "not valid\n"}))
+        self.assertRegex(ids[-1], r"^[0-9a-f]{32}$")
+        self.assertEqual(response["X-Request-ID"], ids[-1])
+        self.assertIsNone(get_correlation_id())
+
+
+class BulkImporterTests(TestCase):
+    def import_schools(self, data, **kwargs):
+        records = read_records(io.StringIO(data), "tsv", fieldnames=["pk", "description"])
+        return BulkImporter(School, ["pk"], ["description"], batch_size=2).run(records, **kwargs)
+
+    def test_upserts_and_counts_records(self):
+        result = self.import_schools("1\tArts & Science\n2\tCollege of Dentistry\n3\tLaw\n")
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (3, 0, 0))
+
+        result = self.import_schools("1\tArts & Science\n2\tDentistry\n3\tLaw\n4\tNursing\n")
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (1, 1, 2))
+        self.assertEqual(
+            list(School.objects.order_by("pk").values_list("pk", "description")),
+            [(1, "Arts & Science"), (2, "Dentistry"), (3, "Law"), (4, "Nursing")],
+        )
+        # The sequence continues after the imported primary keys
+        self.assertEqual(School.objects.create(description="Stern").pk, 5)
+
+    def test_dry_run_only_counts(self):
+        result = self.import_schools("1\tArts & Science\n", dry_run=True)
+
+        self.assertEqual(result.inserted, 1)
+        self.assertFalse(School.objects.exists())
+
+    def test_invalid_records_fail_the_import(self):
+        with self.assertRaises(ValidationError) as cm:
+            self.import_schools("1\tArts & Science\n2\tDentistry\nx\tLaw\n4\t\n")
+
+        self.assertEqual(len(cm.exception.messages), 2)
+        self.assertTrue(cm.exception.messages[0].startswith("Record 3: "))
+        self.assertFalse(School.objects.exists())
+
+    def test_checks_relations_in_one_query(self):
+        user_profiles = [UserFactory(username=f"approver{i}").userprofile for i in range(3)]
+        importer = BulkImporter(ApproverProfile, ["user_profile"])
+
+        with self.assertNumQueries(5):
+            # savepoint, relation check, stored rows, insert, release
+            result = importer.run({"user_profile_id": str(user_profile.pk)} for user_profile in user_profiles)
+
+        self.assertEqual(result.inserted, 3)
+        self.assertEqual(ApproverProfile.objects.count(), 3)
+        with self.assertRaisesMessage(ValidationError, "user_profile 0 does not exist"):
+            importer.run([{"user_profile_id": 0}])
+
+    def test_import_school_data_command(self):
+        out = io.StringIO()
+        call_command("import_school_data", stdout=out)
+        call_command("import_school_data", stdout=out)
+
+        count = School.objects.count()
+        self.assertIn(f"{count} inserted, 0 updated, 0 unchanged", out.getvalue())
+        self.assertIn(f"0 inserted, 0 updated, {count} unchanged", out.getvalue())
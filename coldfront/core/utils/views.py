@@ -1 +1,24 @@
-# Create your views here.
+import secrets
+
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+from coldfront.core.utils.common import import_from_settings
+from coldfront.core.utils.middleware import request_metrics
+
+REQUEST_METRICS_ENABLE = import_from_settings("REQUEST_METRICS_ENABLE", False)
+REQUEST_METRICS_TOKEN = import_from_settings("REQUEST_METRICS_TOKEN", "")
+
+
+def metrics(request):
+    """Serves the request metrics of this process to superusers, or to scrapers sending the REQUEST_METRICS_TOKEN.
+    Under a multi-process server each scrape returns the counters of the worker answering it, labelled with its pid.
+    """
+    if not REQUEST_METRICS_ENABLE:
+        raise Http404
+
+    authorization = request.headers.get("Authorization", "")
+    has_token = bool(REQUEST_METRICS_TOKEN) and secrets.compare_digest(authorization, f"Bearer {REQUEST_METRICS_TOKEN}")
+    if not (has_token or request.user.is_superuser):
+        return HttpResponseForbidden()
+
+    return HttpResponse(request_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,15 +1,20 @@
-from dataclasses import dataclass
-from coldfront.core.utils.common import import_from_settings
+from dataclasses import dataclass, field
+
 from httpx import URL
 
+from coldfront.core.utils.common import import_from_settings
+
 
 @dataclass
 class KeycloakClientConfig:
-    base_url: URL = URL(import_from_settings("KEYCLOAK_BASE_URL"))
-    username: str = import_from_settings("KEYCLOAK_USERNAME")
-    password: str = import_from_settings("KEYCLOAK_PASSWORD")
-    client_id: str = import_from_settings("KEYCLOAK_CLIENT_ID")
-    client_secret: str = import_from_settings("KEYCLOAK_CLIENT_SECRET")
+    base_url: URL = field(default_factory=lambda: URL(import_from_settings("KEYCLOAK_BASE_URL")))
+    username: str = field(default_factory=lambda: import_from_settings("KEYCLOAK_USERNAME"))
+    password: str = field(default_factory=lambda: import_from_settings("KEYCLOAK_PASSWORD"))
+    client_id: str = field(default_factory=lambda: import_from_settings("KEYCLOAK_CLIENT_ID"))
+    client_secret: str = field(default_factory=lambda: import_from_settings("KEYCLOAK_CLIENT_SECRET"))
+    timeout: float = field(default_factory=lambda: import_from_settings("KEYCLOAK_TIMEOUT", 10.0))
+    max_workers: int = field(default_factory=lambda: import_from_settings("KEYCLOAK_SEARCH_MAX_WORKERS", 8))
+    cache_timeout: int = field(default_factory=lambda: import_from_settings("KEYCLOAK_SEARCH_CACHE_TIMEOUT", 60))
     token_path: str = "realms/hpc/protocol/openid-connect/token"
     search_path: str = "admin/realms/hpc/users?search="
     search_username_path: str = "admin/realms/hpc/users?username="
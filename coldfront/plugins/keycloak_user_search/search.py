@@ -1,78 +1,154 @@
+import functools
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from django.core.cache import cache
+from httpx import URL, Client, Headers, HTTPStatusError, Limits
+
 from coldfront.core.user.utils import UserSearch
 from coldfront.plugins.keycloak_user_search.keycloak_config import KeycloakClientConfig
-import logging
-from httpx import Client, URL, Headers
 
 logger = logging.getLogger(__name__)
 
 
 class KeycloakClient:
-    def __init__(self):
+    # Seconds before their expiry at which tokens are renewed, to absorb request latency and clock skew
+    TOKEN_EXPIRY_MARGIN = 30
+
+    def __init__(self, transport=None):
         self.config: KeycloakClientConfig = KeycloakClientConfig()
         self.token: str = str()
-        self.client: Client = Client()
+        self.token_expires_at: float = 0.0
+        self.refresh_token: str = str()
+        self.refresh_token_expires_at: float = 0.0
+        self.token_lock = threading.Lock()
+        self.client: Client = Client(
+            transport=transport,
+            timeout=self.config.timeout,
+            limits=Limits(max_keepalive_connections=self.config.max_workers),
+        )
+
+    def get_access_token(self) -> str:
+        """Return a valid access token, reusing the current one until it expires and renewing it with the refresh
+        token when possible."""
+        with self.token_lock:
+            now = time.monotonic()
+            if self.token and now < self.token_expires_at:
+                return self.token
+
+            if self.refresh_token and now < self.refresh_token_expires_at:
+                try:
+                    self.request_token(
+                        {
+                            "refresh_token": self.refresh_token,
+                            "client_id": self.config.client_id,
+                            "client_secret": self.config.client_secret,
+                            "grant_type": "refresh_token",
+                        }
+                    )
+                    return self.token
+                except HTTPStatusError as e:
+                    logger.info(f"Keycloak refresh token rejected ({e.response.status_code}), logging in again")
 
-    def get_access_token(self) -> None:
+            self.request_token(
+                {
+                    "username": self.config.username,
+                    "password": self.config.password,
+                    "client_id": self.config.client_id,
+                    "client_secret": self.config.client_secret,
+                    "grant_type": "password",
+                }
+            )
+            return self.token
+
+    def request_token(self, data: dict) -> None:
         token_url: URL = self.config.base_url.join(self.config.token_path)
-        data = {
-            "username": self.config.username,
-            "password": self.config.password,
-            "client_id": self.config.client_id,
-            "client_secret": self.config.client_secret,
-            "grant_type": "password",
-        }
-        logger.info(f"base_url is: {self.config.base_url}")
-        logger.info(f"token_url is : {token_url}")
-        resp = self.client.post(token_url, data=data).raise_for_status()
-        self.token = resp.json()["access_token"]
-        return
+        logger.info(f"Requesting a Keycloak token from {token_url} with grant {data['grant_type']}")
+        requested_at = time.monotonic()
+        token = self.client.post(token_url, data=data).raise_for_status().json()
+        self.token = token["access_token"]
+        self.token_expires_at = requested_at + token.get("expires_in", 0) - self.TOKEN_EXPIRY_MARGIN
+        self.refresh_token = token.get("refresh_token", str())
+        self.refresh_token_expires_at = requested_at + token.get("refresh_expires_in", 0) - self.TOKEN_EXPIRY_MARGIN
 
-    def get_all_fields_matches(self, input_str: str) -> list[dict]:
-        headers = Headers(
+    def expire_token(self, token: str) -> None:
+        with self.token_lock:
+            if self.token == token:
+                self.token_expires_at = 0.0
+
+    def get(self, path: str) -> list[dict]:
+        search_url = self.config.base_url.join(path)
+        token = self.get_access_token()
+        resp = self.client.get(search_url, headers=self.get_headers(token))
+        if resp.status_code == 401:
+            # The token was revoked before its expiry, log in again once
+            self.expire_token(token)
+            resp = self.client.get(search_url, headers=self.get_headers(self.get_access_token()))
+        return resp.raise_for_status().json()
+
+    def get_headers(self, token: str) -> Headers:
+        return Headers(
             {
                 "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.token}",
+                "Authorization": f"Bearer {token}",
             }
         )
-        search_url = self.config.base_url.join(self.config.search_path + input_str)
-        result = self.client.get(search_url, headers=headers).raise_for_status().json()
-        return result
+
+    def get_all_fields_matches(self, input_str: str) -> list[dict]:
+        return self.get(self.config.search_path + quote(input_str))
 
     def get_username_matches(self, input_str: str) -> list[dict]:
-        headers = Headers(
-            {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.token}",
-            }
-        )
-        search_url = self.config.base_url.join(
-            self.config.search_username_path + input_str
-        )
-        result = self.client.get(search_url, headers=headers).raise_for_status().json()
-        return result
+        return self.get(self.config.search_username_path + quote(input_str))
+
+
+@functools.cache
+def get_keycloak_client() -> KeycloakClient:
+    """Return the Keycloak client of this process, so that its token and connection pool are reused across
+    searches."""
+    return KeycloakClient()
 
 
 class KeycloakUserSearch(UserSearch):
     search_source = "Keycloak"
 
     def __init__(self, *args, **kwargs):
-        self.keycloak_client = KeycloakClient()
+        self.keycloak_client = get_keycloak_client()
         super().__init__(*args, **kwargs)
 
+    def search(self):
+        usernames = sorted(set(self.user_search_string.split()))
+        if len(usernames) <= 1:
+            return super().search()
+
+        # Look up pasted lists of usernames concurrently over the shared connection pool
+        with ThreadPoolExecutor(max_workers=self.keycloak_client.config.max_workers) as executor:
+            results = executor.map(lambda username: self.search_a_user(username, "username_only"), usernames)
+        return [match for matches in results for match in matches]
+
     def search_a_user(self, user_search_string=None, search_by="all_fields"):
-        self.keycloak_client.get_access_token()
+        if search_by not in ("all_fields", "username_only"):
+            raise ValueError("search_by must be one of all_fields, username_only")
+
+        search_hash = hashlib.sha256(user_search_string.encode()).hexdigest()
+        cache_key = f"keycloak-user-search:{search_by}:{search_hash}"
+        users = cache.get(cache_key)
+        if users is not None:
+            return users
+
         matches: list[dict] = []
         if search_by == "all_fields":
             matches = self.keycloak_client.get_all_fields_matches(user_search_string)
-        elif search_by == "username_only":
-            matches = self.keycloak_client.get_username_matches(user_search_string)
         else:
-            raise ValueError("search_by must be one of all_fields, username_only")
+            matches = self.keycloak_client.get_username_matches(user_search_string)
 
         if matches == []:
             logger.info("Keycloak-user-search: No matchig users found!")
 
-        return [
+        users = [
             {
                 "username": match["username"],
                 "last_name": match.get("lastName", ""),
@@ -82,3 +158,5 @@ class KeycloakUserSearch(UserSearch):
             }
             for match in matches
         ]
+        cache.set(cache_key, users, self.keycloak_client.config.cache_timeout)
+        return users
@@ -0,0 +1,102 @@
+import logging
+from unittest import mock
+
+import httpx
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from coldfront.plugins.keycloak_user_search.search import KeycloakClient, KeycloakUserSearch
+
+logging.disable(logging.CRITICAL)
+
+KEYCLOAK_SETTINGS = {
+    "KEYCLOAK_BASE_URL": "https://keycloak.test/",
+    "KEYCLOAK_USERNAME": "admin",
+    "KEYCLOAK_PASSWORD": "password",
+    "KEYCLOAK_CLIENT_ID": "coldfront",
+    "KEYCLOAK_CLIENT_SECRET": "secret",
+}
+
+
+class MockKeycloak:
+    """A mock Keycloak server that issues tokens and answers user searches"""
+
+    def __init__(self, users, expires_in=300):
+        self.users = users
+        self.expires_in = expires_in
+        self.grants = []
+        self.searches = []
+
+    def handle(self, request):
+        if request.url.path.endswith("/openid-connect/token"):
+            grant_type = dict(httpx.QueryParams(request.content.decode()))["grant_type"]
+            self.grants.append(grant_type)
+            return httpx.Response(
+                200,
+                json={
+                    "access_token": f"token-{len(self.grants)}",
+                    "expires_in": self.expires_in,
+                    "refresh_token": "refresh",
+                    "refresh_expires_in": 1800,
+                },
+            )
+        if request.headers["Authorization"] != f"Bearer token-{len(self.grants)}":
+            return httpx.Response(401)
+        self.searches.append(request.url.params)
+        if "username" in request.url.params:
+            return httpx.Response(200, json=[u for u in self.users if u["username"] == request.url.params["username"]])
+        return httpx.Response(200, json=[u for u in self.users if request.url.params["search"] in u["username"]])
+
+
+@override_settings(**KEYCLOAK_SETTINGS)
+class KeycloakUserSearchTest(TestCase):
+    """Tests for KeycloakUserSearch"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.keycloak = MockKeycloak(
+            [
+                {"username": "ab123", "firstName": "Ada", "lastName": "Byron"},
+                {"username": "cd456", "firstName": "Charles", "lastName": "Darwin"},
+            ]
+        )
+        self.client = KeycloakClient(transport=httpx.MockTransport(self.keycloak.handle))
+        patcher = mock.patch(
+            "coldfront.plugins.keycloak_user_search.search.get_keycloak_client", return_value=self.client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_token_is_reused(self):
+        """Test that searches reuse the access token until it expires"""
+        KeycloakUserSearch("ab", "all_fields").search()
+        KeycloakUserSearch("cd", "all_fields").search()
+        self.assertEqual(self.keycloak.grants, ["password"])
+
+    def test_expired_token_is_refreshed(self):
+        """Test that an expired access token is renewed with the refresh token"""
+        self.keycloak.expires_in = 0
+        KeycloakUserSearch("ab", "all_fields").search()
+        KeycloakUserSearch("cd", "all_fields").search()
+        self.assertEqual(self.keycloak.grants, ["password", "refresh_token"])
+
+    def test_revoked_token_is_replaced(self):
+        """Test that a search retries once with a new token when its token is rejected"""
+        KeycloakUserSearch("ab", "all_fields").search()
+        self.keycloak.grants.append("revoked")
+        users = KeycloakUserSearch("cd", "all_fields").search()
+        self.assertEqual([user["username"] for user in users], ["cd456"])
+
+    def test_multiple_usernames(self):
+        """Test that a list of usernames is looked up one username at a time"""
+        users = KeycloakUserSearch("cd456 ab123 missing", "all_fields").search()
+        self.assertEqual([user["username"] for user in users], ["ab123", "cd456"])
+        self.assertEqual(len(self.keycloak.searches), 3)
+
+    def test_results_are_cached(self):
+        """Test that repeated searches are answered from the cache"""
+        KeycloakUserSearch("ab", "all_fields").search()
+        users = KeycloakUserSearch("ab", "all_fields").search()
+        self.assertEqual(users[0]["first_name"], "Ada")
+        self.assertEqual(len(self.keycloak.searches), 1)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MokeyOidcConfig(AppConfig):
     name = "coldfront.plugins.mokey_oidc"
+
+    def ready(self):
+        import coldfront.plugins.mokey_oidc.signals
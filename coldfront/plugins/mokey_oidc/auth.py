@@ -1,9 +1,12 @@
 import logging
+import time
 
 from django.contrib.auth.models import Group
+from mozilla_django_oidc.auth import OIDCAuthenticationBackend
 
 from coldfront.core.utils.common import import_from_settings
-from mozilla_django_oidc.auth import OIDCAuthenticationBackend
+from coldfront.core.utils.middleware import request_metrics
+from coldfront.plugins.mokey_oidc.utils import get_group_ids
 
 logger = logging.getLogger(__name__)
 
@@ -13,16 +16,49 @@ DENY_GROUPS = import_from_settings("MOKEY_OIDC_DENY_GROUPS", [])
 
 
 class OIDCMokeyAuthenticationBackend(OIDCAuthenticationBackend):
-    def _sync_groups(self, user, groups):
-        is_pi = False
-        user.groups.clear()
-        for group_name in groups:
-            group, created = Group.objects.get_or_create(name=group_name)
-            user.groups.add(group)
-            if group_name == PI_GROUP:
-                is_pi = True
+    def authenticate(self, request, **kwargs):
+        # Other logins go through every backend too
+        if request is None or "code" not in request.GET:
+            return super().authenticate(request, **kwargs)
+
+        start = time.perf_counter()
+        user = None
+        try:
+            user = super().authenticate(request, **kwargs)
+            return user
+        finally:
+            duration = time.perf_counter() - start
+            request_metrics.observe_login("mokey_oidc", user is not None, duration)
+            logger.info(
+                "OIDC login of %s %s in %.1fms",
+                user,
+                "succeeded" if user is not None else "failed",
+                duration * 1000,
+                extra={"backend": "mokey_oidc", "succeeded": user is not None, "duration": duration},
+            )
 
-        user.userprofile.is_pi = is_pi
+    def _sync_groups(self, user, groups):
+        """Adds the user to the claimed groups they are missing from and removes them from the others, creating the
+        groups that don't exist yet
+        """
+        claimed = {group_name for group_name in groups if group_name}
+        current = dict(user.groups.values_list("name", "id"))
+
+        removed = [group_id for group_name, group_id in current.items() if group_name not in claimed]
+        if removed:
+            user.groups.remove(*removed)
+        added = claimed - set(current)
+        if added:
+            group_ids = get_group_ids(added)
+            # A cached group may have been deleted through another process. Foreign keys are only checked at commit on
+            # some databases, so the ids are checked before adding them.
+            if Group.objects.filter(pk__in=group_ids.values()).count() < len(group_ids):
+                group_ids = get_group_ids(added, refresh=True)
+            user.groups.add(*group_ids.values())
+        if removed or added:
+            logger.info(f"Synced groups of {user}: added {sorted(added)}, removed {len(removed)}")
+
+        user.userprofile.is_pi = PI_GROUP in claimed
 
     def _parse_groups_from_claims(self, claims):
         groups = claims.get("groups", []) or []
@@ -69,7 +105,7 @@ class OIDCMokeyAuthenticationBackend(OIDCAuthenticationBackend):
         else:
             logger.warning(
                 "Failed to update email. Could not find email for user %s in mokey oidc id_token claims: %s",
-                username,
+                user.username,
                 claims,
             )
 
@@ -0,0 +1,22 @@
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from coldfront.plugins.mokey_oidc.utils import forget_group_id
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_name(sender, instance, raw=False, **kwargs):
+    # The stored name of a renamed group must stop resolving to its id too
+    if instance.pk and not raw:
+        instance._stored_name = Group.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_group_id(sender, instance, **kwargs):
+    names = {instance.name, getattr(instance, "_stored_name", None)} - {None}
+    for name in names:
+        forget_group_id(name)
+    # Logins looking the names up before the commit may have cached them again
+    transaction.on_commit(lambda: [forget_group_id(name) for name in names])
@@ -0,0 +1,107 @@
+import logging
+import os
+import unittest
+from unittest.mock import Mock, patch
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed
+from django.test import RequestFactory, TestCase
+
+from coldfront.config.env import ENV
+from coldfront.core.test_helpers.factories import UserFactory
+from coldfront.core.utils.middleware import request_metrics
+from coldfront.plugins.mokey_oidc.utils import get_group_cache_key, get_group_ids
+
+logging.disable(logging.CRITICAL)
+
+
+@unittest.skipUnless(
+    ENV.bool("PLUGIN_AUTH_OIDC", default=False) and ENV.bool("PLUGIN_MOKEY", default=False),
+    "Only run Mokey OIDC tests if enabled",
+)
+class OIDCMokeyAuthenticationBackendTests(TestCase):
+    """Tests for syncing the groups of Mokey OIDC logins"""
+
+    def setUp(self):
+        # Imported here as mozilla_django_oidc is only installed with the plugin
+        from coldfront.plugins.mokey_oidc import auth
+
+        self.auth = auth
+        self.backend = auth.OIDCMokeyAuthenticationBackend()
+        self.addCleanup(cache.clear)
+        self.user = UserFactory(username="cgray")
+        self.user.groups.add(*[Group.objects.create(name=name) for name in ["hpc", "old"]])
+        self.m2m_changes = []
+
+        def record_change(sender, instance, action, pk_set, **kwargs):
+            if action.startswith("post_"):
+                self.m2m_changes.append((action, set(pk_set or ())))
+
+        m2m_changed.connect(record_change, sender=User.groups.through)
+        self.addCleanup(m2m_changed.disconnect, record_change, sender=User.groups.through)
+
+    def update_user(self, groups):
+        return self.backend.update_user(self.user, {"uid": "cgray", "email": "cgray@example.com", "groups": groups})
+
+    def test_unchanged_groups(self):
+        """Test that a login with the same groups writes no memberships"""
+        self.update_user(["hpc", "old"])
+        self.assertEqual(self.m2m_changes, [])
+
+    def test_added_and_removed_groups(self):
+        """Test that the claimed groups are added, created when missing, and the others removed"""
+        self.update_user("hpc;new")
+
+        new = Group.objects.get(name="new")
+        self.assertEqual(
+            self.m2m_changes, [("post_remove", {Group.objects.get(name="old").pk}), ("post_add", {new.pk})]
+        )
+        self.assertEqual(set(self.user.groups.values_list("name", flat=True)), {"hpc", "new"})
+        self.assertEqual(get_group_ids({"new"}), {"new": new.pk})
+
+    def test_stale_cached_group_id(self):
+        """Test that the id of a group deleted through another process is read again"""
+        cache.set(get_group_cache_key("new"), 99999)
+
+        self.update_user(["hpc", "old", "new"])
+
+        self.assertIn("new", self.user.groups.values_list("name", flat=True))
+        self.assertEqual(cache.get(get_group_cache_key("new")), Group.objects.get(name="new").pk)
+
+    def test_renamed_group_is_forgotten(self):
+        """Test that neither the old nor the new name of a renamed group keep a cached id"""
+        group = Group.objects.get(name="old")
+        self.assertEqual(get_group_ids({"old"}), {"old": group.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            group.name = "renamed"
+            group.save()
+
+        self.assertIsNone(cache.get(get_group_cache_key("old")))
+        self.assertNotEqual(get_group_ids({"old"})["old"], group.pk)
+
+    def test_is_pi(self):
+        """Test that the PI flag follows the PI group claim"""
+        self.update_user(["hpc", self.auth.PI_GROUP])
+        self.user.userprofile.refresh_from_db()
+        self.assertTrue(self.user.userprofile.is_pi)
+
+        self.update_user(["hpc"])
+        self.user.userprofile.refresh_from_db()
+        self.assertFalse(self.user.userprofile.is_pi)
+
+    def test_login_metric(self):
+        """Test that OIDC logins are counted by result"""
+        request_metrics.reset()
+        self.addCleanup(request_metrics.reset)
+        request = RequestFactory().get("/oidc/callback/", {"code": "abc", "state": "xyz"})
+        parent = Mock(side_effect=[self.user, None])
+
+        with patch.object(self.auth.OIDCAuthenticationBackend, "authenticate", parent):
+            self.assertEqual(self.backend.authenticate(request), self.user)
+            self.assertIsNone(self.backend.authenticate(request))
+
+        metrics = request_metrics.render().replace(f',pid="{os.getpid()}"}}', "}")
+        self.assertIn('coldfront_logins_total{backend="mokey_oidc",result="success"} 1', metrics)
+        self.assertIn('coldfront_logins_total{backend="mokey_oidc",result="failure"} 1', metrics)
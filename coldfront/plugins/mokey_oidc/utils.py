@@ -0,0 +1,43 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+
+from coldfront.core.utils.common import import_from_settings
+
+MOKEY_OIDC_GROUP_CACHE_TIMEOUT = import_from_settings("MOKEY_OIDC_GROUP_CACHE_TIMEOUT", 3600)
+
+
+def get_group_cache_key(name):
+    return f"mokey-oidc-group:{name}"
+
+
+def forget_group_id(name):
+    cache.delete(get_group_cache_key(name))
+
+
+def get_group_ids(names, refresh=False):
+    """Looks up the ids of groups by name in the cache, reading or creating the missing ones with bulk queries
+
+    Params:
+        names (set[str]): names of the groups
+        refresh (bool): whether to read all of them from the database
+
+    Returns:
+        dict: ids of the groups by name
+    """
+
+    cached = {} if refresh else cache.get_many([get_group_cache_key(name) for name in names])
+    group_ids = {name: cached[get_group_cache_key(name)] for name in names if get_group_cache_key(name) in cached}
+    missing = set(names) - set(group_ids)
+    if not missing:
+        return group_ids
+
+    found = dict(Group.objects.filter(name__in=missing).values_list("name", "id"))
+    if len(found) < len(missing):
+        # Another login may create the same groups meanwhile
+        Group.objects.bulk_create([Group(name=name) for name in missing - set(found)], ignore_conflicts=True)
+        found = dict(Group.objects.filter(name__in=missing).values_list("name", "id"))
+    cache.set_many(
+        {get_group_cache_key(name): group_id for name, group_id in found.items()}, MOKEY_OIDC_GROUP_CACHE_TIMEOUT
+    )
+    group_ids.update(found)
+    return group_ids
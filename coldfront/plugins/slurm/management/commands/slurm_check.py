@@ -7,6 +7,7 @@ from django.core.management.base import BaseCommand
 
 from coldfront.core.resource.models import ResourceAttribute
 from coldfront.core.utils.common import import_from_settings
+from coldfront.core.utils.instrumentation import instrument_command
 from coldfront.plugins.slurm.associations import SlurmCluster
 from coldfront.plugins.slurm.utils import (
     SLURM_CLUSTER_ATTRIBUTE_NAME,
@@ -287,6 +288,7 @@ class Command(BaseCommand):
 
         return slurm_cluster
 
+    @instrument_command
     def handle(self, *args, **options):
         verbosity = int(options["verbosity"])
         root_logger = logging.getLogger("")
@@ -355,3 +357,4 @@ class Command(BaseCommand):
         coldfront_cluster = SlurmCluster.new_from_resource(resource)
 
         self.check_consistency(slurm_cluster, coldfront_cluster)
+        self.rows_processed = len(coldfront_cluster.accounts)
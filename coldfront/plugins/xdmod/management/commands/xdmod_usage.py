@@ -6,6 +6,7 @@ from django.core.management.base import BaseCommand
 from django.db.models import Q
 
 from coldfront.core.allocation.models import Allocation
+from coldfront.core.utils.instrumentation import instrument_command
 from coldfront.plugins.xdmod.utils import (
     XDMOD_ACCOUNT_ATTRIBUTE_NAME,
     XDMOD_CLOUD_CORE_TIME_ATTRIBUTE_NAME,
@@ -112,6 +113,7 @@ class Command(BaseCommand):
             )
 
         for s in allocations.distinct():
+            self.rows_processed += 1
             account_name = s.get_attribute(XDMOD_STORAGE_GROUP_ATTRIBUTE_NAME)
             if not account_name:
                 logger.warning(
@@ -238,6 +240,7 @@ class Command(BaseCommand):
             )
 
         for s in allocations.distinct():
+            self.rows_processed += 1
             account_name = s.get_attribute(XDMOD_ACCOUNT_ATTRIBUTE_NAME)
             if not account_name:
                 logger.warning(
@@ -361,6 +364,7 @@ class Command(BaseCommand):
             )
 
         for s in allocations.distinct():
+            self.rows_processed += 1
             account_name = s.get_attribute(XDMOD_ACCOUNT_ATTRIBUTE_NAME)
             if not account_name:
                 logger.warning(
@@ -480,6 +484,7 @@ class Command(BaseCommand):
             )
 
         for s in allocations.distinct():
+            self.rows_processed += 1
             project_name = s.get_attribute(XDMOD_CLOUD_PROJECT_ATTRIBUTE_NAME)
             if not project_name:
                 logger.warning(
@@ -559,6 +564,7 @@ class Command(BaseCommand):
                 )
             )
 
+    @instrument_command
     def handle(self, *args, **options):
         verbosity = int(options["verbosity"])
         root_logger = logging.getLogger("")
@@ -583,6 +589,7 @@ class Command(BaseCommand):
         self.filter_account = ""
         self.print_header = False
         self.fetch_expired = False
+        self.rows_processed = 0
 
         if options["username"]:
             logger.info("Filtering output by username: %s", options["username"])
@@ -38,6 +38,9 @@ function initDocument(): void {
     init();
   }
 }
+// Tables in partials loaded by htmx (e.g. allocation detail panels)
+document.addEventListener('htmx:afterSettle', () => initDataTable());
+
 if (document.readyState !== 'loading') {
   initDocument();
 } else {
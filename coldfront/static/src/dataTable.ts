@@ -9,7 +9,7 @@ export function initDataTable(): void {
     'div.table-responsive > table.datatable'
   );
   for (const element of dtables) {
-    if (element !== null) {
+    if (element !== null && !DataTable.isDataTable(element)) {
       new DataTable(element, {
         pageLength: 10,
         orderClasses: false,
@@ -22,7 +22,7 @@ export function initDataTable(): void {
     'div.table-responsive > table.datatable-long'
   );
   for (const element of dtablesLong) {
-    if (element !== null) {
+    if (element !== null && !DataTable.isDataTable(element)) {
       new DataTable(element, {
         pageLength: 50,
         orderClasses: false,